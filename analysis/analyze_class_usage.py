@@ -7,42 +7,45 @@ For each T1 graph, finds:
 2. Used classes that are NOT defined (external classes)
 3. Classes that are both defined AND used (internal usage)
 
+Defined and used classes are held as two sparse graph x class matrices (see
+class_matrix.py), which also give the cross-graph views: how many graphs use
+each class, and the most similar pairs of graphs by Jaccard and cosine
+similarity. All of it can be exported as CSV or Parquet.
+
 Usage:
-  python3 analyze_class_usage.py
+  python3 analyze_class_usage.py [--export DIR] [--format {csv,parquet}] [--top N]
+                                 [--profile REPORT] [--cprofile STATS]
 
 Prerequisites:
   Run ./run_queries.sh first to generate the input XML files
 """
 
+import argparse
 import os
 import sys
-import xml.etree.ElementTree as ET
 from collections import defaultdict
 
-# Parse the SPARQL XML results
-def parse_sparql_xml(filepath):
-    """Parse SPARQL XML results into list of dicts"""
-    tree = ET.parse(filepath)
-    root = tree.getroot()
-
-    # Handle XML namespace
-    ns = {'sparql': 'http://www.w3.org/2005/sparql-results#'}
-
-    results = []
-    for result in root.findall('.//sparql:result', ns):
-        row = {}
-        for binding in result.findall('sparql:binding', ns):
-            name = binding.get('name')
-            uri_elem = binding.find('sparql:uri', ns)
-            literal_elem = binding.find('sparql:literal', ns)
-
-            if uri_elem is not None:
-                row[name] = uri_elem.text
-            elif literal_elem is not None:
-                row[name] = literal_elem.text
-        results.append(row)
-
-    return results
+from class_matrix import IncidenceMatrix, write_table
+from profiling import PROFILER
+from sparql_results import iter_bindings
+
+parser = argparse.ArgumentParser(description='Analyze defined vs used classes across T1 graphs')
+parser.add_argument('--export', metavar='DIR', default=None,
+                    help='Write the usage matrix, per-graph summary and graph similarities to DIR')
+parser.add_argument('--format', choices=('csv', 'parquet'), default='csv',
+                    help='Export format; parquet requires pyarrow (default: csv)')
+parser.add_argument('--top', type=int, default=10,
+                    help='Most similar graph pairs to report (default: 10)')
+parser.add_argument('--profile', metavar='REPORT', default=None,
+                    help='Write per-phase wall time, peak memory, rows and bytes to this JSON file')
+parser.add_argument('--cprofile', metavar='STATS', default=None,
+                    help='With --profile, also dump cProfile stats to this file')
+args = parser.parse_args()
+if args.cprofile and not args.profile:
+    parser.error('--cprofile requires --profile')
+
+if args.profile:
+    PROFILER.start(cprofile=bool(args.cprofile))
 
 # Get directory where this script is located
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -60,101 +63,102 @@ if not os.path.exists(used_file):
     print("Please run ./run_queries.sh first to generate the input files")
     sys.exit(1)
 
-# Load data
-print("Loading defined classes...")
-defined = parse_sparql_xml(defined_file)
-
-print("Loading used classes...")
-used = parse_sparql_xml(used_file)
-
-print(f"\nTotal defined class entries: {len(defined)}")
-print(f"Total used class entries: {len(used)}")
-
-# Build data structures
+# Load data, building the per-graph structures as the results stream in
 # defined_by_graph[graph_uri] = set of class URIs defined in that graph
 defined_by_graph = defaultdict(set)
 graph_labels = {}
 
-for row in defined:
-    graph_uri = row['graph']
-    class_uri = row['classUri']
-    defined_by_graph[graph_uri].add(class_uri)
-    if 'graphLabel' in row:
-        graph_labels[graph_uri] = row['graphLabel']
+print("Loading defined classes...")
+defined_count = 0
+with PROFILER.phase('parse:defined_classes'):
+    for row in iter_bindings(defined_file):
+        defined_count += 1
+        graph_uri = row['graph']
+        class_uri = row['classUri']
+        defined_by_graph[graph_uri].add(class_uri)
+        if 'graphLabel' in row:
+            graph_labels[graph_uri] = row['graphLabel']
+    PROFILER.count(rows=defined_count, bytes=os.path.getsize(defined_file))
 
 # used_by_graph[graph_uri] = {class_uri: count}
 used_by_graph = defaultdict(dict)
 
-for row in used:
-    graph_uri = row['graph']
-    class_uri = row['classUri']
-    count = row.get('count', '0')
-    used_by_graph[graph_uri][class_uri] = count
-    if 'graphLabel' in row:
-        graph_labels[graph_uri] = row['graphLabel']
+print("Loading used classes...")
+used_count = 0
+with PROFILER.phase('parse:used_classes'):
+    for row in iter_bindings(used_file):
+        used_count += 1
+        graph_uri = row['graph']
+        class_uri = row['classUri']
+        count = row.get('count', '0')
+        used_by_graph[graph_uri][class_uri] = count
+        if 'graphLabel' in row:
+            graph_labels[graph_uri] = row['graphLabel']
+    PROFILER.count(rows=used_count, bytes=os.path.getsize(used_file))
+
+print(f"\nTotal defined class entries: {defined_count}")
+print(f"Total used class entries: {used_count}")
 
 # Get all T1 graphs
 all_graphs = sorted(set(defined_by_graph.keys()) | set(used_by_graph.keys()))
 
+# Both matrices share rows and columns, so their rows compare directly
+with PROFILER.phase('matrix:build'):
+    all_classes = sorted({c for classes in defined_by_graph.values() for c in classes} |
+                         {c for classes in used_by_graph.values() for c in classes})
+    defined = IncidenceMatrix.from_rows(defined_by_graph, all_graphs, all_classes)
+    used = IncidenceMatrix.from_rows(used_by_graph, all_graphs, all_classes)
+    PROFILER.count(rows=defined.nnz + used.nnz)
+
 print(f"\nTotal T1 graphs: {len(all_graphs)}")
 print("=" * 80)
 
 # Analyze each graph
 summary_stats = []
 
-for graph_uri in all_graphs:
+for i, graph_uri in enumerate(all_graphs):
     graph_label = graph_labels.get(graph_uri, graph_uri.split('/')[-1])
 
-    defined_classes = defined_by_graph.get(graph_uri, set())
-    used_classes = set(used_by_graph.get(graph_uri, {}).keys())
-
     # Calculate categories
-    both = defined_classes & used_classes
-    defined_not_used = defined_classes - used_classes
-    used_not_defined = used_classes - defined_classes
+    both, defined_not_used, used_not_defined = defined.compare_row(used, i)
 
     summary_stats.append({
         'graph': graph_label,
         'uri': graph_uri,
-        'defined': len(defined_classes),
-        'used': len(used_classes),
+        'defined': len(defined.row_columns(i)),
+        'used': len(used.row_columns(i)),
         'both': len(both),
         'defined_not_used': len(defined_not_used),
         'used_not_defined': len(used_not_defined)
     })
+    stats = summary_stats[-1]
 
     print(f"\n{graph_label}")
     print("-" * 80)
-    print(f"  Total defined classes: {len(defined_classes)}")
-    print(f"  Total used classes: {len(used_classes)}")
-    print(f"  Both defined AND used (internal): {len(both)}")
-    print(f"  Defined but NOT used: {len(defined_not_used)}")
-    print(f"  Used but NOT defined (external): {len(used_not_defined)}")
+    print(f"  Total defined classes: {stats['defined']}")
+    print(f"  Total used classes: {stats['used']}")
+    print(f"  Both defined AND used (internal): {stats['both']}")
+    print(f"  Defined but NOT used: {stats['defined_not_used']}")
+    print(f"  Used but NOT defined (external): {stats['used_not_defined']}")
 
     if defined_not_used:
-        print(f"\n  Defined but not used ({len(defined_not_used)}):")
-        for class_uri in sorted(defined_not_used)[:5]:
+        print(f"\n  Defined but not used ({stats['defined_not_used']}):")
+        for class_uri in defined.classes_of(defined_not_used)[:5]:
             print(f"    - {class_uri}")
-        if len(defined_not_used) > 5:
-            print(f"    ... and {len(defined_not_used) - 5} more")
-
-    if used_not_defined:
-        print(f"\n  Used but not defined ({len(used_not_defined)}):")
-        counts = used_by_graph[graph_uri]
-        for class_uri in sorted(used_not_defined, key=lambda x: int(counts.get(x, '0')), reverse=True)[:5]:
+        if stats['defined_not_used'] > 5:
+            print(f"    ... and {stats['defined_not_used'] - 5} more")
+
+    counts = used_by_graph.get(graph_uri, {})
+    for title, columns, n in (("Used but not defined", used_not_defined, stats['used_not_defined']),
+                              ("Both defined and used", both, stats['both'])):
+        if not columns:
+            continue
+        print(f"\n  {title} ({n}):")
+        for class_uri in sorted(used.classes_of(columns), key=lambda x: int(counts.get(x, '0')), reverse=True)[:5]:
             count = counts.get(class_uri, '0')
             print(f"    - {class_uri} (count: {count})")
-        if len(used_not_defined) > 5:
-            print(f"    ... and {len(used_not_defined) - 5} more")
-
-    if both:
-        print(f"\n  Both defined and used ({len(both)}):")
-        counts = used_by_graph[graph_uri]
-        for class_uri in sorted(both, key=lambda x: int(counts.get(x, '0')), reverse=True)[:5]:
-            count = counts.get(class_uri, '0')
-            print(f"    - {class_uri} (count: {count})")
-        if len(both) > 5:
-            print(f"    ... and {len(both) - 5} more")
+        if n > 5:
+            print(f"    ... and {n - 5} more")
 
 # Print summary table
 print("\n\n" + "=" * 80)
@@ -184,3 +188,51 @@ print("  Used     = Classes with usage counts in this graph")
 print("  Both     = Classes both defined AND used (internal usage)")
 print("  Def!Use  = Classes defined but NOT used (no instances)")
 print("  Use!Def  = Classes used but NOT defined (external classes)")
+
+# Cross-graph views from the used-class matrix
+print("\n\n" + "=" * 80)
+print("CLASSES BY NUMBER OF GRAPHS USING THEM")
+print("=" * 80)
+for k, n_classes in used.degree_histogram().items():
+    if k:
+        print(f"  Used by {k:>3} graph{'s' if k != 1 else ' '}: {n_classes:>6} classes")
+
+with PROFILER.phase('matrix:similarity'):
+    similarities = sorted(used.similarities(), key=lambda s: (-s[3], -s[4], s[0], s[1]))
+    PROFILER.count(rows=len(similarities))
+
+
+def label_of(graph_uri):
+    return graph_labels.get(graph_uri, graph_uri.split('/')[-1])
+
+
+print("\n\n" + "=" * 80)
+print(f"MOST SIMILAR GRAPH PAIRS (top {args.top} by Jaccard)")
+print("=" * 80)
+print(f"{'Graph 1':<28} {'Graph 2':<28} {'Shared':>7} {'Jaccard':>8} {'Cosine':>7}")
+print("-" * 80)
+for g1, g2, shared, jaccard, cosine in similarities[:args.top]:
+    print(f"{label_of(g1)[:28]:<28} {label_of(g2)[:28]:<28} {shared:>7} {jaccard:>8.3f} {cosine:>7.3f}")
+if not similarities:
+    print("  No two graphs use a common class")
+
+if args.export:
+    with PROFILER.phase('write:export'):
+        os.makedirs(args.export, exist_ok=True)
+        ext = 'parquet' if args.format == 'parquet' else 'csv'
+        defined_pairs = {(g, c) for g, c, _ in defined.entries()}
+        write_table(os.path.join(args.export, f'class_usage.{ext}'),
+                    ['graph', 'class', 'count', 'defined'],
+                    ((g, c, int(w), (g, c) in defined_pairs) for g, c, w in used.entries()), args.format)
+        write_table(os.path.join(args.export, f'graph_summary.{ext}'),
+                    ['graph', 'label', 'defined', 'used', 'both', 'defined_not_used', 'used_not_defined',
+                     'instances'],
+                    ((s['uri'], s['graph'], s['defined'], s['used'], s['both'], s['defined_not_used'],
+                      s['used_not_defined'], int(total)) for s, total in zip(summary_stats, used.row_totals())),
+                    args.format)
+        write_table(os.path.join(args.export, f'graph_similarity.{ext}'),
+                    ['graph1', 'graph2', 'shared_classes', 'jaccard', 'cosine'],
+                    ((g1, g2, n, round(j, 6), round(c, 6)) for g1, g2, n, j, c in similarities), args.format)
+        print(f"\nExported class usage, graph summary and graph similarity tables to {args.export}")
+
+PROFILER.write_report(args.profile, args.cprofile)
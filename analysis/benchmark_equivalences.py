@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Synthetic benchmark for equivalence group assembly in generate_equivalences.py.
+
+Builds synthetic usage data at multiples of the current Proto-OKN size and
+times the graph-usage lookup for SKOS/Wikidata groups two ways:
+1. Legacy: for every class in every group, scan every graph
+2. Indexed: one shared class -> [(graph, count)] index, built once
+
+The legacy scan is timed over a sample of groups and extrapolated, since at
+100x it would otherwise take far too long to run.
+
+Usage:
+  python3 benchmark_equivalences.py [--scales 1 10 100] [--seed N]
+"""
+
+import argparse
+import random
+import time
+
+from generate_equivalences import build_class_usage_index, group_graph_usage
+
+# Roughly today's data: 16 T1 graphs using ~750 distinct classes
+BASE_GRAPHS = 16
+BASE_CLASSES = 750
+CLASSES_PER_GRAPH = 50
+GROUP_SIZE = 3
+LEGACY_SAMPLE = 200
+
+
+def synthetic_usage(scale, rng):
+    """Return ({graph: {class: count}}, [class groups]) at the given scale."""
+    n_graphs = BASE_GRAPHS * scale
+    n_classes = BASE_CLASSES * scale
+    vocabulary = [f"https://example.org/class/{i}" for i in range(n_classes)]
+
+    used_by_graph = {}
+    for g in range(n_graphs):
+        graph_uri = f"https://example.org/graph/{g}"
+        classes = rng.sample(vocabulary, min(CLASSES_PER_GRAPH, n_classes))
+        used_by_graph[graph_uri] = {c: str(rng.randint(1, 100000)) for c in classes}
+
+    # One SKOS/Wikidata-style group per GROUP_SIZE classes
+    shuffled = vocabulary[:]
+    rng.shuffle(shuffled)
+    groups = [set(shuffled[i:i + GROUP_SIZE]) for i in range(0, n_classes, GROUP_SIZE)]
+    return used_by_graph, groups
+
+
+def legacy_graph_usage(used_by_graph, classes):
+    """The per-group scan generate_equivalences() used before the shared index."""
+    graph_usage = {}
+    for class_uri in classes:
+        for graph_uri in used_by_graph:
+            if class_uri in used_by_graph[graph_uri]:
+                count = used_by_graph[graph_uri][class_uri]
+                if graph_uri not in graph_usage:
+                    graph_usage[graph_uri] = []
+                graph_usage[graph_uri].append((class_uri, count))
+    return graph_usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark equivalence group assembly')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help='Multiples of the current graph and class counts (default: 1 10 100)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    print(f"{'Scale':>6} {'Graphs':>8} {'Classes':>9} {'Groups':>8} {'Legacy (s)':>12} {'Indexed (s)':>12} {'Speedup':>9}")
+    print("-" * 80)
+
+    for scale in args.scales:
+        used_by_graph, groups = synthetic_usage(scale, rng)
+
+        sample = groups[:LEGACY_SAMPLE]
+        start = time.perf_counter()
+        for group in sample:
+            legacy_graph_usage(used_by_graph, group)
+        legacy = (time.perf_counter() - start) * len(groups) / len(sample)
+
+        start = time.perf_counter()
+        class_usage = build_class_usage_index(used_by_graph)
+        for group in groups:
+            group_graph_usage(class_usage, group)
+        indexed = time.perf_counter() - start
+
+        # Both approaches must agree on the sampled groups
+        for group in sample:
+            assert legacy_graph_usage(used_by_graph, group) == group_graph_usage(class_usage, group)
+
+        print(f"{scale:>6} {len(used_by_graph):>8} {BASE_CLASSES * scale:>9} {len(groups):>8} "
+              f"{legacy:>12.3f} {indexed:>12.3f} {legacy / indexed:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
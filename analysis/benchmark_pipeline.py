@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+End-to-end synthetic benchmark for generate_equivalences.py, with a
+regression gate.
+
+For each scale, the harness:
+1. Writes synthetic Proto-OKN TTL files, one per graph, shaped like the
+   backend data: a LinkML schema with a counts annotation for its used
+   classes, SKOS links between classes and skos:exactMatch links from
+   Wikidata entities, after the LinkML generator's stray stdout
+2. Serves them, either in-process (--from-files) or from a local
+   okn_endpoint started on a free port (--mode endpoint)
+3. Runs generate_equivalences.py on them with --profile, and records the wall
+   time and peak traced memory of every stage and of the whole run
+
+Scales multiply the graph count; --classes-per-graph, --skos-density and
+--wikidata-fanin shape each graph. Results are printed as time and memory
+curves and can be saved with --output. Given a --baseline (an earlier
+--output), the run fails if any stage got slower or bigger than the
+tolerance allows.
+
+Usage:
+  python3 benchmark_pipeline.py [--scales 1 4 16] [--classes-per-graph N]
+                                [--skos-density D] [--wikidata-fanin N] [--seed N]
+                                [--mode {files,endpoint}] [--repeat N] [--output RESULTS]
+                                [--baseline RESULTS] [--tolerance T] [--min-seconds S]
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(HERE, '..', 'docker-backend')
+RESULTS_VERSION = 1
+
+# Graphs per scale step, and the share of classes that are linked somewhere
+BASE_GRAPHS = 16
+VOCABULARY_REUSE = 4            # each class is used by ~4 graphs on average
+WIKIDATA_COVERAGE = 0.3         # share of classes mapped to a Wikidata entity
+
+PREAMBLE = """\
+Warning: The following errors were encountered in the schema
+\t\tUndefined class references: File "synthetic.yaml", line 1, col 1: : uri
+
+('https://w3id.org/linkml/meta.context.jsonld',)
+"""
+
+PREFIXES = """\
+@prefix dct: <http://purl.org/dc/terms/> .
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okn: <https://purl.org/okn/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+@prefix wd: <http://www.wikidata.org/entity/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+"""
+
+SKOS_LINKS = ('exactMatch', 'closeMatch', 'broadMatch', 'narrowMatch')
+
+
+def synthetic_dataset(out_dir, n_graphs, classes_per_graph, skos_density, wikidata_fanin, rng):
+    """Write one TTL file per synthetic graph and return (paths, stats)."""
+    n_classes = max(classes_per_graph, n_graphs * classes_per_graph // VOCABULARY_REUSE)
+    vocabulary = [f"https://example.org/vocab/{i % 97}/Class{i}" for i in range(n_classes)]
+
+    used = [rng.sample(vocabulary, classes_per_graph) for _ in range(n_graphs)]
+
+    # SKOS links from a share of the classes to another class, kept with their source graph
+    skos = [[] for _ in range(n_graphs)]
+    n_skos = 0
+    for g, classes in enumerate(used):
+        for class_uri in classes:
+            if rng.random() < skos_density:
+                skos[g].append((class_uri, rng.choice(SKOS_LINKS), rng.choice(vocabulary)))
+                n_skos += 1
+
+    # Wikidata entities, each mapped from wikidata_fanin classes
+    mapped = rng.sample(vocabulary, int(n_classes * WIKIDATA_COVERAGE))
+    wikidata = {}
+    for i in range(0, len(mapped), wikidata_fanin):
+        entity = f"http://www.wikidata.org/entity/Q{1000 + i // wikidata_fanin}"
+        for class_uri in mapped[i:i + wikidata_fanin]:
+            wikidata[class_uri] = entity
+
+    paths = []
+    for g, classes in enumerate(used):
+        path = os.path.join(out_dir, f"synthetic-{g:05d}.ttl")
+        with open(path, 'w') as f:
+            f.write(PREAMBLE)
+            f.write(PREFIXES)
+            f.write(f"\nokns:synthetic{g} a linkml:SchemaDefinition ;\n")
+            f.write("    dct:isPartOf okn:proto-okn ;\n")
+            f.write(f"    dct:title \"Synthetic Graph {g}\" ;\n")
+            f.write("    linkml:annotations [ linkml:tag okns:counts ;\n")
+            f.write("        skos:example [ linkml:classes [ skos:example [\n")
+            for class_uri in classes:
+                f.write(f"            <{class_uri}> [ skos:example {rng.randint(1, 1000000)} ; "
+                        f"linkml:tag <{class_uri}> ] ;\n")
+            f.write("        ] ] ] ] .\n\n")
+            for s, link, o in skos[g]:
+                f.write(f"<{s}> skos:{link} <{o}> .\n")
+            for class_uri in classes:
+                if class_uri in wikidata:
+                    entity = wikidata[class_uri]
+                    f.write(f"<{entity}> skos:exactMatch <{class_uri}> ; "
+                            f"rdfs:label \"Entity {entity.rsplit('Q', 1)[1]}\"@en .\n")
+        paths.append(path)
+
+    stats = {'graphs': n_graphs, 'classes': n_classes, 'usedClasses': n_graphs * classes_per_graph,
+             'skosLinks': n_skos, 'wikidataEntities': len(set(wikidata.values()))}
+    return paths, stats
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def start_endpoint(paths, port, timeout=600):
+    """Start okn_endpoint on paths without its query cache and wait until it answers."""
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'okn_endpoint', '--port', str(port), '--cache-entries', '0', *paths],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://localhost:{port}/?" + urllib.parse.urlencode({'query': 'ASK { ?s ?p ?o }'})
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"okn_endpoint exited with status {process.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=5):
+                return process
+        except OSError:
+            time.sleep(0.5)
+    process.kill()
+    raise SystemExit(f"okn_endpoint did not answer within {timeout} s")
+
+
+def run_generator(paths, work_dir, mode, endpoint=None):
+    """Run generate_equivalences.py once and return its --profile report."""
+    report = os.path.join(work_dir, 'profile.json')
+    command = [sys.executable, os.path.join(HERE, 'generate_equivalences.py'),
+               '--output', os.path.join(work_dir, '_precomputed_equivalences.ttl'),
+               '--overview', os.path.join(work_dir, 'graph-overview.json'),
+               '--summary', os.path.join(work_dir, '_class_summary.ttl'),
+               '--label-cache', '', '--labels-offline', '--profile', report]
+    if mode == 'files':
+        command += ['--from-files', *paths]
+    else:
+        command += ['--endpoint', endpoint]
+    subprocess.run(command, cwd=HERE, stdout=subprocess.DEVNULL, check=True)
+    with open(report) as f:
+        return json.load(f)
+
+
+def stage_totals(report):
+    """Sum the top-level phases by name: {stage: {wallSeconds, peakMemoryBytes}}."""
+    stages = {}
+    for phase in report['phases']:
+        if phase['parent'] is not None:
+            continue
+        stage = stages.setdefault(phase['name'], {'wallSeconds': 0.0, 'peakMemoryBytes': 0})
+        stage['wallSeconds'] += phase['wallSeconds']
+        stage['peakMemoryBytes'] = max(stage['peakMemoryBytes'], phase['peakMemoryBytes'])
+    stages['total'] = {'wallSeconds': report['wallSeconds'], 'peakMemoryBytes': report['peakMemoryBytes']}
+    return stages
+
+
+def benchmark_scale(scale, args, rng):
+    n_graphs = BASE_GRAPHS * scale
+    with tempfile.TemporaryDirectory(prefix='okn-bench-') as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        os.mkdir(data_dir)
+        paths, stats = synthetic_dataset(data_dir, n_graphs, args.classes_per_graph, args.skos_density,
+                                         args.wikidata_fanin, rng)
+        stats['bytes'] = sum(os.path.getsize(p) for p in paths)
+
+        endpoint = None
+        if args.mode == 'endpoint':
+            port = free_port()
+            start = time.perf_counter()
+            endpoint = start_endpoint(paths, port)
+            stats['endpointStartSeconds'] = round(time.perf_counter() - start, 3)
+        try:
+            reports = [run_generator(paths, work_dir, args.mode, endpoint and f"http://localhost:{port}")
+                       for _ in range(args.repeat)]
+        finally:
+            if endpoint:
+                endpoint.terminate()
+                endpoint.wait()
+
+    # Keep the fastest repeat of each stage, the least disturbed by noise
+    stages = {}
+    for report in reports:
+        for name, stage in stage_totals(report).items():
+            best = stages.get(name)
+            if best is None or stage['wallSeconds'] < best['wallSeconds']:
+                stages[name] = stage
+    return {'scale': scale, 'dataset': stats, 'stages': stages}
+
+
+def compare(results, baseline, tolerance, min_seconds):
+    """Return messages for stages that regressed beyond the tolerance."""
+    previous = {run['scale']: run['stages'] for run in baseline['runs']}
+    regressions = []
+    for run in results['runs']:
+        for name, stage in run['stages'].items():
+            before = previous.get(run['scale'], {}).get(name)
+            if before is None:
+                continue
+            # Stages that take only a few milliseconds are all noise
+            limit = max(before['wallSeconds'] * (1 + tolerance), min_seconds)
+            if stage['wallSeconds'] > limit:
+                regressions.append(f"scale {run['scale']} {name}: {before['wallSeconds']:.3f} s -> "
+                                   f"{stage['wallSeconds']:.3f} s")
+            limit = before['peakMemoryBytes'] * (1 + tolerance)
+            if stage['peakMemoryBytes'] > limit and stage['peakMemoryBytes'] > 1e6:
+                regressions.append(f"scale {run['scale']} {name}: {before['peakMemoryBytes'] / 1e6:.1f} MB -> "
+                                   f"{stage['peakMemoryBytes'] / 1e6:.1f} MB")
+    return regressions
+
+
+def print_curves(results):
+    runs = results['runs']
+    names = sorted({n for run in runs for n in run['stages']} - {'total'},
+                   key=lambda n: -max(run['stages'].get(n, {}).get('wallSeconds', 0) for run in runs))
+    names.append('total')
+    print(f"\n{'Stage':<28}" + ''.join(f"{'x' + str(run['scale']):>12}" for run in runs))
+    print(f"{'  (graphs)':<28}" + ''.join(f"{run['dataset']['graphs']:>12}" for run in runs))
+    print("-" * (28 + 12 * len(runs)))
+    for title, key, unit, fmt in (("Wall time (s)", 'wallSeconds', 1, '.3f'),
+                                  ("Peak memory (MB)", 'peakMemoryBytes', 1e6, '.1f')):
+        print(title)
+        for name in names:
+            cells = ''.join(f"{format(run['stages'][name][key] / unit, fmt):>12}" if name in run['stages']
+                            else f"{'-':>12}" for run in runs)
+            print(f"  {name[:26]:<26}{cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark generate_equivalences.py on synthetic data')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 4, 16],
+                        help=f'Multiples of {BASE_GRAPHS} graphs to run (default: 1 4 16)')
+    parser.add_argument('--classes-per-graph', type=int, default=50,
+                        help='Used classes in each graph (default: 50)')
+    parser.add_argument('--skos-density', type=float, default=0.1,
+                        help='Share of used classes with a SKOS link to another class (default: 0.1)')
+    parser.add_argument('--wikidata-fanin', type=int, default=3,
+                        help='Classes mapped to each Wikidata entity (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--mode', choices=['files', 'endpoint'], default='files',
+                        help='Read the files in-process, or query a local okn_endpoint (default: files)')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Runs per scale; the fastest time of each stage is kept (default: 1)')
+    parser.add_argument('--output', default=None, help='Write the results as JSON to this file')
+    parser.add_argument('--baseline', default=None,
+                        help='Earlier --output to compare against; exit with status 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative growth of a stage\'s time or memory (default: 0.25)')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='Stage times below this never count as a regression (default: 0.05)')
+    args = parser.parse_args()
+
+    results = {
+        'version': RESULTS_VERSION,
+        'mode': args.mode,
+        'parameters': {'classesPerGraph': args.classes_per_graph, 'skosDensity': args.skos_density,
+                       'wikidataFanin': args.wikidata_fanin, 'seed': args.seed},
+        'runs': [],
+    }
+    for scale in args.scales:
+        print(f"Scale x{scale}: {BASE_GRAPHS * scale} graphs...", flush=True)
+        # One generator per scale, so a scale's data does not depend on the scales before it
+        run = benchmark_scale(scale, args, random.Random(f"{args.seed}:{scale}"))
+        dataset = run['dataset']
+        print(f"  {dataset['usedClasses']} used classes, {dataset['skosLinks']} SKOS links, "
+              f"{dataset['wikidataEntities']} Wikidata entities, {dataset['bytes'] / 1e6:.1f} MB of TTL; "
+              f"{run['stages']['total']['wallSeconds']:.2f} s")
+        results['runs'].append(run)
+
+    print_curves(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != results['parameters'] or baseline.get('mode') != results['mode']:
+            print("\nWarning: baseline was run with different parameters; comparing anyway")
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+        if regressions:
+            print(f"\n{len(regressions)} stages regressed by more than {args.tolerance:.0%}:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print(f"\nNo stage regressed by more than {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
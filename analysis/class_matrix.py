@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Sparse graph x class incidence matrix for cross-graph class usage analysis.
+
+Rows are graphs, columns are classes, and each stored entry is a weight (a
+usage count, or 1 for plain membership). The matrix is kept in compressed
+sparse row form (flat arrays of column indices and weights), so that:
+1. Set algebra between two matrices over the same columns (defined vs used)
+   is one merge of the two rows' sorted column indices, linear in the classes
+   the graph defines or uses rather than in all classes
+2. Row totals and column degrees ("classes used by k graphs") are single passes
+3. Pairwise Jaccard and cosine similarity over all graphs come from one sparse
+   product A * A^T, so the cost grows with the number of graph pairs that
+   actually share a class rather than with graphs^2 * classes
+
+Only the standard library is needed. With scipy installed, the product runs in
+scipy.sparse; without it, it is accumulated column by column in Python.
+Parquet export additionally requires pyarrow.
+
+Usage:
+  from class_matrix import IncidenceMatrix
+
+  used = IncidenceMatrix.from_rows({graph: {class_uri: count}})
+  both, only_used, only_defined = used.compare_row(defined, 0)
+  for g1, g2, shared, jaccard, cosine in used.similarities():
+      ...
+"""
+
+import csv
+import math
+from array import array
+from collections import Counter, defaultdict
+
+
+class IncidenceMatrix:
+    """Graph x class matrix in CSR form."""
+
+    def __init__(self, graphs, classes, indptr, indices, data):
+        self.graphs = graphs                        # row -> graph IRI
+        self.classes = classes                      # column -> class IRI
+        self.graph_index = {g: i for i, g in enumerate(graphs)}
+        self.class_index = {c: j for j, c in enumerate(classes)}
+        self.indptr = indptr                        # row i spans indices[indptr[i]:indptr[i + 1]]
+        self.indices = indices                      # column of each entry, sorted within a row
+        self.data = data                            # weight of each entry
+
+    @classmethod
+    def from_rows(cls, rows, graphs=None, classes=None):
+        """Build from {graph: {class: weight}} or {graph: set of classes}.
+
+        Pass graphs and classes to fix the row and column order, e.g. so two
+        matrices share rows and columns and their rows can be compared directly.
+        """
+        if graphs is None:
+            graphs = sorted(rows)
+        if classes is None:
+            classes = sorted({c for row in rows.values() for c in row})
+        class_index = {c: j for j, c in enumerate(classes)}
+
+        indptr = array('l', [0])
+        indices = array('l')
+        data = array('d')
+        for graph in graphs:
+            row = rows.get(graph, {})
+            weights = row if isinstance(row, dict) else dict.fromkeys(row, 1)
+            entries = sorted((class_index[c], float(w)) for c, w in weights.items() if c in class_index)
+            for j, w in entries:
+                indices.append(j)
+                data.append(w)
+            indptr.append(len(indices))
+        return cls(list(graphs), list(classes), indptr, indices, data)
+
+    @property
+    def shape(self):
+        return len(self.graphs), len(self.classes)
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    def row(self, graph):
+        """Return {class: weight} for one graph."""
+        i = self.graph_index[graph]
+        start, end = self.indptr[i], self.indptr[i + 1]
+        return {self.classes[j]: w for j, w in zip(self.indices[start:end], self.data[start:end])}
+
+    def row_columns(self, i):
+        """Column indices of row i, in order."""
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def compare_row(self, other, i):
+        """Compare row i with row i of other, a matrix over the same columns.
+
+        Returns (both, only here, only in other) as column index lists in
+        order, from one merge of the two sorted rows.
+        """
+        mine, theirs = self.row_columns(i), other.row_columns(i)
+        both, only_mine, only_theirs = [], [], []
+        a = b = 0
+        while a < len(mine) and b < len(theirs):
+            if mine[a] == theirs[b]:
+                both.append(mine[a])
+                a += 1
+                b += 1
+            elif mine[a] < theirs[b]:
+                only_mine.append(mine[a])
+                a += 1
+            else:
+                only_theirs.append(theirs[b])
+                b += 1
+        only_mine.extend(mine[a:])
+        only_theirs.extend(theirs[b:])
+        return both, only_mine, only_theirs
+
+    def classes_of(self, columns):
+        """Class IRIs of column indices."""
+        return [self.classes[j] for j in columns]
+
+    def row_counts(self):
+        """Number of classes in each row."""
+        return [self.indptr[i + 1] - self.indptr[i] for i in range(len(self.graphs))]
+
+    def row_totals(self):
+        """Sum of weights in each row."""
+        return [sum(self.data[self.indptr[i]:self.indptr[i + 1]]) for i in range(len(self.graphs))]
+
+    def column_degrees(self):
+        """Number of graphs using each class."""
+        degrees = array('l', bytes(8 * len(self.classes)))
+        for j in self.indices:
+            degrees[j] += 1
+        return degrees
+
+    def degree_histogram(self):
+        """{k: number of classes used by exactly k graphs}."""
+        return dict(sorted(Counter(self.column_degrees()).items()))
+
+    def columns(self):
+        """Transpose to CSC: for each column, the (row, weight) entries."""
+        columns = defaultdict(list)
+        for i in range(len(self.graphs)):
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                columns[self.indices[k]].append((i, self.data[k]))
+        return columns
+
+    def gram(self):
+        """Sparse A * A^T over the pairs of rows that share a column.
+
+        Returns parallel lists (row i, row j, shared columns, weighted dot
+        product) for every such pair with i < j, ordered by (i, j). Uses
+        scipy.sparse if it is installed.
+        """
+        try:
+            from scipy import sparse
+        except ImportError:
+            return self.gram_by_columns()
+        weights = sparse.csr_matrix((self.data, self.indices, self.indptr), shape=self.shape)
+        ones = sparse.csr_matrix(([1] * self.nnz, self.indices, self.indptr), shape=self.shape)
+        shared = sparse.triu(ones @ ones.T, k=1).tocsr()
+        shared.sort_indices()
+        shared = shared.tocoo()
+        if not shared.nnz:
+            return [], [], [], []
+        dot = (weights @ weights.T).tocsr()[shared.row, shared.col]
+        return shared.row.tolist(), shared.col.tolist(), shared.data.tolist(), dot.tolist()[0]
+
+    def gram_by_columns(self):
+        """gram() in pure Python, accumulated column by column."""
+        shared = Counter()
+        dot = defaultdict(float)
+        for entries in self.columns().values():
+            for a in range(len(entries)):
+                i, wi = entries[a]
+                for b in range(a + 1, len(entries)):
+                    j, wj = entries[b]
+                    shared[i, j] += 1
+                    dot[i, j] += wi * wj
+        pairs = sorted(shared)
+        return [i for i, _ in pairs], [j for _, j in pairs], [shared[p] for p in pairs], [dot[p] for p in pairs]
+
+    def similarities(self):
+        """Yield (graph1, graph2, shared classes, Jaccard, cosine) for every overlapping pair.
+
+        Jaccard compares the sets of classes; cosine compares the weighted rows,
+        so two graphs that put most of their instances in the same classes
+        score high even if their class lists differ.
+        """
+        sizes = self.row_counts()
+        norms = [math.sqrt(sum(w * w for w in self.data[self.indptr[i]:self.indptr[i + 1]]))
+                 for i in range(len(self.graphs))]
+        for i, j, n, dot in zip(*self.gram()):
+            jaccard = n / (sizes[i] + sizes[j] - n)
+            cosine = dot / (norms[i] * norms[j]) if norms[i] and norms[j] else 0.0
+            yield self.graphs[i], self.graphs[j], n, jaccard, cosine
+
+    def entries(self):
+        """Yield (graph, class, weight) for every stored entry."""
+        for i, graph in enumerate(self.graphs):
+            for k in range(self.indptr[i], self.indptr[i + 1]):
+                yield graph, self.classes[self.indices[k]], self.data[k]
+
+
+def write_table(path, header, rows, fmt='csv'):
+    """Write rows as CSV, or as Parquet (requires pyarrow)."""
+    rows = list(rows)
+    if fmt == 'parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet export requires pyarrow (pip install pyarrow)")
+        columns = {name: [row[k] for row in rows] for k, name in enumerate(header)}
+        pq.write_table(pa.table(columns), path)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
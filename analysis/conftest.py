@@ -0,0 +1,7 @@
+"""
+pytest configuration: with this file next to the scripts, pytest puts this
+directory on sys.path, so the tests in tests/ import them as the scripts
+import each other.
+
+  cd analysis && python -m pytest -q
+"""
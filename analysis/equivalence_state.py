@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+On-disk state for incremental runs of generate_equivalences.py.
+
+The state file (JSON) records what the previous run saw:
+1. A content hash of every TTL file in the backend data directory, and of
+   the other input files given on the command line
+2. A hash of the command-line options that shape the outputs
+3. A per-graph snapshot of used classes and counts, with its hash
+4. The SKOS link set and its groups, and the class-to-Wikidata mapping
+5. With --from-files, the facts read from each file, under its content hash
+6. Each graph's MinHash signature with a digest of its vocabulary, and the
+   vocabulary overlaps found
+7. The equivalences that were written, and the Wikidata labels used
+
+A later run compares against it to find the graphs and classes that changed.
+Only changed files are parsed again, only SKOS groups with a changed class
+are joined again, and only graphs whose vocabulary changed are signed and
+checked for overlaps again. Equivalences that touch no changed class, before
+or now, are reused as-is instead of being reassembled. The output files are
+still written in full. The Wikidata labels are a fallback for when they cannot
+be fetched; fresh ones come from the label cache.
+
+Usage:
+  state = EquivalenceState.load('equivalences_state.json')
+  if (state.ttl_hashes == ttl_file_hashes(data_dir, exclude=[output])
+          and state.options_hash == digest(options.items())):
+      ...  # nothing changed
+"""
+
+import glob
+import hashlib
+import json
+import os
+
+STATE_VERSION = 3
+
+
+def sha256_file(path):
+    """Hash a file's contents without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ttl_file_hashes(directory, exclude=(), extra=()):
+    """Return {file name: sha256} for the TTL files in a directory.
+
+    Files in extra that are elsewhere are added under their absolute path.
+    """
+    excluded = {os.path.abspath(p) for p in exclude if p}
+    hashes = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.ttl'))):
+        if os.path.abspath(path) not in excluded:
+            hashes[os.path.basename(path)] = sha256_file(path)
+    for path in extra:
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(directory) and os.path.exists(path):
+            hashes[os.path.abspath(path)] = sha256_file(path)
+    return hashes
+
+
+def digest(items):
+    """Order-independent sha256 of an iterable of string tuples."""
+    h = hashlib.sha256()
+    for item in sorted('\t'.join(map(str, i)) for i in items):
+        h.update(item.encode())
+        h.update(b'\n')
+    return h.hexdigest()
+
+
+def usage_hash(classes):
+    """Hash one graph's {class_uri: count} snapshot."""
+    return digest(classes.items())
+
+
+class EquivalenceState:
+    """Snapshot of one generator run, used to find what the next run must redo."""
+
+    def __init__(self):
+        self.ttl_hashes = {}
+        self.options_hash = None
+        self.graph_usage = {}
+        self.graph_hashes = {}
+        self.skos_hash = None
+        self.skos_pairs = []
+        self.skos_groups = None
+        self.class_to_wikidata = {}
+        self.file_facts = {}
+        self.signatures = {}
+        self.overlaps = None
+        self.wikidata_labels = {}
+        self.equivalences = {}
+
+    @classmethod
+    def load(cls, path):
+        """Load state from path, or return an empty state if it is missing or stale."""
+        state = cls()
+        if not path or not os.path.exists(path):
+            return state
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != STATE_VERSION:
+            return state
+
+        state.ttl_hashes = data['ttlHashes']
+        state.options_hash = data['optionsHash']
+        state.graph_usage = data['graphUsage']
+        state.graph_hashes = data['graphHashes']
+        state.skos_hash = data['skosHash']
+        state.skos_pairs = [tuple(p) for p in data['skosPairs']]
+        state.skos_groups = [set(g) for g in data['skosGroups']]
+        state.class_to_wikidata = data['classToWikidata']
+        state.file_facts = data['fileFacts']
+        state.signatures = {g: tuple(s) for g, s in data['signatures'].items()}
+        state.overlaps = [tuple(o) for o in data['overlaps']]
+        state.wikidata_labels = data['wikidataLabels']
+        for equiv in data['equivalences']:
+            equiv['usage'] = [tuple(u) for u in equiv['usage']]
+            state.equivalences[equiv['id']] = equiv
+        return state
+
+    def save(self, path):
+        """Write state to path, replacing the old file only once fully written."""
+        data = {
+            'version': STATE_VERSION,
+            'ttlHashes': self.ttl_hashes,
+            'optionsHash': self.options_hash,
+            'graphUsage': self.graph_usage,
+            'graphHashes': self.graph_hashes,
+            'skosHash': self.skos_hash,
+            'skosPairs': sorted(self.skos_pairs),
+            'skosGroups': sorted(sorted(g) for g in self.skos_groups or ()),
+            'classToWikidata': self.class_to_wikidata,
+            'fileFacts': self.file_facts,
+            'signatures': self.signatures,
+            'overlaps': self.overlaps or [],
+            'wikidataLabels': self.wikidata_labels,
+            'equivalences': list(self.equivalences.values()),
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def cached_facts(self, file_hashes):
+        """Return {path: facts} for the files in {path: sha256} whose contents are unchanged."""
+        cached = {}
+        for path, sha256 in file_hashes.items():
+            entry = self.file_facts.get(os.path.abspath(path))
+            if entry is not None and entry['hash'] == sha256:
+                cached[path] = entry['facts']
+        return cached
+
+    def dirty_classes(self, used_by_graph, skos_pairs, class_to_wikidata):
+        """Return the classes whose equivalences may differ from the previous run.
+
+        A class is dirty if a graph that used it (before or now) changed its
+        usage snapshot, if a SKOS link touching it appeared or disappeared, or
+        if its Wikidata mapping changed.
+        """
+        dirty = set()
+
+        for graph_uri in set(self.graph_usage) | set(used_by_graph):
+            old = self.graph_usage.get(graph_uri, {})
+            new = used_by_graph.get(graph_uri, {})
+            if self.graph_hashes.get(graph_uri) != usage_hash(new):
+                dirty.update(old)
+                dirty.update(new)
+
+        if self.skos_hash != digest(skos_pairs):
+            for class1, class2 in set(self.skos_pairs) ^ set(skos_pairs):
+                dirty.add(class1)
+                dirty.add(class2)
+
+        for class_uri in set(self.class_to_wikidata) | set(class_to_wikidata):
+            if self.class_to_wikidata.get(class_uri) != class_to_wikidata.get(class_uri):
+                dirty.add(class_uri)
+
+        return dirty
+
+    def update(self, ttl_hashes, options_hash, used_by_graph, skos_pairs, class_to_wikidata,
+               wikidata_labels, equivalences, skos_groups=None, file_facts=None, signatures=None,
+               overlaps=None):
+        """Record the inputs and outputs of the run that just finished.
+
+        file_facts is {path: (sha256, facts)} of the files read with --from-files, if any.
+        """
+        self.ttl_hashes = ttl_hashes
+        self.options_hash = options_hash
+        self.graph_usage = {g: dict(classes) for g, classes in used_by_graph.items()}
+        self.graph_hashes = {g: usage_hash(classes) for g, classes in used_by_graph.items()}
+        self.skos_pairs = list(skos_pairs)
+        self.skos_hash = digest(skos_pairs)
+        self.skos_groups = skos_groups
+        self.class_to_wikidata = dict(class_to_wikidata)
+        self.file_facts = {os.path.abspath(path): {'hash': sha256, 'facts': facts}
+                           for path, (sha256, facts) in (file_facts or {}).items()}
+        self.signatures = dict(signatures or {})
+        self.overlaps = overlaps
+        self.wikidata_labels = dict(wikidata_labels)
+        self.equivalences = {e['id']: e for e in equivalences}
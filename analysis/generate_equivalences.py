@@ -7,82 +7,166 @@ then builds equivalence groups based on:
 1. Shared classes (same class used in multiple graphs)
 2. Direct SKOS relationships (exactMatch, closeMatch, broadMatch)
 3. Indirect Wikidata relationships (classes linked via Wikidata entities)
+4. Vocabulary overlap (graphs whose normalized class vocabularies are similar,
+   found with MinHash/LSH; see vocabulary_overlap.py)
+5. Wikidata hierarchy (classes whose Wikidata entities are a few wdt:P279 hops
+   below a common ancestor, found with the LCA index of subclass_index.py)
 
-Output: _precomputed_equivalences.ttl file for the triple store
+Output: _precomputed_equivalences.ttl file for the triple store,
+graph-overview.json for the frontend's initial load, and _class_summary.ttl,
+the flattened per-graph class rows the backend's /classes listings are read from.
+The RDF outputs are streamed by rdf_writer.py, byte-identical for unchanged
+inputs, and written as gzip'd N-Triples instead when named *.nt.gz
 
 Usage:
   python3 generate_equivalences.py [--endpoint URL] [--output FILE]
+                                   [--filter-mode {all,values,join}] [--batch-size N]
+                                   [--workers N] [--timeout SECONDS] [--retries N]
+                                   [--state FILE] [--from-files TTL [TTL ...]]
+                                   [--overview FILE] [--overview-only] [--summary FILE]
+                                   [--label-cache FILE] [--label-cache-days N] [--labels-offline]
+                                   [--wikidata-endpoint URL]
+                                   [--overlap-threshold T] [--minhash-perms N]
+                                   [--subclasses TTL] [--hierarchy-hops K] [--hierarchy-min-depth D]
+                                   [--profile REPORT] [--cprofile STATS]
 """
 
 import argparse
+import gzip
 import hashlib
+import json
+import os
 import sys
-import urllib.parse
-import urllib.request
-import xml.etree.ElementTree as ET
+from array import array
 from collections import defaultdict
-from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from equivalence_state import EquivalenceState, digest, sha256_file, ttl_file_hashes
+from profiling import PROFILER
+from rdf_writer import RDF_TYPE, IRI, Blank, RdfWriter
+from sparql_client import SparqlClient, SparqlError, serialized_output
+from subclass_index import SubclassIndex
+from ttl_index import TtlIndex, dataset_version, process_count, read_rdf
+from vocabulary_overlap import find_overlaps, graph_vocabularies, overlap_classes
+from wikidata_labels import WIKIDATA_ENDPOINT, LabelCache, LabelResolver
+
+# Shared pooled client; main() replaces it with one built from the CLI options
+CLIENT = SparqlClient()
 
 
 class UnionFind:
-    """Union-Find data structure for building equivalence classes."""
+    """Union-Find data structure for building equivalence classes.
+
+    Elements are interned to integer ids, with parent and rank kept in flat
+    arrays. find() is iterative with path compression and union() is by rank,
+    so long SKOS chains neither recurse nor degrade into deep trees.
+    """
 
     def __init__(self):
-        self.parent = {}
+        self.ids = {}
+        self.elements = []
+        self.parent = array('l')
+        self.rank = bytearray()
+
+    def __len__(self):
+        return len(self.elements)
 
     def add(self, x):
-        if x not in self.parent:
-            self.parent[x] = x
+        """Return the id for x, creating a singleton set if it is new."""
+        i = self.ids.get(x)
+        if i is None:
+            i = len(self.elements)
+            self.ids[x] = i
+            self.elements.append(x)
+            self.parent.append(i)
+            self.rank.append(0)
+        return i
+
+    def _find(self, i):
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        # Point everything on the path straight at the root
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
 
     def find(self, x):
-        if x not in self.parent:
-            self.parent[x] = x
-        if self.parent[x] != x:
-            self.parent[x] = self.find(self.parent[x])
-        return self.parent[x]
+        return self.elements[self._find(self.add(x))]
+
+    def _union(self, i, j):
+        ri, rj = self._find(i), self._find(j)
+        if ri == rj:
+            return
+        rank = self.rank
+        if rank[ri] < rank[rj]:
+            ri, rj = rj, ri
+        self.parent[rj] = ri
+        if rank[ri] == rank[rj]:
+            rank[ri] += 1
 
     def union(self, x, y):
-        self.parent[self.find(x)] = self.find(y)
+        self._union(self.add(x), self.add(y))
+
+    def union_pairs(self, pairs):
+        """Union every (x, y) pair from an iterable."""
+        add = self.add
+        union = self._union
+        for x, y in pairs:
+            union(add(x), add(y))
 
     def get_groups(self):
-        """Return sets of elements grouped by their root."""
+        """Return sets of elements grouped by their root, in one pass over the ids."""
         groups = defaultdict(set)
-        for x in self.parent:
-            groups[self.find(x)].add(x)
+        elements = self.elements
+        find = self._find
+        for i in range(len(elements)):
+            groups[find(i)].add(elements[i])
         return [g for g in groups.values() if len(g) > 1]
 
 
 def query_sparql(endpoint, query):
-    """Execute SPARQL query and return parsed results."""
-    params = urllib.parse.urlencode({'query': query})
-    url = f"{endpoint}?{params}"
-
+    """Execute SPARQL query and yield result rows as they are parsed."""
     try:
-        with urllib.request.urlopen(url) as response:
-            xml_data = response.read()
-    except Exception as e:
+        yield from CLIENT.query(endpoint, query)
+    except SparqlError as e:
         print(f"Error querying SPARQL endpoint: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # Parse XML results
-    root = ET.fromstring(xml_data)
-    ns = {'sparql': 'http://www.w3.org/2005/sparql-results#'}
 
-    results = []
-    for result in root.findall('.//sparql:result', ns):
-        row = {}
-        for binding in result.findall('sparql:binding', ns):
-            name = binding.get('name')
-            uri_elem = binding.find('sparql:uri', ns)
-            literal_elem = binding.find('sparql:literal', ns)
+def profiled(name, func, *args):
+    """Call func(*args) as a named profiler phase."""
+    with PROFILER.phase(name):
+        return func(*args)
+
 
-            if uri_elem is not None:
-                row[name] = uri_elem.text
-            elif literal_elem is not None:
-                row[name] = literal_elem.text
-        results.append(row)
+def resolve(value):
+    """Return the result of a Future, or the value itself if it is not one."""
+    return value.result() if isinstance(value, Future) else value
 
-    return results
+
+def get_proto_okn_graphs(endpoint):
+    """Query every Proto-OKN graph and its title, as the frontend does on load."""
+    query = """
+    PREFIX dct: <http://purl.org/dc/terms/>
+    PREFIX linkml: <https://w3id.org/linkml/>
+    PREFIX okn: <https://purl.org/okn/>
+
+    SELECT ?graph ?graphLabel WHERE {
+      ?graph dct:isPartOf okn:proto-okn ;
+             a linkml:SchemaDefinition .
+      optional { ?graph dct:title ?graphLabel }
+    }
+    """
+
+    print("Querying Proto-OKN graphs...")
+    graphs = {}
+    for row in query_sparql(endpoint, query):
+        graphs[row['graph']] = row.get('graphLabel')
+
+    print(f"  Found {len(graphs)} Proto-OKN graphs")
+    return graphs
 
 
 def get_used_classes(endpoint):
@@ -111,13 +195,12 @@ def get_used_classes(endpoint):
     """
 
     print("Querying used classes...")
-    results = query_sparql(endpoint, query)
 
     # Build data structure: {graph_uri: {class_uri: count}}
     used_by_graph = defaultdict(dict)
     graph_labels = {}
 
-    for row in results:
+    for row in query_sparql(endpoint, query):
         graph_uri = row['graph']
         class_uri = row['classUri']
         count = row.get('count', '0')
@@ -129,132 +212,263 @@ def get_used_classes(endpoint):
     return used_by_graph, graph_labels
 
 
-def get_direct_skos_relationships(endpoint, used_classes):
-    """Query direct SKOS relationships between used classes."""
-    # Query all SKOS relationships, then filter to used classes in Python
-    query = """
+# How the used-class restriction is applied to the SKOS and Wikidata queries:
+#   all    - fetch every link in the store and filter in Python
+#   values - send the used classes to the endpoint in VALUES batches
+#   join   - join against the counts annotations on the endpoint
+FILTER_MODES = ('all', 'values', 'join')
+
+# Graph patterns restricting a class variable to classes used in some T1 graph,
+# the same graphs get_used_classes() reads
+USED_CLASS_JOIN = """
+      ?{graph} dct:isPartOf okn:proto-okn ;
+             a linkml:SchemaDefinition ;
+             linkml:annotations [
+               linkml:tag okns:counts ;
+               skos:example/linkml:classes/skos:example [ ?{var} ?{graph}Count ]
+             ] .
+"""
+
+SKOS_QUERY = """
+    PREFIX dct: <http://purl.org/dc/terms/>
+    PREFIX linkml: <https://w3id.org/linkml/>
+    PREFIX okn: <https://purl.org/okn/>
+    PREFIX okns: <https://purl.org/okn/schema/>
     PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
 
-    SELECT ?class1 ?class2 WHERE {
-      { ?class1 skos:exactMatch ?class2 }
+    SELECT DISTINCT ?class1 ?class2 WHERE {{
+      {restriction}
+      {{ ?class1 skos:exactMatch ?class2 }}
       UNION
-      { ?class1 skos:closeMatch ?class2 }
+      {{ ?class1 skos:closeMatch ?class2 }}
       UNION
-      { ?class1 skos:broadMatch ?class2 }
+      {{ ?class1 skos:broadMatch ?class2 }}
       UNION
-      { ?class1 skos:narrowMatch ?class2 }
+      {{ ?class1 skos:narrowMatch ?class2 }}
 
       FILTER(?class1 != ?class2)
-    }
+    }}
+    """
+
+WIKIDATA_QUERY = """
+    PREFIX dct: <http://purl.org/dc/terms/>
+    PREFIX linkml: <https://w3id.org/linkml/>
+    PREFIX okn: <https://purl.org/okn/>
+    PREFIX okns: <https://purl.org/okn/schema/>
+    PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+
+    SELECT DISTINCT ?class ?wikidata WHERE {{
+      {restriction}
+      ?class ^skos:exactMatch ?wikidata .
+      FILTER(STRSTARTS(STR(?wikidata), "http://www.wikidata.org/entity/"))
+    }}
     """
 
-    print("Querying direct SKOS relationships...")
-    results = query_sparql(endpoint, query)
-    print(f"  Found {len(results)} total SKOS relationships")
 
-    # Filter to only relationships between used classes
-    used_set = set(used_classes)
-    filtered = []
-    for i, row in enumerate(results):
-        if 'class1' not in row or 'class2' not in row:
-            print(f"  WARNING: Row {i} missing class1 or class2: {row}")
-            continue
-        if row['class1'] in used_set and row['class2'] in used_set:
-            filtered.append((row['class1'], row['class2']))
+def batched(items, size):
+    """Split items into lists of at most size elements."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 
+def restricted_queries(template, used_classes, variables, filter_mode, batch_size):
+    """Yield the query texts needed to fetch links touching used classes.
+
+    `variables` are the query variables that must be bound to used classes.
+    In 'values' mode the first of them is bound with VALUES batches; the
+    others are still checked in Python by the caller.
+    """
+    if filter_mode == 'all':
+        yield template.format(restriction='')
+    elif filter_mode == 'join':
+        restriction = ''.join(USED_CLASS_JOIN.format(graph=f"g{i}", var=var)
+                              for i, var in enumerate(variables))
+        yield template.format(restriction=restriction)
+    elif filter_mode == 'values':
+        for batch in batched(sorted(used_classes), batch_size):
+            values = ' '.join(f"<{uri}>" for uri in batch)
+            yield template.format(restriction=f"VALUES ?{variables[0]} {{ {values} }}")
+    else:
+        raise ValueError(f"Unknown filter mode: {filter_mode}")
+
+
+def get_direct_skos_relationships(endpoint, used_classes, filter_mode='all', batch_size=100):
+    """Query direct SKOS relationships between used classes."""
+    print(f"Querying direct SKOS relationships (filter mode: {filter_mode})...")
+
+    # Filter to only relationships between used classes as rows arrive.
+    # used_classes may still be loading (a Future); only VALUES batching
+    # needs it before the query is sent.
+    used_set = set(resolve(used_classes)) if filter_mode == 'values' else None
+    filtered = []
+    total = 0
+    queries = restricted_queries(SKOS_QUERY, used_set, ('class1', 'class2'), filter_mode, batch_size)
+    for query in queries:
+        for row in query_sparql(endpoint, query):
+            if used_set is None:
+                used_set = set(resolve(used_classes))
+            total += 1
+            if 'class1' not in row or 'class2' not in row:
+                print(f"  WARNING: Row {total - 1} missing class1 or class2: {row}")
+                continue
+            if row['class1'] in used_set and row['class2'] in used_set:
+                filtered.append((row['class1'], row['class2']))
+
+    print(f"  Found {total} total SKOS relationships")
     print(f"  Filtered to {len(filtered)} relationships between used classes")
     return filtered
 
 
-def get_wikidata_relationships(endpoint, used_classes):
+def get_wikidata_relationships(endpoint, used_classes, filter_mode='all', batch_size=100):
     """Query Wikidata-mediated relationships between used classes."""
-    # Query all Wikidata relationships, then filter in Python
+    print(f"Querying Wikidata relationships (filter mode: {filter_mode})...")
+
+    # Filter to only used classes and build mapping: {class_uri: wikidata_uri}
+    used_set = set(resolve(used_classes)) if filter_mode == 'values' else None
+    class_to_wikidata = {}
+    total = 0
+    queries = restricted_queries(WIKIDATA_QUERY, used_set, ('class',), filter_mode, batch_size)
+    for query in queries:
+        for row in query_sparql(endpoint, query):
+            if used_set is None:
+                used_set = set(resolve(used_classes))
+            total += 1
+            class_uri = row['class']
+            if class_uri in used_set:
+                wikidata_uri = row['wikidata']
+                class_to_wikidata[class_uri] = wikidata_uri
+
+    print(f"  Found {total} total class-to-Wikidata links")
+    print(f"  Filtered to {len(class_to_wikidata)} links for used classes")
+    return class_to_wikidata
+
+
+def get_class_counts(endpoint):
+    """Query the counts annotations of every schema, not only the Proto-OKN graphs."""
     query = """
+    PREFIX linkml: <https://w3id.org/linkml/>
+    PREFIX okns: <https://purl.org/okn/schema/>
     PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
 
-    SELECT ?class ?wikidata WHERE {
-      ?class ^skos:exactMatch ?wikidata .
-      FILTER(STRSTARTS(STR(?wikidata), "http://www.wikidata.org/entity/"))
+    SELECT ?graph ?classUri ?count WHERE {
+      ?graph linkml:annotations [
+        linkml:tag okns:counts ;
+        skos:example/linkml:classes/skos:example [ ?classUri ?s ]
+      ] .
+
+      # As in get_used_classes(): a bound skos:example pattern here would be
+      # evaluated first, over every skos:example triple in the store
+      ?s ?p ?count .
+      filter(?p = skos:example)
     }
     """
 
-    print("Querying Wikidata relationships...")
-    results = query_sparql(endpoint, query)
-    print(f"  Found {len(results)} total class-to-Wikidata links")
+    print("Querying class counts of all schemas...")
+    counts = defaultdict(dict)
+    for row in query_sparql(endpoint, query):
+        counts[row['graph']][row['classUri']] = row['count']
 
-    # Filter to only used classes and build mapping: {class_uri: wikidata_uri}
-    used_set = set(used_classes)
-    class_to_wikidata = {}
-    for row in results:
-        class_uri = row['class']
-        if class_uri in used_set:
-            wikidata_uri = row['wikidata']
-            class_to_wikidata[class_uri] = wikidata_uri
+    print(f"  Found counts for {len(counts)} schemas")
+    return dict(counts)
 
-    print(f"  Filtered to {len(class_to_wikidata)} links for used classes")
-    return class_to_wikidata
 
+def get_class_definitions(endpoint):
+    """Query every class definition with its class URI and defining schema.
+
+    Definitions are typed linkml:ClassDefinition in some files and
+    okns:ClassDefinition in most others; both are matched.
+
+    Returns ([(class, class_uri, scheme)], {class or scheme IRI: title}).
+    """
+    query = """
+    PREFIX dct: <http://purl.org/dc/terms/>
+    PREFIX linkml: <https://w3id.org/linkml/>
+    PREFIX okns: <https://purl.org/okn/schema/>
+    PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
 
-def fetch_wikidata_labels(wikidata_uris):
-    """Fetch labels from Wikidata for given entity URIs."""
-    print("Fetching Wikidata labels...")
+    SELECT ?class ?classUri ?scheme ?classLabel ?schemeLabel WHERE {
+      VALUES ?type { linkml:ClassDefinition okns:ClassDefinition }
+      ?class a ?type ;
+             linkml:class_uri ?classUri ;
+             skos:inScheme ?scheme .
+      optional { ?class dct:title ?classLabel }
+      optional { ?scheme dct:title ?schemeLabel }
+    }
+    """
 
+    print("Querying class definitions...")
+    definitions = set()
     labels = {}
-    wikidata_endpoint = "https://query.wikidata.org/sparql"
+    for row in query_sparql(endpoint, query):
+        definitions.add((row['class'], row['classUri'], row['scheme']))
+        if 'classLabel' in row:
+            labels[row['class']] = row['classLabel']
+        if 'schemeLabel' in row:
+            labels[row['scheme']] = row['schemeLabel']
 
-    # Build VALUES clause with all Wikidata URIs
-    values_clause = ' '.join(f"<{uri}>" for uri in wikidata_uris)
+    print(f"  Found {len(definitions)} class definitions")
+    return sorted(definitions), labels
 
-    query = f"""
-    SELECT ?entity ?label WHERE {{
-      VALUES ?entity {{ {values_clause} }}
-      ?entity rdfs:label ?label .
-      FILTER(LANG(?label) = "en")
-    }}
-    """
 
-    try:
-        results = query_sparql(wikidata_endpoint, query)
-        for row in results:
-            if 'entity' in row and 'label' in row:
-                labels[row['entity']] = row['label']
-        print(f"  Fetched {len(labels)} Wikidata labels")
-    except Exception as e:
-        print(f"  Warning: Could not fetch Wikidata labels: {e}")
-        print(f"  Continuing with entity IDs as labels")
+def all_used_classes_of(used_by_graph):
+    """Return the set of classes used in any graph."""
+    all_used_classes = set()
+    for classes in used_by_graph.values():
+        all_used_classes.update(classes.keys())
+    return all_used_classes
+
+
+def build_class_usage_index(used_by_graph):
+    """Invert {graph_uri: {class_uri: count}} to {class_uri: [(graph_uri, count)]}.
 
-    return labels
+    Built once and shared by every equivalence kind, so finding the graphs that
+    use a class is a dict lookup rather than a scan over all graphs.
+    """
+    class_usage = defaultdict(list)
+    for graph_uri, classes in used_by_graph.items():
+        for class_uri, count in classes.items():
+            class_usage[class_uri].append((graph_uri, count))
+    return class_usage
 
 
-def build_shared_class_groups(used_by_graph):
+def build_shared_class_groups(class_usage):
     """Find classes shared by multiple graphs."""
     print("Building shared class groups...")
 
-    # Invert: {class_uri: [graph_uris]}
-    class_to_graphs = defaultdict(list)
-    for graph_uri, classes in used_by_graph.items():
-        for class_uri in classes:
-            class_to_graphs[class_uri].append(graph_uri)
-
-    # Keep only classes used in 2+ graphs
-    shared = {c: graphs for c, graphs in class_to_graphs.items() if len(graphs) > 1}
+    # Keep only classes used in 2+ graphs: {class_uri: [graph_uris]}
+    shared = {c: [graph_uri for graph_uri, _ in usage]
+              for c, usage in class_usage.items() if len(usage) > 1}
     print(f"  Found {len(shared)} shared classes")
 
     return shared
 
 
-def build_skos_equivalence_classes(skos_pairs):
-    """Build equivalence classes from SKOS relationships using union-find."""
+def build_skos_equivalence_classes(skos_pairs, previous_groups=None, dirty_classes=None):
+    """Build equivalence classes from SKOS relationships using union-find.
+
+    With the previous run's groups and the classes that changed since, groups
+    without a changed class are kept as they are, and union-find only runs over
+    the links touching the others: a link that appeared or disappeared makes
+    both of its classes dirty, so no kept group can have gained or lost one.
+    """
     print("Building SKOS equivalence classes...")
 
-    uf = UnionFind()
+    kept = []
+    if previous_groups is not None and dirty_classes is not None:
+        touched = set(dirty_classes)
+        for group in previous_groups:
+            if touched.isdisjoint(group):
+                kept.append(set(group))
+            else:
+                touched.update(group)
+        skos_pairs = [(c1, c2) for c1, c2 in skos_pairs if c1 in touched or c2 in touched]
+        print(f"  Kept {len(kept)} unchanged groups; joining {len(skos_pairs)} links")
 
-    for class1, class2 in skos_pairs:
-        uf.add(class1)
-        uf.add(class2)
-        uf.union(class1, class2)
+    uf = UnionFind()
+    uf.union_pairs(skos_pairs)
 
-    groups = uf.get_groups()
+    groups = kept + uf.get_groups()
     print(f"  Found {len(groups)} SKOS equivalence groups")
 
     return groups
@@ -276,29 +490,116 @@ def build_wikidata_groups(class_to_wikidata):
     return groups
 
 
+def load_subclass_index(path):
+    """Read the Wikidata subclass hierarchy, or return None if there is none to read."""
+    if not path:
+        return None
+    if not os.path.exists(path):
+        print(f"No subclass hierarchy at {path}; skipping Wikidata hierarchy equivalences")
+        return None
+    print(f"Reading Wikidata subclass hierarchy from {path}...")
+    index = SubclassIndex.from_ttl(path)
+    print(f"  {len(index)} entities, {len(index.rows)} components")
+    return index
+
+
+def build_wikidata_hierarchy_groups(index, class_to_wikidata, max_hops=3, min_depth=3):
+    """Group classes whose Wikidata entities meet at a nearby common ancestor.
+
+    Two mapped entities are related when one of their lowest common ancestors
+    is at most max_hops wdt:P279 hops above each of them (a parent and its
+    child, siblings, cousins...) and at least min_depth below a root, since
+    ancestors like "entity" relate everything. The groups come from the
+    subclass index's LCA lookup, which never compares entities pairwise.
+
+    Returns {ancestor_uri: {'entities': {wikidata_uri: hops}, 'classes': {class_uri}}}.
+    """
+    print("Building Wikidata hierarchy groups...")
+    if index is None or max_hops < 1:
+        return {}
+
+    wikidata_to_classes = defaultdict(set)
+    for class_uri, wikidata_uri in class_to_wikidata.items():
+        wikidata_to_classes[wikidata_uri].add(class_uri)
+
+    groups = {}
+    for ancestor_uri, entities in index.lowest_common_groups(wikidata_to_classes, max_hops, min_depth).items():
+        groups[ancestor_uri] = {
+            'entities': entities,
+            'classes': set().union(*(wikidata_to_classes[wd] for wd in entities)),
+        }
+
+    print(f"  Found {len(groups)} Wikidata hierarchy groups")
+    return groups
+
+
 def hash_uri(uri):
     """Generate short hash of URI for equivalence node IDs."""
     return hashlib.md5(uri.encode()).hexdigest()[:8]
 
 
-def generate_equivalences(used_by_graph, graph_labels, shared_classes, skos_groups, wikidata_groups, wikidata_labels):
-    """Generate equivalence data structures for TTL output."""
-    equivalences = []
+def group_graph_usage(class_usage, classes):
+    """Return {graph_uri: [(class_uri, count)]} for the graphs using any of classes."""
+    graph_usage = {}
+    for class_uri in classes:
+        for graph_uri, count in class_usage.get(class_uri, ()):
+            # A graph might use multiple classes from this equiv group
+            graph_usage.setdefault(graph_uri, []).append((class_uri, count))
+    return graph_usage
+
+
+def stable_equivalence(equiv):
+    """Return equiv with its graphs, classes and usage rows sorted."""
+    stable = dict(equiv, graphs=sorted(equiv['graphs']), usage=sorted(tuple(row) for row in equiv['usage']))
+    if 'classes' in equiv:
+        stable['classes'] = sorted(equiv['classes'])
+    return stable
+
+
+def generate_equivalences(class_usage, graph_labels, shared_classes, skos_groups, wikidata_groups, wikidata_labels,
+                          previous=None, dirty_classes=None, overlaps=(), vocabularies=None,
+                          hierarchy_groups=None):
+    """Yield equivalence data structures for the outputs, in a stable order.
+
+    Each kind is generated in order of its key, with the lists of each
+    equivalence sorted, so unchanged inputs give identical output files and
+    they can be written as they are generated.
+
+    With `previous` ({equiv_id: equivalence} from the last run) and
+    `dirty_classes`, equivalences whose classes, in the previous run and now,
+    are all clean are reused instead of being reassembled. Vocabulary overlaps and Wikidata hierarchy
+    equivalences are cheap to assemble and are always rebuilt.
+    """
+    shared_count = 0
+    reused = 0
+
+    def reusable(equiv_id, classes):
+        if previous is None or dirty_classes is None or equiv_id not in previous:
+            return None
+        # A class that left the group also makes it dirty, not only those in it now
+        prior = previous[equiv_id]
+        touched = set(classes).union(prior.get('classes', ()), (row[1] for row in prior['usage']))
+        if not dirty_classes.isdisjoint(touched):
+            return None
+        return prior
 
     # 1. Shared class equivalences
     print("\nGenerating shared class equivalences...")
-    for class_uri, graph_list in shared_classes.items():
+    for class_uri, graph_list in sorted(shared_classes.items()):
         equiv_id = f"okn:equiv-shared-{hash_uri(class_uri)}"
+        prior = reusable(equiv_id, (class_uri,))
+        if prior is not None:
+            yield stable_equivalence(prior)
+            reused += 1
+            shared_count += 1
+            continue
 
         # Extract label from class URI (last part after / or #)
         class_label = class_uri.split('/')[-1].split('#')[-1]
 
-        usage = []
-        for graph_uri in graph_list:
-            count = used_by_graph[graph_uri][class_uri]
-            usage.append((graph_uri, class_uri, count))
+        usage = [(graph_uri, class_uri, count) for graph_uri, count in class_usage[class_uri]]
 
-        equivalences.append({
+        yield stable_equivalence({
             'id': equiv_id,
             'type': 'shared',
             'label': f"Shared: {class_label}",
@@ -306,23 +607,23 @@ def generate_equivalences(used_by_graph, graph_labels, shared_classes, skos_grou
             'graphs': graph_list,
             'usage': usage
         })
+        shared_count += 1
 
-    print(f"  Created {len(equivalences)} shared class equivalences")
+    print(f"  Created {shared_count} shared class equivalences")
 
     # 2. Direct SKOS equivalences
     print("Generating direct SKOS equivalences...")
     skos_count = 0
-    for equiv_class in skos_groups:
+    for equiv_class in sorted(skos_groups, key=sorted):
+        prior = reusable(f"okn:equiv-direct-{hash_uri(''.join(sorted(equiv_class)))}", equiv_class)
+        if prior is not None:
+            yield stable_equivalence(prior)
+            reused += 1
+            skos_count += 1
+            continue
+
         # Find which graphs use which classes in this equivalence group
-        graph_usage = {}
-        for class_uri in equiv_class:
-            for graph_uri in used_by_graph:
-                if class_uri in used_by_graph[graph_uri]:
-                    count = used_by_graph[graph_uri][class_uri]
-                    # A graph might use multiple classes from this equiv group
-                    if graph_uri not in graph_usage:
-                        graph_usage[graph_uri] = []
-                    graph_usage[graph_uri].append((class_uri, count))
+        graph_usage = group_graph_usage(class_usage, equiv_class)
 
         # Only create equivalence if multiple graphs are involved
         if len(graph_usage) > 1:
@@ -337,7 +638,7 @@ def generate_equivalences(used_by_graph, graph_labels, shared_classes, skos_grou
                 for class_uri, count in class_counts:
                     usage.append((graph_uri, class_uri, count))
 
-            equivalences.append({
+            yield stable_equivalence({
                 'id': equiv_id,
                 'type': 'direct',
                 'label': f"SKOS: {class_label}",
@@ -352,16 +653,17 @@ def generate_equivalences(used_by_graph, graph_labels, shared_classes, skos_grou
     # 3. Wikidata equivalences
     print("Generating Wikidata equivalences...")
     wikidata_count = 0
-    for wikidata_uri, class_set in wikidata_groups.items():
+    for wikidata_uri, class_set in sorted(wikidata_groups.items()):
+        prior = reusable(f"okn:equiv-wikidata-{wikidata_uri.split('/')[-1]}", class_set)
+        if prior is not None:
+            # Labels are looked up separately, so pick up any newly fetched one
+            yield stable_equivalence(dict(prior, label=wikidata_labels.get(wikidata_uri, prior['label'])))
+            reused += 1
+            wikidata_count += 1
+            continue
+
         # Find which graphs use which classes
-        graph_usage = {}
-        for class_uri in class_set:
-            for graph_uri in used_by_graph:
-                if class_uri in used_by_graph[graph_uri]:
-                    count = used_by_graph[graph_uri][class_uri]
-                    if graph_uri not in graph_usage:
-                        graph_usage[graph_uri] = []
-                    graph_usage[graph_uri].append((class_uri, count))
+        graph_usage = group_graph_usage(class_usage, class_set)
 
         # Only create equivalence if multiple graphs are involved
         if len(graph_usage) > 1:
@@ -376,7 +678,7 @@ def generate_equivalences(used_by_graph, graph_labels, shared_classes, skos_grou
                 for class_uri, count in class_counts:
                     usage.append((graph_uri, class_uri, count))
 
-            equivalences.append({
+            yield stable_equivalence({
                 'id': equiv_id,
                 'type': 'wikidata',
                 'label': label,
@@ -389,65 +691,307 @@ def generate_equivalences(used_by_graph, graph_labels, shared_classes, skos_grou
 
     print(f"  Created {wikidata_count} Wikidata equivalences")
 
-    return equivalences
+    # 4. Vocabulary overlaps between pairs of graphs
+    print("Generating vocabulary overlaps...")
+    # {class_uri: {graph_uri: count}}, built once rather than per usage row
+    counts = {class_uri: dict(usage) for class_uri, usage in class_usage.items()} if overlaps else {}
+    for graph1, graph2, similarity in overlaps:
+        usage = []
+        for graph_uri, classes in overlap_classes(vocabularies, graph1, graph2).items():
+            for class_uri in sorted(classes):
+                usage.append((graph_uri, class_uri, counts[class_uri][graph_uri]))
+
+        yield stable_equivalence({
+            'id': f"okn:equiv-overlap-{hash_uri(graph1 + ' ' + graph2)}",
+            'type': 'overlap',
+            'label': f"Vocabulary overlap: {similarity:.0%}",
+            'similarity': round(similarity, 3),
+            'graphs': [graph1, graph2],
+            'usage': usage
+        })
+
+    print(f"  Created {len(overlaps)} vocabulary overlaps")
+
+    # 5. Wikidata hierarchy equivalences, named after the common ancestor
+    print("Generating Wikidata hierarchy equivalences...")
+    hierarchy_count = 0
+    for ancestor_uri, group in sorted((hierarchy_groups or {}).items()):
+        graph_usage = group_graph_usage(class_usage, sorted(group['classes']))
+        if len(graph_usage) < 2:
+            continue
+        ancestor_id = ancestor_uri.split('/')[-1]
+        usage = []
+        for graph_uri, class_counts in graph_usage.items():
+            for class_uri, count in class_counts:
+                usage.append((graph_uri, class_uri, count))
+
+        yield stable_equivalence({
+            'id': f"okn:equiv-hierarchy-{ancestor_id}",
+            'type': 'hierarchy',
+            'label': f"Wikidata hierarchy: {wikidata_labels.get(ancestor_uri, ancestor_id)}",
+            'wikidataAncestor': ancestor_uri,
+            'wikidataEntities': sorted(group['entities']),
+            'hops': max(group['entities'].values()),
+            'classes': sorted(group['classes']),
+            'graphs': list(graph_usage.keys()),
+            'usage': usage
+        })
+        hierarchy_count += 1
+
+    print(f"  Created {hierarchy_count} Wikidata hierarchy equivalences")
+    if previous is not None:
+        print(f"  Reused {reused} unchanged equivalences from the previous run")
+
 
+OKN = 'https://purl.org/okn/'
+RDFS_LABEL = 'http://www.w3.org/2000/01/rdf-schema#label'
 
-def generate_ttl(equivalences, graph_labels, output_file):
-    """Generate TTL file from equivalence data."""
-    print(f"\nGenerating TTL output to {output_file}...")
+EQUIVALENCE_TYPES = {
+    'shared': OKN + 'SharedClassEquivalence',
+    'direct': OKN + 'DirectClassEquivalence',
+    'wikidata': OKN + 'WikidataEquivalence',
+    'overlap': OKN + 'VocabularyOverlap',
+    'hierarchy': OKN + 'WikidataHierarchyEquivalence',
+}
 
-    with open(output_file, 'w') as f:
-        # Write header
-        f.write(f"""# Precomputed Equivalence Relationships for OKN Map
-# Generated: {datetime.now().isoformat()}
-# Total equivalences: {len(equivalences)}
+OUTPUT_PREFIXES = {
+    'okn': OKN,
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'rdfs': 'http://www.w3.org/2000/01/rdf-schema#',
+    'xsd': 'http://www.w3.org/2001/XMLSchema#',
+}
 
-@prefix okn: <https://purl.org/okn/> .
-@prefix okns: <https://purl.org/okn/schema/> .
-@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
-@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
-@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
 
-""")
+def count_term(count):
+    """A count as an integer literal, or as a plain literal if it is not an integer."""
+    try:
+        return int(count)
+    except (TypeError, ValueError):
+        return str(count)
+
+
+def equivalence_pairs(equiv):
+    """The (predicate, object) pairs of one equivalence node."""
+    pairs = [(RDF_TYPE, IRI(EQUIVALENCE_TYPES[equiv['type']])), (RDFS_LABEL, equiv['label'])]
+    if equiv['type'] == 'shared':
+        pairs.append((OKN + 'sharedClass', IRI(equiv['sharedClass'])))
+    elif equiv['type'] == 'wikidata':
+        pairs.append((OKN + 'wikidataEntity', IRI(equiv['wikidataEntity'])))
+    elif equiv['type'] == 'overlap':
+        pairs.append((OKN + 'similarity', float(equiv['similarity'])))
+    elif equiv['type'] == 'hierarchy':
+        pairs.append((OKN + 'wikidataAncestor', IRI(equiv['wikidataAncestor'])))
+        pairs.extend((OKN + 'wikidataEntity', IRI(wikidata_uri)) for wikidata_uri in equiv['wikidataEntities'])
+        pairs.append((OKN + 'hops', equiv['hops']))
+    pairs.extend((OKN + 'equivalentClass', IRI(class_uri)) for class_uri in equiv.get('classes', ()))
+    pairs.extend((OKN + 'inGraph', IRI(graph_uri)) for graph_uri in equiv['graphs'])
+    for graph_uri, class_uri, count in equiv['usage']:
+        pairs.append((OKN + 'usage', Blank([
+            (OKN + 'graph', IRI(graph_uri)),
+            (OKN + 'class', IRI(class_uri)),
+            (OKN + 'count', count_term(count)),
+        ])))
+    return pairs
+
+
+def write_equivalences(equivalences, output_file):
+    """Stream equivalences to output_file as they are generated; return them as a list.
+
+    Written as Turtle, or as N-Triples for a .nt or .nt.gz file (see rdf_writer.py).
+    """
+    print(f"\nWriting equivalences to {output_file}...")
 
-        # Write each equivalence
+    written = []
+    header = "Precomputed Equivalence Relationships for OKN Map\nGenerated by analysis/generate_equivalences.py"
+    with RdfWriter.open(output_file, OUTPUT_PREFIXES, header) as writer:
         for equiv in equivalences:
-            equiv_id = equiv['id']
+            writer.subject(IRI(OKN + equiv['id'].split(':', 1)[1]), equivalence_pairs(equiv))
+            written.append(equiv)
+
+    print(f"  Wrote {len(written)} equivalences")
+    return written
 
-            if equiv['type'] == 'shared':
-                f.write(f"\n{equiv_id} a okn:SharedClassEquivalence ;\n")
-                f.write(f"    rdfs:label \"{equiv['label']}\" ;\n")
-                f.write(f"    okn:sharedClass <{equiv['sharedClass']}> ;\n")
 
-            elif equiv['type'] == 'direct':
-                f.write(f"\n{equiv_id} a okn:DirectClassEquivalence ;\n")
-                f.write(f"    rdfs:label \"{equiv['label']}\" ;\n")
-                for class_uri in equiv['classes']:
-                    f.write(f"    okn:equivalentClass <{class_uri}> ;\n")
+OVERVIEW_VERSION = 2
 
-            elif equiv['type'] == 'wikidata':
-                f.write(f"\n{equiv_id} a okn:WikidataEquivalence ;\n")
-                f.write(f"    rdfs:label \"{equiv['label']}\" ;\n")
-                f.write(f"    okn:wikidataEntity <{equiv['wikidataEntity']}> ;\n")
-                for class_uri in equiv['classes']:
-                    f.write(f"    okn:equivalentClass <{class_uri}> ;\n")
 
-            # Write graphs
-            for graph_uri in equiv['graphs']:
-                f.write(f"    okn:inGraph <{graph_uri}> ;\n")
+def write_overview(proto_okn_graphs, equivalences, output_file, dataset=None):
+    """Write the compact graph overview the frontend loads instead of querying.
 
-            # Write usage blocks
-            for i, (graph_uri, class_uri, count) in enumerate(equiv['usage']):
-                is_last = (i == len(equiv['usage']) - 1)
-                f.write(f"    okn:usage [\n")
-                f.write(f"        okn:graph <{graph_uri}> ;\n")
-                f.write(f"        okn:class <{class_uri}> ;\n")
-                f.write(f"        okn:count {count}\n")
-                f.write(f"    ]{'.' if is_last else ' ;'}\n")
+    Holds the Proto-OKN graph nodes, the equivalence nodes and one usage row per
+    edge, mirroring the rows of the frontend's equivalences query: rows are
+    [equivalence index, graph index, class IRI or null, count or null]. A gzip
+    copy is written alongside for nginx's gzip_static.
+
+    dataset is the backend's dataset version of the data the overview was read
+    from; the frontend only uses an overview whose dataset version matches the
+    one the backend's /catalogue reports.
+    """
+    print(f"\nGenerating graph overview to {output_file}...")
+
+    graph_uris = sorted(proto_okn_graphs)
+    for equiv in equivalences:
+        graph_uris.extend(g for g in equiv['graphs'] if g not in proto_okn_graphs)
+    graph_index = {uri: i for i, uri in enumerate(dict.fromkeys(graph_uris))}
+
+    ordered = sorted(equivalences, key=lambda e: e['id'])
+    usage_rows = []
+    for i, equiv in enumerate(ordered):
+        for graph_uri in equiv['graphs']:
+            rows = [(c, count) for g, c, count in equiv['usage'] if g == graph_uri] or [(None, None)]
+            for class_uri, count in rows:
+                usage_rows.append([i, graph_index[graph_uri], class_uri, count])
+
+    overview = {
+        'version': OVERVIEW_VERSION,
+        'dataset': dataset,
+        'graphs': [{'iri': uri, 'label': proto_okn_graphs.get(uri)} for uri in graph_index],
+        'equivalences': [{
+            'iri': OKN + equiv['id'].split(':', 1)[1],
+            'type': EQUIVALENCE_TYPES[equiv['type']],
+            'label': equiv['label'],
+        } for equiv in ordered],
+        'usage': usage_rows,
+    }
 
-        f.write("\n")
+    data = json.dumps(overview, separators=(',', ':'), sort_keys=True).encode()
+    with open(output_file, 'wb') as f:
+        f.write(data)
+    # mtime=0 keeps the gzip bytes identical when the overview is unchanged
+    with open(f"{output_file}.gz", 'wb') as f:
+        f.write(gzip.compress(data, mtime=0))
 
-    print(f"  Wrote {len(equivalences)} equivalences")
+    print(f"  Wrote {len(graph_index)} graphs, {len(ordered)} equivalences, {len(usage_rows)} usage edges")
+
+
+def read_equivalences(path):
+    """Read the equivalences written by write_equivalences() back from path.
+
+    Returns the fields write_overview() uses: id, type, label, graphs and usage,
+    with the counts as their literals' text, as they are when queried.
+    """
+    from rdflib import Graph, URIRef
+
+    text, fmt = read_rdf(path)
+    g = Graph()
+    g.parse(data=text, format=fmt, publicID=path)
+    types = {iri: key for key, iri in EQUIVALENCE_TYPES.items()}
+    equivalences = []
+    for node, type_iri in g.subject_objects(URIRef(RDF_TYPE)):
+        if str(type_iri) not in types or not str(node).startswith(OKN):
+            continue
+        label = g.value(node, URIRef(RDFS_LABEL))
+        usage = []
+        for row in g.objects(node, URIRef(OKN + 'usage')):
+            count = g.value(row, URIRef(OKN + 'count'))
+            usage.append((str(g.value(row, URIRef(OKN + 'graph'))), str(g.value(row, URIRef(OKN + 'class'))),
+                          str(count) if count is not None else None))
+        equivalences.append({
+            'id': 'okn:' + str(node)[len(OKN):],
+            'type': types[str(type_iri)],
+            'label': str(label) if label is not None else None,
+            'graphs': sorted(str(graph) for graph in g.objects(node, URIRef(OKN + 'inGraph'))),
+            'usage': sorted(usage),
+        })
+    return equivalences
+
+
+def write_served_overview(paths, equivalences_file, output_file, workers=None):
+    """Write the graph overview of the data the backend serves from paths, without regenerating it.
+
+    The graphs come from paths and the equivalences from equivalences_file, one
+    of them, so the overview holds exactly what the backend serves, stamped with
+    the dataset version it reports for paths.
+    """
+    print(f"Reading the Proto-OKN graphs from {len(paths)} TTL files...")
+    proto_okn_graphs = TtlIndex.build(paths, workers=workers).proto_okn_graphs()
+    print(f"Reading equivalences from {equivalences_file}...")
+    equivalences = read_equivalences(equivalences_file)
+    write_overview(proto_okn_graphs, equivalences, output_file, dataset=dataset_version(paths))
+
+
+def build_class_summary(class_counts, definitions):
+    """Flatten class definitions and counts annotations into one row per (graph, class).
+
+    Rows are (graph, class, class_uri, scheme, count or None): a row for every
+    class definition whose class URI a schema counts, and one for every class
+    definition in its own schema. These are the rows of the backend's defined
+    and used /classes listings, which would otherwise join the class
+    definitions with the counts annotations.
+    """
+    by_class_uri = defaultdict(list)
+    for class_iri, class_uri, scheme in definitions:
+        by_class_uri[class_uri].append((class_iri, scheme))
+
+    rows = {}
+    for graph_uri, classes in class_counts.items():
+        for class_uri, count in classes.items():
+            for class_iri, scheme in by_class_uri.get(class_uri, ()):
+                rows[graph_uri, class_iri, scheme] = (class_uri, count)
+    for class_iri, class_uri, scheme in definitions:
+        rows.setdefault((scheme, class_iri, scheme), (class_uri, None))
+    return [(g, c, uri, scheme, count) for (g, c, scheme), (uri, count) in sorted(rows.items())]
+
+
+def write_class_summary(rows, labels, output_file):
+    """Write the class summary as one okn:ClassSummary node per row.
+
+    Labels are copied onto the rows, so the backend's class listings read each
+    row's own properties, with no joins.
+    """
+    print(f"\nGenerating class summary to {output_file}...")
+
+    header = ("Per-graph class summary for the OKN Map class listings\n"
+              "Generated by analysis/generate_equivalences.py from the counts annotations")
+    with RdfWriter.open(output_file, {'okn': OKN}, header) as writer:
+        for graph_uri, class_iri, class_uri, scheme, count in rows:
+            pairs = [
+                (RDF_TYPE, IRI(OKN + 'ClassSummary')),
+                (OKN + 'summaryOf', IRI(graph_uri)),
+                (OKN + 'classDefinition', IRI(class_iri)),
+                (OKN + 'classUri', IRI(class_uri)),
+                (OKN + 'definedIn', IRI(scheme)),
+            ]
+            if class_iri in labels:
+                pairs.append((OKN + 'classLabel', labels[class_iri]))
+            if scheme in labels:
+                pairs.append((OKN + 'definedInLabel', labels[scheme]))
+            if count is not None:
+                pairs.append((OKN + 'count', count_term(count)))
+            pairs.append((OKN + 'defined', graph_uri == scheme))
+            writer.subject(IRI(f"{OKN}summary-{hash_uri(' '.join((graph_uri, class_iri, scheme)))}"), pairs)
+
+    print(f"  Wrote {len(rows)} class summary rows")
+
+
+def output_paths(args):
+    """Every file a run writes."""
+    paths = [args.output, args.overview, args.overview + '.gz']
+    if args.summary:
+        paths.append(args.summary)
+    return paths
+
+
+def subclasses_path(args):
+    if args.hierarchy_hops <= 0:
+        return None
+    return args.subclasses or os.path.join(os.path.dirname(os.path.abspath(args.output)), '_subclasses.ttl')
+
+
+def run_options(args):
+    """The options that shape the outputs, for the incremental state: changing one means a full run."""
+    return {
+        'source': sorted(os.path.abspath(p) for p in args.from_files) if args.from_files else args.endpoint,
+        'outputs': [os.path.abspath(p) for p in output_paths(args)],
+        'overlapThreshold': args.overlap_threshold,
+        'minhashPerms': args.minhash_perms,
+        'subclasses': os.path.abspath(subclasses_path(args)) if subclasses_path(args) else None,
+        'hierarchyHops': args.hierarchy_hops,
+        'hierarchyMinDepth': args.hierarchy_min_depth,
+        'wikidataEndpoint': args.wikidata_endpoint,
+        'labelsOffline': args.labels_offline,
+        'overviewVersion': OVERVIEW_VERSION,
+    }
 
 
 def main():
@@ -455,47 +999,256 @@ def main():
     parser.add_argument('--endpoint', default='http://localhost:8000',
                         help='SPARQL endpoint URL (default: http://localhost:8000)')
     parser.add_argument('--output', default='../docker-backend/_precomputed_equivalences.ttl',
-                        help='Output TTL file (default: ../docker-backend/_precomputed_equivalences.ttl)')
+                        help='Output file: Turtle, or N-Triples if it ends in .nt or .nt.gz '
+                             '(default: ../docker-backend/_precomputed_equivalences.ttl)')
+    parser.add_argument('--filter-mode', choices=FILTER_MODES, default='all',
+                        help='Where to restrict SKOS/Wikidata links to used classes: '
+                             'all (in Python), values (VALUES batches) or join '
+                             '(against counts annotations) (default: all)')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Used classes per VALUES batch in values mode (default: 100)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Queries run concurrently, or with --from-files processes parsing files, '
+                             'at most one per CPU core (default: 4)')
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='Per-query socket timeout in seconds (default: 120)')
+    parser.add_argument('--retries', type=int, default=3,
+                        help='Retries for a failed query, with exponential backoff (default: 3)')
+    parser.add_argument('--overview', default='../public/graph-overview.json',
+                        help='Graph overview JSON for the frontend (default: ../public/graph-overview.json)')
+    parser.add_argument('--overview-only', action='store_true',
+                        help='Only write the overview, of the data the backend serves from --from-files, '
+                             'with the equivalences read from --output, one of those files')
+    parser.add_argument('--summary', default='../docker-backend/_class_summary.ttl',
+                        help='Per-graph class summary TTL for the backend\'s class listings (.nt or .nt.gz for N-Triples); '
+                             'empty to skip (default: ../docker-backend/_class_summary.ttl)')
+    parser.add_argument('--from-files', nargs='+', metavar='TTL', default=None,
+                        help='Read these TTL files in-process instead of querying --endpoint')
+    parser.add_argument('--state', default=None,
+                        help='State file for incremental runs: with --from-files only changed files are '
+                             'parsed, and only SKOS groups, overlaps and equivalences touched by changed '
+                             'graphs or links are recomputed; the endpoint is still queried in full, and '
+                             'the output files are always rewritten in full (default: off)')
+    parser.add_argument('--label-cache', default='wikidata_labels.json',
+                        help='On-disk Wikidata label cache; empty to disable (default: wikidata_labels.json)')
+    parser.add_argument('--label-cache-days', type=float, default=30,
+                        help='Days before a cached label is fetched again (default: 30)')
+    parser.add_argument('--labels-offline', action='store_true',
+                        help='Never query Wikidata; use only cached labels and labels in the TTL data')
+    parser.add_argument('--wikidata-endpoint', default=WIKIDATA_ENDPOINT,
+                        help=f'Wikidata SPARQL endpoint for labels (default: {WIKIDATA_ENDPOINT})')
+    parser.add_argument('--overlap-threshold', type=float, default=0.5,
+                        help='Jaccard similarity of normalized class vocabularies above which a pair '
+                             'of graphs gets a VocabularyOverlap; 0 disables (default: 0.5)')
+    parser.add_argument('--minhash-perms', type=int, default=128,
+                        help='MinHash signature length for the overlap search (default: 128)')
+    parser.add_argument('--subclasses', default=None,
+                        help='Wikidata wdt:P279 edges for hierarchy equivalences '
+                             '(default: _subclasses.ttl next to --output)')
+    parser.add_argument('--hierarchy-hops', type=int, default=3,
+                        help='Most wdt:P279 hops from each Wikidata entity up to the common ancestor '
+                             'of a WikidataHierarchyEquivalence; 0 disables (default: 3)')
+    parser.add_argument('--hierarchy-min-depth', type=int, default=3,
+                        help='Least depth below a hierarchy root of that common ancestor, leaving out '
+                             'generic ones like "entity" (default: 3)')
+    parser.add_argument('--profile', metavar='REPORT', default=None,
+                        help='Write per-phase wall time, peak memory, rows and bytes to this JSON file')
+    parser.add_argument('--cprofile', metavar='STATS', default=None,
+                        help='With --profile, also dump cProfile stats of the main thread to this file')
     args = parser.parse_args()
+    if args.cprofile and not args.profile:
+        parser.error('--cprofile requires --profile')
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.overview_only:
+        if not args.from_files or os.path.abspath(args.output) not in map(os.path.abspath, args.from_files):
+            parser.error('--overview-only needs --from-files, the files the backend serves, including --output')
+        write_served_overview(args.from_files, args.output, args.overview, workers=args.workers)
+        return
+
+    if args.profile:
+        PROFILER.start(cprofile=bool(args.cprofile))
 
     print("OKN Map - Equivalence Generator")
     print("=" * 80)
-    print(f"SPARQL Endpoint: {args.endpoint}")
+    if args.from_files:
+        print(f"Input Files: {len(args.from_files)} TTL files")
+    else:
+        print(f"SPARQL Endpoint: {args.endpoint}")
     print(f"Output File: {args.output}")
     print()
 
-    # Step 1: Get all used classes
-    used_by_graph, graph_labels = get_used_classes(args.endpoint)
+    subclasses = subclasses_path(args)
+
+    # Incremental mode: skip the whole run if no input file or option changed and every output is there
+    state = None
+    if args.state:
+        with PROFILER.phase('state:load'):
+            state = EquivalenceState.load(args.state)
+            data_dir = os.path.dirname(os.path.abspath(args.output))
+            ttl_hashes = ttl_file_hashes(data_dir, exclude=[args.output, args.summary],
+                                         extra=(args.from_files or []) + ([subclasses] if subclasses else []))
+            options_hash = digest(run_options(args).items())
+        if state.ttl_hashes == ttl_hashes and state.options_hash == options_hash and \
+                all(os.path.exists(p) for p in output_paths(args)):
+            print("No TTL files or options changed since the last run; outputs are up to date.")
+            PROFILER.write_report(args.profile, args.cprofile)
+            return
+        if state.options_hash != options_hash:
+            # Equivalences and overlaps found with other options cannot be reused
+            state.equivalences = {}
+            state.signatures = {}
+            state.overlaps = None
+        print(f"Incremental run: {len(state.equivalences)} equivalences in previous state")
+
+    global CLIENT
+    CLIENT = SparqlClient(timeout=args.timeout, retries=args.retries)
+    label_cache = LabelCache(args.label_cache or None, ttl_days=args.label_cache_days)
+    labels = LabelResolver(CLIENT, cache=label_cache, endpoint=args.wikidata_endpoint,
+                           offline=args.labels_offline,
+                           fallback_labels=state.wikidata_labels if state else {})
+
+    if args.from_files:
+        # Offline mode: answer the same queries from an in-memory index of the files,
+        # parsing only those that changed since the last incremental run
+        file_hashes, cached = {}, {}
+        if state is not None:
+            file_hashes = {p: sha256_file(p) for p in args.from_files}
+            cached = state.cached_facts(file_hashes)
+            print(f"{len(cached)} TTL files unchanged since the last run")
+        parse = [p for p in args.from_files if p not in cached]
+        processes = process_count(args.workers, len(parse))
+        print(f"Reading {len(parse)} TTL files in {processes} worker "
+              f"{'process' if processes == 1 else 'processes'}...")
+        with PROFILER.phase('parse:ttl_files'):
+            index = TtlIndex.build(args.from_files, workers=args.workers, cached=cached)
+            PROFILER.count(rows=len(parse), bytes=sum(os.path.getsize(p) for p in parse))
+        proto_okn_graphs = index.proto_okn_graphs()
+        used_by_graph, graph_labels = index.used_classes()
+        all_used_classes = all_used_classes_of(used_by_graph)
+        print(f"  Found {len(used_by_graph)} graphs with {sum(len(v) for v in used_by_graph.values())} used classes")
+
+        skos_pairs = index.direct_skos_relationships(all_used_classes)
+        print(f"  Found {len(skos_pairs)} SKOS relationships between used classes")
+        class_to_wikidata = index.wikidata_relationships(all_used_classes)
+        print(f"  Found {len(class_to_wikidata)} Wikidata links for used classes")
+        class_counts = index.class_counts()
+        class_definitions, class_labels = index.class_definitions()
+        print(f"  Found {len(class_definitions)} class definitions")
+        wikidata_groups = profiled('group:wikidata', build_wikidata_groups, class_to_wikidata)
+        subclass_index = profiled('parse:subclasses', load_subclass_index, subclasses)
+        hierarchy_groups = profiled('group:wikidata_hierarchy', build_wikidata_hierarchy_groups, subclass_index,
+                                    class_to_wikidata, args.hierarchy_hops, args.hierarchy_min_depth)
+
+        labels.local_labels.update(index.wikidata_labels)
+        wikidata_labels = profiled('labels:wikidata', labels.resolve, list(wikidata_groups) + list(hierarchy_groups))
+    else:
+        # Step 1: Run the endpoint queries concurrently. The SKOS and Wikidata
+        # queries only need the used classes once their rows start arriving.
+        # Their progress lines are printed as they go, whole lines at a time.
+        with serialized_output(), ThreadPoolExecutor(max_workers=args.workers) as pool:
+            graphs_future = pool.submit(profiled, 'query:graphs', get_proto_okn_graphs, args.endpoint)
+            used_future = pool.submit(profiled, 'query:used_classes', get_used_classes, args.endpoint)
+            all_used_future = pool.submit(lambda: all_used_classes_of(used_future.result()[0]))
+
+            skos_future = pool.submit(profiled, 'query:skos', get_direct_skos_relationships, args.endpoint,
+                                      all_used_future, args.filter_mode, args.batch_size)
+            wikidata_future = pool.submit(profiled, 'query:wikidata', get_wikidata_relationships, args.endpoint,
+                                          all_used_future, args.filter_mode, args.batch_size)
+            # Labels depend only on the Wikidata groups, so chain them after that query.
+            # Every task only waits on tasks submitted before it, so any pool size works.
+            wikidata_groups_future = pool.submit(
+                lambda: profiled('group:wikidata', build_wikidata_groups, wikidata_future.result()))
+            subclass_index_future = pool.submit(profiled, 'parse:subclasses', load_subclass_index, subclasses)
+            hierarchy_groups_future = pool.submit(
+                lambda: profiled('group:wikidata_hierarchy', build_wikidata_hierarchy_groups,
+                                 subclass_index_future.result(), wikidata_future.result(),
+                                 args.hierarchy_hops, args.hierarchy_min_depth))
+            labels_future = pool.submit(
+                lambda: profiled('labels:wikidata', labels.resolve,
+                                 list(wikidata_groups_future.result()) + list(hierarchy_groups_future.result())))
+            counts_future = definitions_future = None
+            if args.summary:
+                counts_future = pool.submit(profiled, 'query:class_counts', get_class_counts, args.endpoint)
+                definitions_future = pool.submit(profiled, 'query:class_definitions', get_class_definitions,
+                                                 args.endpoint)
+
+            proto_okn_graphs = graphs_future.result()
+            used_by_graph, graph_labels = used_future.result()
+            all_used_classes = all_used_future.result()
+            skos_pairs = skos_future.result()
+            class_to_wikidata = wikidata_future.result()
+            wikidata_groups = wikidata_groups_future.result()
+            hierarchy_groups = hierarchy_groups_future.result()
+            wikidata_labels = labels_future.result()
+            if args.summary:
+                class_counts = counts_future.result()
+                class_definitions, class_labels = definitions_future.result()
+    CLIENT.close()
+    label_cache.save()
 
-    all_used_classes = set()
-    for classes in used_by_graph.values():
-        all_used_classes.update(classes.keys())
     print(f"\nTotal unique used classes: {len(all_used_classes)}")
 
     # Step 2: Build equivalence groups
-    shared_classes = build_shared_class_groups(used_by_graph)
-
-    skos_pairs = get_direct_skos_relationships(args.endpoint, all_used_classes)
-    skos_groups = build_skos_equivalence_classes(skos_pairs)
-
-    class_to_wikidata = get_wikidata_relationships(args.endpoint, all_used_classes)
-    wikidata_groups = build_wikidata_groups(class_to_wikidata)
-
-    # Fetch Wikidata labels for all Wikidata entities
-    wikidata_labels = fetch_wikidata_labels(list(wikidata_groups.keys()))
-
-    # Step 3: Generate equivalence data structures
-    equivalences = generate_equivalences(
-        used_by_graph, graph_labels,
-        shared_classes, skos_groups, wikidata_groups, wikidata_labels
-    )
-
-    # Step 4: Write TTL output
-    generate_ttl(equivalences, graph_labels, args.output)
+    with PROFILER.phase('group:class_usage_index'):
+        class_usage = build_class_usage_index(used_by_graph)
+        PROFILER.count(rows=sum(len(v) for v in used_by_graph.values()))
+    shared_classes = profiled('group:shared_classes', build_shared_class_groups, class_usage)
+
+    previous = dirty_classes = None
+    if state is not None:
+        previous = state.equivalences
+        dirty_classes = state.dirty_classes(used_by_graph, skos_pairs, class_to_wikidata)
+        print(f"{len(dirty_classes)} classes changed since the previous run")
+
+    with PROFILER.phase('union_find:skos'):
+        skos_groups = build_skos_equivalence_classes(skos_pairs, state.skos_groups if state else None,
+                                                     dirty_classes)
+        PROFILER.count(rows=len(skos_pairs))
+
+    overlaps, vocabularies = [], None
+    signatures = state.signatures if state else None
+    if args.overlap_threshold > 0:
+        print("Finding graphs with overlapping vocabularies...")
+        with PROFILER.phase('overlap:minhash_lsh'):
+            vocabularies = graph_vocabularies(used_by_graph, skos_groups, class_to_wikidata)
+            overlaps = find_overlaps(vocabularies, args.overlap_threshold, args.minhash_perms,
+                                     signatures=signatures, previous=state.overlaps if state else None)
+            PROFILER.count(rows=len(vocabularies))
+        print(f"  Found {len(overlaps)} graph pairs with Jaccard similarity >= {args.overlap_threshold}")
+
+    # Step 3: Generate equivalence data structures, writing each to the output as it is generated
+
+    with PROFILER.phase('write:equivalences'):
+        equivalences = write_equivalences(generate_equivalences(
+            class_usage, graph_labels,
+            shared_classes, skos_groups, wikidata_groups, wikidata_labels,
+            previous, dirty_classes, overlaps, vocabularies, hierarchy_groups
+        ), args.output)
+        PROFILER.count(rows=len(equivalences), bytes=os.path.getsize(args.output))
+
+    # Step 4: Write the other outputs
+    with PROFILER.phase('write:overview'):
+        write_overview(proto_okn_graphs, equivalences, args.overview)
+        PROFILER.count(rows=len(equivalences), bytes=os.path.getsize(args.overview))
+    if args.summary:
+        with PROFILER.phase('write:class_summary'):
+            summary_rows = build_class_summary(class_counts, class_definitions)
+            write_class_summary(summary_rows, class_labels, args.summary)
+            PROFILER.count(rows=len(summary_rows), bytes=os.path.getsize(args.summary))
+
+    if state is not None:
+        with PROFILER.phase('state:save'):
+            file_facts = {p: (file_hashes[p], index.file_facts[p]) for p in args.from_files or ()}
+            state.update(ttl_hashes, options_hash, used_by_graph, skos_pairs, class_to_wikidata,
+                         wikidata_labels, equivalences, skos_groups, file_facts, signatures, overlaps)
+            state.save(args.state)
+        print(f"  Saved incremental state to {args.state}")
 
     print("\n" + "=" * 80)
     print("Equivalence generation complete!")
     print(f"Total equivalences: {len(equivalences)}")
+    PROFILER.write_report(args.profile, args.cprofile)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Phase-level profiling for the analysis scripts.
+
+Scripts wrap each phase of their work (a SPARQL query, a file parse, the
+union-find, group assembly, an output write) in PROFILER.phase(name). When
+profiling is enabled with --profile, each phase records:
+1. Wall time
+2. Peak traced memory (tracemalloc) while the phase ran
+3. Rows processed and bytes transferred, reported with PROFILER.count()
+
+The report is written as JSON, so slow runs can be compared and attributed to
+the endpoint, the parsing or the Python grouping. A cProfile dump of the main
+thread can be written alongside it.
+
+Phases may run in worker threads. Counts go to the innermost phase open in
+the calling thread. tracemalloc has a single peak counter per process, so it
+is reset only when a phase starts with no other phase running; the peak of
+phases that overlapped in time is the peak of the overlap, an upper bound.
+
+When profiling is disabled, phase() and count() do nothing.
+
+Usage:
+  from profiling import PROFILER
+
+  PROFILER.start(cprofile=True)
+  with PROFILER.phase('query:used_classes'):
+      for row in rows:
+          PROFILER.count(rows=1)
+  PROFILER.write_report('profile.json', cprofile_path='profile.pstats')
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+REPORT_VERSION = 1
+
+
+class Phase:
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.thread = threading.current_thread().name
+        self.rows = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+        self.wall = None
+        self.peak = None
+
+    def as_dict(self, origin):
+        return {
+            'name': self.name,
+            'parent': self.parent.name if self.parent else None,
+            'thread': self.thread,
+            'startSeconds': round(self.start - origin, 6),
+            'wallSeconds': round(self.wall, 6),
+            'peakMemoryBytes': self.peak,
+            'rows': self.rows,
+            'bytes': self.bytes,
+        }
+
+
+class Profiler:
+    """Collects phases from any thread; a no-op until start() is called."""
+
+    def __init__(self):
+        self.enabled = False
+        self.phases = []
+        self.origin = None
+        self.profile = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def start(self, cprofile=False):
+        self.enabled = True
+        self.origin = time.perf_counter()
+        tracemalloc.start()
+        if cprofile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield None
+            return
+        stack = self._stack()
+        with self._lock:
+            if not self._running:
+                tracemalloc.reset_peak()
+            self._running += 1
+        phase = Phase(name, stack[-1] if stack else None)
+        stack.append(phase)
+        try:
+            yield phase
+        finally:
+            stack.pop()
+            phase.wall = time.perf_counter() - phase.start
+            with self._lock:
+                phase.peak = tracemalloc.get_traced_memory()[1]
+                self._running -= 1
+                self.phases.append(phase)
+
+    def count(self, rows=0, bytes=0):
+        """Add rows processed and bytes transferred to the current thread's phase."""
+        if not self.enabled:
+            return
+        stack = self._stack()
+        if stack:
+            stack[-1].rows += rows
+            stack[-1].bytes += bytes
+
+    def write_report(self, path, cprofile_path=None):
+        """Stop profiling and write the JSON report (and the cProfile stats, if any)."""
+        if not self.enabled:
+            return
+        if self.profile is not None:
+            self.profile.disable()
+            if cprofile_path:
+                self.profile.dump_stats(cprofile_path)
+        # Peaks are reset between phases, so the run's peak is the largest seen
+        peak = max([tracemalloc.get_traced_memory()[1]] + [p.peak for p in self.phases])
+        tracemalloc.stop()
+
+        phases = sorted(self.phases, key=lambda p: p.start)
+        report = {
+            'version': REPORT_VERSION,
+            'script': os.path.basename(sys.argv[0]),
+            'argv': sys.argv[1:],
+            'wallSeconds': round(time.perf_counter() - self.origin, 6),
+            'peakMemoryBytes': peak,
+            'phases': [p.as_dict(self.origin) for p in phases],
+            'cprofile': cprofile_path if self.profile is not None else None,
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
+        self.enabled = False
+
+        print(f"\nProfile written to {path}")
+        print(f"{'Phase':<32} {'Wall (s)':>9} {'Peak MB':>8} {'Rows':>9} {'Bytes':>11}")
+        for p in phases:
+            name = ('  ' if p.parent else '') + p.name
+            print(f"{name[:32]:<32} {p.wall:>9.3f} {p.peak / 1e6:>8.1f} {p.rows:>9} {p.bytes:>11}")
+
+
+# Shared by the scripts and by SparqlClient, which reports rows and bytes
+PROFILER = Profiler()
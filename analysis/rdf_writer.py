@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Streaming, deterministic writer for the precomputed RDF outputs.
+
+Subjects are written one at a time as they are produced, so no output is
+ever held in memory as a whole. The same subjects in the same order always
+give the same bytes, so an unchanged rebuild leaves Docker layer caches
+valid:
+1. Literals are escaped as Turtle and N-Triples require, so quotes,
+   backslashes and newlines in labels cannot break the file, and characters
+   an IRI may not hold (spaces, <, >, ", ...) are percent-encoded
+2. Blank nodes get labels numbered in write order
+3. There is no timestamp, and gzip output has a zero mtime and no file name
+4. The file is written next to its destination and moved into place, and
+   left untouched (mtime included) when the new bytes are the same
+
+The format follows the file name: .nt for N-Triples, .nt.gz for gzip'd
+N-Triples, which the backend parses much faster than Turtle, and Turtle
+otherwise.
+
+Objects are given as Python values: IRI('...') for IRIs, Blank([...]) for a
+nested blank node, str for plain literals, int, float and bool for typed ones.
+
+Usage:
+  from rdf_writer import IRI, Blank, RdfWriter
+
+  with RdfWriter.open('out.ttl', {'okn': 'https://purl.org/okn/'}, header='# Comment') as writer:
+      writer.subject(IRI('https://purl.org/okn/x'), [(RDF_TYPE, IRI(...)), (IRI(...), "label")])
+"""
+
+import filecmp
+import gzip
+import io
+import os
+import re
+from decimal import Decimal
+
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+TURTLE = 'turtle'
+NTRIPLES = 'nt'
+
+LITERAL_ESCAPES = {'"': '\\"', '\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+LITERAL_SPECIAL = re.compile(r'["\\\x00-\x1f\x7f]')
+IRI_SPECIAL = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+# Local names written as prefix:name; anything else is written as <IRI>
+SAFE_LOCAL = re.compile(r'^[A-Za-z0-9_](?:[A-Za-z0-9_.-]*[A-Za-z0-9_-])?$')
+
+
+class IRI(str):
+    """An IRI object, as opposed to a plain string literal."""
+
+
+class Blank:
+    """A blank node object with its own (predicate, object) pairs."""
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+
+def escape_literal(text):
+    return LITERAL_SPECIAL.sub(lambda m: LITERAL_ESCAPES.get(m.group(), f'\\u{ord(m.group()):04X}'), text)
+
+
+def escape_iri(iri):
+    """Percent-encode the characters IRIREF excludes; a \\u escape of them is not a valid IRI either."""
+    return IRI_SPECIAL.sub(lambda m: f'%{ord(m.group()):02X}', iri)
+
+
+def format_decimal(value):
+    """A float as an xsd:decimal lexical form, never in exponent notation."""
+    text = format(Decimal(repr(value)), 'f')
+    return text if '.' in text else text + '.0'
+
+
+def output_format(path):
+    name = os.path.basename(path)
+    if name.endswith('.nt') or name.endswith('.nt.gz'):
+        return NTRIPLES
+    return TURTLE
+
+
+class RdfWriter:
+    """Writes subjects with their predicates and objects as Turtle or N-Triples."""
+
+    def __init__(self, f, fmt=TURTLE, prefixes=None):
+        self.f = f
+        self.fmt = fmt
+        self.prefixes = dict(prefixes or {})
+        self.blank_nodes = 0
+        self.subjects = 0
+
+    @classmethod
+    def open(cls, path, prefixes=None, header=None):
+        """Open path for writing in the format its name asks for; use as a context manager."""
+        return WriterFile(path, prefixes, header)
+
+    def write_header(self, header):
+        if header:
+            for line in header.splitlines():
+                self.f.write(f"# {line}\n" if not line.startswith('#') else f"{line}\n")
+            self.f.write("\n")
+        if self.fmt == TURTLE and self.prefixes:
+            for prefix, namespace in self.prefixes.items():
+                self.f.write(f"@prefix {prefix}: <{escape_iri(namespace)}> .\n")
+
+    def iri(self, iri):
+        if self.fmt == TURTLE:
+            for prefix, namespace in self.prefixes.items():
+                if iri.startswith(namespace) and SAFE_LOCAL.match(iri[len(namespace):]):
+                    return f"{prefix}:{iri[len(namespace):]}"
+        return f"<{escape_iri(iri)}>"
+
+    def term(self, value):
+        """The Turtle or N-Triples form of an object that is not a blank node."""
+        if isinstance(value, IRI):
+            return self.iri(value)
+        if isinstance(value, bool):
+            text, datatype = ('true' if value else 'false'), 'boolean'
+        elif isinstance(value, int):
+            text, datatype = str(value), 'integer'
+        elif isinstance(value, float):
+            text, datatype = format_decimal(value), 'decimal'
+        else:
+            return f'"{escape_literal(str(value))}"'
+        if self.fmt == TURTLE:
+            return text
+        return f'"{text}"^^<{XSD}{datatype}>'
+
+    def predicate(self, predicate):
+        if self.fmt == TURTLE and predicate == RDF_TYPE:
+            return 'a'
+        return self.iri(predicate)
+
+    def subject(self, subject, pairs):
+        """Write one subject with its (predicate, object) pairs, in the order given."""
+        self.subjects += 1
+        if self.fmt == TURTLE:
+            self.f.write(f"\n{self.iri(subject)}")
+            self._turtle_pairs(pairs, '    ')
+            self.f.write(" .\n")
+        else:
+            self._ntriples(self.iri(subject), pairs)
+
+    def _turtle_pairs(self, pairs, indent):
+        for i, (predicate, value) in enumerate(pairs):
+            self.f.write(" ;\n" if i else "\n")
+            self.f.write(f"{indent}{self.predicate(predicate)} ")
+            if isinstance(value, Blank):
+                self.f.write("[")
+                self._turtle_pairs(value.pairs, indent + '    ')
+                self.f.write(f"\n{indent}]")
+            else:
+                self.f.write(self.term(value))
+
+    def _ntriples(self, subject, pairs):
+        for predicate, value in pairs:
+            if isinstance(value, Blank):
+                label = f"_:b{self.blank_nodes}"
+                self.blank_nodes += 1
+                self.f.write(f"{subject} {self.iri(predicate)} {label} .\n")
+                self._ntriples(label, value.pairs)
+            else:
+                self.f.write(f"{subject} {self.iri(predicate)} {self.term(value)} .\n")
+
+
+class WriterFile:
+    """Context manager writing an RdfWriter's output to a temporary file and moving it into place."""
+
+    def __init__(self, path, prefixes, header):
+        self.path = path
+        self.prefixes = prefixes
+        self.header = header
+        self.changed = None
+
+    def __enter__(self):
+        self.tmp_path = f"{self.path}.tmp"
+        self.raw = open(self.tmp_path, 'wb')
+        stream = self.raw
+        if self.path.endswith('.gz'):
+            # No file name and a zero mtime, so the same triples give the same bytes
+            stream = self.gzip = gzip.GzipFile(filename='', mode='wb', fileobj=self.raw, mtime=0)
+        self.text = io.TextIOWrapper(stream, encoding='utf-8', newline='\n')
+        writer = RdfWriter(self.text, output_format(self.path), self.prefixes)
+        writer.write_header(self.header)
+        return writer
+
+    def __exit__(self, exc_type, exc, tb):
+        self.text.close()
+        if self.path.endswith('.gz'):
+            self.raw.close()
+        if exc_type is not None:
+            os.remove(self.tmp_path)
+            return False
+        # Keep an identical file as it is, so its mtime does not trigger reloads
+        if os.path.exists(self.path) and filecmp.cmp(self.tmp_path, self.path, shallow=False):
+            os.remove(self.tmp_path)
+            self.changed = False
+        else:
+            os.replace(self.tmp_path, self.path)
+            self.changed = True
+        return False
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Pooled HTTP client for running SPARQL queries from the analysis scripts.
+
+Keeps keep-alive connections open per host so that repeated queries against
+the same endpoint reuse a socket, and is safe to share between threads so
+independent queries can run concurrently. Each request:
+1. Asks for gzip-compressed results and decompresses them as they stream in
+2. Has a socket timeout, so a stalled endpoint cannot hang the run
+3. Is retried a bounded number of times, with exponential backoff, when the
+   connection fails or the endpoint answers 429/5xx before any row is read
+4. Raises SparqlError for any failure, including one while the rows stream in
+   (a dropped connection, a timeout, a truncated or malformed response)
+
+Rows are yielded by sparql_results.iter_bindings, one binding at a time.
+
+Progress printed from concurrent queries goes through serialized_output(),
+which writes each thread's output a whole line at a time under one lock.
+
+Usage:
+  from sparql_client import SparqlClient
+
+  client = SparqlClient(timeout=60, retries=3)
+  for row in client.query('http://localhost:8000', 'SELECT ...'):
+      ...
+
+  with serialized_output(), ThreadPoolExecutor() as pool:
+      ...
+"""
+
+import gzip
+import http.client
+import queue
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+from contextlib import contextmanager
+from xml.etree.ElementTree import ParseError
+
+from profiling import PROFILER
+from sparql_results import ACCEPT_HEADER, iter_bindings
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Wikidata's query service rejects clients without a descriptive User-Agent
+USER_AGENT = 'okn-map-analysis/1.0 (https://github.com/frink-okn)'
+
+
+# Errors a response can fail with part-way through: the connection dropping,
+# gzip or the result parser hitting truncated or malformed data
+STREAM_ERRORS = (OSError, EOFError, zlib.error, http.client.HTTPException, ParseError, ValueError)
+
+OUTPUT_LOCK = threading.Lock()
+
+
+class SparqlError(Exception):
+    """Raised when a query still fails after all retries, or its results cannot be read."""
+
+
+class SerializedLines:
+    """A text stream shared by threads that writes each thread's output in whole lines.
+
+    A thread's text is held until it ends a line, and lines are written under
+    OUTPUT_LOCK, so print() calls from concurrent queries never mix within a line.
+    The held text is kept per thread under the same lock, so flush_all() can
+    write what every thread left unfinished.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._pending = {}                      # thread id -> text after its last newline
+
+    def write(self, text):
+        thread = threading.get_ident()
+        with OUTPUT_LOCK:
+            lines, newline, rest = (self._pending.pop(thread, '') + text).rpartition('\n')
+            if rest:
+                self._pending[thread] = rest
+            if newline:
+                self.stream.write(lines + newline)
+                self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        """Write the calling thread's unfinished line."""
+        with OUTPUT_LOCK:
+            self.stream.write(self._pending.pop(threading.get_ident(), ''))
+            self.stream.flush()
+
+    def flush_all(self):
+        """Write every thread's unfinished line, each on a line of its own."""
+        with OUTPUT_LOCK:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self.stream.write('\n'.join(pending))
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextmanager
+def serialized_output():
+    """Route sys.stdout and sys.stderr through SerializedLines while concurrent queries print."""
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = SerializedLines(stdout), SerializedLines(stderr)
+    try:
+        yield
+    finally:
+        sys.stdout.flush_all()
+        sys.stderr.flush_all()
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+class CountingReader:
+    """Wraps a response, counting the bytes read off the wire (before gunzip)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.count += len(data)
+        return data
+
+
+class SparqlClient:
+    """Thread-safe SPARQL client with a keep-alive connection pool per host."""
+
+    def __init__(self, timeout=60, retries=3, backoff=1.0, pool_size=8):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, key):
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = queue.LifoQueue(maxsize=self.pool_size)
+            return self._pools[key]
+
+    def _acquire(self, scheme, netloc):
+        """Take an idle connection for this host, or open a new one."""
+        try:
+            return self._pool((scheme, netloc)).get_nowait()
+        except queue.Empty:
+            cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            return cls(netloc, timeout=self.timeout)
+
+    def _release(self, scheme, netloc, conn):
+        """Return a fully-read connection to the pool, closing it if the pool is full."""
+        try:
+            self._pool((scheme, netloc)).put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        """Close every idle pooled connection."""
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    def _send(self, endpoint, query, method='GET'):
+        """Issue the request, retrying transient failures. Returns (url, conn, response).
+
+        GET puts the query in the URL; POST sends it as a form body, for
+        queries too long for a URL (e.g. large VALUES blocks).
+        """
+        url = urllib.parse.urlsplit(endpoint)
+        path = url.path or '/'
+        params = urllib.parse.urlencode({'query': query})
+        headers = {
+            'Accept': ACCEPT_HEADER,
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            'User-Agent': USER_AGENT,
+        }
+        if method == 'POST':
+            target = f"{path}?{url.query}" if url.query else path
+            body = params.encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        else:
+            target = f"{path}?{url.query + '&' if url.query else ''}{params}"
+            body = None
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self.backoff * 2 ** (attempt - 1)
+                print(f"  Retrying query in {delay:.1f}s ({last_error})", file=sys.stderr)
+                time.sleep(delay)
+
+            conn = self._acquire(url.scheme, url.netloc)
+            try:
+                conn.request(method, target, body=body, headers=headers)
+                response = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                # Stale keep-alive sockets and refused connections both land here
+                conn.close()
+                last_error = e
+                continue
+
+            if response.status == 200:
+                return url, conn, response
+
+            response.read()
+            conn.close()
+            last_error = SparqlError(f"HTTP {response.status} {response.reason}")
+            if response.status not in RETRY_STATUSES:
+                break
+
+        raise SparqlError(f"Query to {endpoint} failed: {last_error}")
+
+    def query(self, endpoint, query, method='GET'):
+        """Run a SELECT query and yield result rows as they are parsed."""
+        url, conn, response = self._send(endpoint, query, method)
+        stream = counter = CountingReader(response)
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            stream = gzip.GzipFile(fileobj=counter)
+
+        finished = False
+        rows = 0
+        try:
+            for row in iter_bindings(stream, content_type=response.getheader('Content-Type')):
+                rows += 1
+                yield row
+            # Drain anything after the last row so the socket can be reused
+            while stream.read(65536):
+                pass
+            finished = True
+        except socket.timeout as e:
+            raise SparqlError(f"Query to {endpoint} timed out after {self.timeout}s") from e
+        except STREAM_ERRORS as e:
+            raise SparqlError(f"Query to {endpoint} failed after {rows} rows: {e!r}") from e
+        finally:
+            PROFILER.count(rows=rows, bytes=counter.count)
+            if finished and not response.will_close:
+                self._release(url.scheme, url.netloc, conn)
+            else:
+                conn.close()
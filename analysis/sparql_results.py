@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Streaming reader for SPARQL SELECT results.
+
+Yields one binding row at a time as the results arrive, instead of loading the
+whole response into memory first. Supports the three result formats the
+analysis scripts may receive:
+1. SPARQL XML (application/sparql-results+xml), read with iterparse
+2. SPARQL JSON (application/sparql-results+json), read incrementally
+3. SPARQL TSV (text/tab-separated-values), read line by line
+
+Each row is a dict of {variable_name: value}, where value is the URI or
+literal text. Blank node bindings are skipped, as unbound variables are.
+
+Usage:
+  from sparql_results import iter_bindings
+
+  with open('used_classes.xml', 'rb') as f:
+      for row in iter_bindings(f):
+          ...
+"""
+
+import codecs
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+
+SPARQL_NS = '{http://www.w3.org/2005/sparql-results#}'
+
+XML = 'xml'
+JSON = 'json'
+TSV = 'tsv'
+
+ACCEPT_HEADER = ('application/sparql-results+xml, '
+                 'application/sparql-results+json;q=0.9, '
+                 'text/tab-separated-values;q=0.8')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def detect_format(content_type=None, filename=None, head=b''):
+    """Work out the result format from a content type, file name or leading bytes."""
+    if content_type:
+        content_type = content_type.lower()
+        if 'json' in content_type:
+            return JSON
+        if 'tab-separated' in content_type or 'tsv' in content_type:
+            return TSV
+        if 'xml' in content_type:
+            return XML
+
+    if filename:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext in ('.srj', '.json'):
+            return JSON
+        if ext in ('.tsv',):
+            return TSV
+        if ext in ('.srx', '.xml'):
+            return XML
+
+    stripped = head.lstrip()
+    if stripped.startswith(b'{'):
+        return JSON
+    if stripped.startswith(b'?'):
+        return TSV
+    return XML
+
+
+class _PeekStream:
+    """Wrap a binary stream so its first bytes can be inspected and then replayed."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = b''
+
+    def peek(self, size=64):
+        while len(self.buffer) < size:
+            chunk = self.stream.read(size - len(self.buffer))
+            if not chunk:
+                break
+            self.buffer += chunk
+        return self.buffer
+
+    def read(self, size=-1):
+        if self.buffer:
+            if size is None or size < 0:
+                data = self.buffer + self.stream.read()
+                self.buffer = b''
+                return data
+            data = self.buffer[:size]
+            self.buffer = self.buffer[size:]
+            if len(data) < size:
+                data += self.stream.read(size - len(data))
+            return data
+        return self.stream.read(size)
+
+
+def iter_bindings(source, fmt=None, content_type=None):
+    """Yield SPARQL result rows one at a time from a path or binary stream.
+
+    The format is taken from `fmt` if given, otherwise from `content_type`,
+    the file extension, or the first bytes of the stream.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from iter_bindings(f, fmt=fmt or detect_format(content_type, str(source)))
+        return
+
+    if fmt is None:
+        source = _PeekStream(source)
+        fmt = detect_format(content_type, getattr(source.stream, 'name', None), source.peek())
+
+    if fmt == JSON:
+        yield from _iter_json(source)
+    elif fmt == TSV:
+        yield from _iter_tsv(source)
+    else:
+        yield from _iter_xml(source)
+
+
+def _iter_xml(stream):
+    """Parse SPARQL XML results, clearing each result element once it is read."""
+    results_elem = None
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            if elem.tag == SPARQL_NS + 'results':
+                results_elem = elem
+            continue
+
+        if elem.tag != SPARQL_NS + 'result':
+            continue
+
+        row = {}
+        for binding in elem.iter(SPARQL_NS + 'binding'):
+            for value_elem in binding:
+                if value_elem.tag in (SPARQL_NS + 'uri', SPARQL_NS + 'literal'):
+                    row[binding.get('name')] = value_elem.text or ''
+                    break
+        yield row
+
+        # Drop processed results so memory stays flat
+        elem.clear()
+        if results_elem is not None:
+            results_elem.clear()
+
+
+def _iter_json(stream):
+    """Parse SPARQL JSON results incrementally from the "bindings" array."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            eof = True
+            buf = buf[pos:] + text_decoder.decode(b'', final=True)
+        else:
+            buf = buf[pos:] + text_decoder.decode(chunk)
+        pos = 0
+
+    # Skip ahead to the opening bracket of the bindings array
+    pattern = re.compile(r'"bindings"\s*:\s*\[')
+    while True:
+        match = pattern.search(buf, pos)
+        if match:
+            pos = match.end()
+            break
+        if eof:
+            return
+        # Keep a tail in case the key is split across chunks
+        pos = max(pos, len(buf) - 32)
+        fill()
+
+    while True:
+        # Skip separators between binding objects
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                return
+            fill()
+            continue
+        if buf[pos] == ']':
+            return
+
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof:
+                raise
+            fill()
+            continue
+        pos = end
+
+        row = {}
+        for name, term in obj.items():
+            if term.get('type') in ('uri', 'literal', 'typed-literal'):
+                row[name] = term.get('value', '')
+        yield row
+
+
+_TSV_ESCAPES = {'t': '\t', 'n': '\n', 'r': '\r', 'b': '\b', 'f': '\f',
+                '"': '"', "'": "'", '\\': '\\'}
+
+
+def _unescape_literal(text):
+    """Undo Turtle string escapes (\\n, \\", \\uXXXX, ...) in a literal body."""
+    if '\\' not in text:
+        return text
+    out = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\' and i + 1 < len(text):
+            nxt = text[i + 1]
+            if nxt == 'u':
+                out.append(chr(int(text[i + 2:i + 6], 16)))
+                i += 6
+                continue
+            if nxt == 'U':
+                out.append(chr(int(text[i + 2:i + 10], 16)))
+                i += 10
+                continue
+            out.append(_TSV_ESCAPES.get(nxt, nxt))
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return ''.join(out)
+
+
+def _parse_tsv_term(term):
+    """Convert one TSV cell (an RDF term in Turtle syntax) to its value."""
+    if not term:
+        return None
+    if term.startswith('<') and term.endswith('>'):
+        return term[1:-1]
+    if term.startswith('_:'):
+        return None
+    if term.startswith('"'):
+        end = term.rfind('"')
+        return _unescape_literal(term[1:end])
+    # Bare numbers and booleans
+    return term
+
+
+def _iter_tsv(stream):
+    """Parse SPARQL TSV results line by line."""
+    header = None
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        final = not chunk
+        pending += text_decoder.decode(chunk or b'', final=final)
+        lines = pending.split('\n')
+        pending = '' if final else lines.pop()
+
+        for line in lines:
+            line = line.rstrip('\r')
+            if header is None:
+                if line:
+                    header = [name.lstrip('?$') for name in line.split('\t')]
+                continue
+            if not line:
+                continue
+            row = {}
+            for name, term in zip(header, line.split('\t')):
+                value = _parse_tsv_term(term)
+                if value is not None:
+                    row[name] = value
+            yield row
+
+        if final:
+            return
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Transitive-closure index over the Wikidata subclass hierarchy.
+
+docker-backend/_subclasses.ttl holds the wdt:P279 (subclass of) edges above
+the Wikidata entities our classes map to. Answering "is X under Y" with a
+wdt:P279* property path walks those chains at query time; this index answers
+it with one lookup instead.
+
+Building the index:
+1. Collapse cycles (Wikidata has a few) into strongly connected components
+2. Number the components so that widely shared ancestors get low numbers
+3. Give each component a bitset of its ancestors, in topological order
+
+Because general classes sit at the start of every bitset, the rows stay short
+(about 17 MB for the whole hierarchy) and a subsumption check is a single
+byte lookup.
+
+Each component also gets a depth (its longest path from a root), which orders
+ancestors from the most specific down. With it, the lowest common ancestors of
+two entities come from one AND of their bitsets: walking the common ancestors
+deepest first, each one that is not above an ancestor already kept is lowest.
+For many entities at once, an ancestor is a lowest common ancestor of two of
+them exactly when no child of it is above both, so grouping entities by the
+ancestors a few hops above them and masking each one's bitset with that
+ancestor's children finds every such pair without comparing pairs.
+
+The script also materializes the closure for the Wikidata entities mapped from
+the backend data as okn:subClassOfTransitive triples, which the backend loads
+like any other TTL file, so the frontend can ask with a single triple pattern.
+
+Usage:
+  python3 subclass_index.py [--data-dir ../docker-backend] [--output ../docker-backend/_subclass_closure.ttl]
+
+  from subclass_index import SubclassIndex
+
+  index = SubclassIndex.from_ttl('../docker-backend/_subclasses.ttl')
+  index.is_subclass_of('http://www.wikidata.org/entity/Q515', 'http://www.wikidata.org/entity/Q486972')
+  index.lowest_common_ancestors('http://www.wikidata.org/entity/Q515', 'http://www.wikidata.org/entity/Q532')
+"""
+
+import argparse
+import glob
+import os
+from collections import Counter, defaultdict, deque
+
+from ttl_index import WIKIDATA_ENTITY, TtlIndex, read_rdf
+
+P279 = 'http://www.wikidata.org/prop/direct/P279'
+CLOSURE_PREDICATE = 'https://purl.org/okn/subClassOfTransitive'
+
+
+def read_subclass_edges(path):
+    """Return the (child, parent) wdt:P279 edges in a TTL file, as IRI strings."""
+    from rdflib import Graph, URIRef
+
+    text, fmt = read_rdf(path)
+    g = Graph()
+    g.parse(data=text, format=fmt, publicID=path)
+    return [(str(s), str(o)) for s, o in g.subject_objects(URIRef(P279))
+            if isinstance(s, URIRef) and isinstance(o, URIRef)]
+
+
+def strongly_connected_components(n, parents):
+    """Iterative Tarjan's algorithm. Returns a component number for each node."""
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    component = [-1] * n
+    stack = []
+    counter = 0
+    components = 0
+
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, 0)]
+        while work:
+            v, i = work.pop()
+            if i == 0:
+                index[v] = low[v] = counter
+                counter += 1
+                stack.append(v)
+                on_stack[v] = True
+            if i < len(parents[v]):
+                work.append((v, i + 1))
+                w = parents[v][i]
+                if index[w] == -1:
+                    work.append((w, 0))
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                continue
+            # All of v's edges are done: close its component if v is a root
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component[w] = components
+                    if w == v:
+                        break
+                components += 1
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+    return component, components
+
+
+class SubclassIndex:
+    """Ancestor bitsets over the condensed subclass DAG, for O(1) subsumption checks."""
+
+    def __init__(self, entities, component, rows, members, children, parents, depth):
+        self.entities = entities          # node id -> IRI
+        self.ids = {e: i for i, e in enumerate(entities)}
+        self.component = component        # node id -> component number
+        self.rows = rows                  # component -> ancestor bitset (bytes, little-endian)
+        self.members = members            # component -> [node ids]
+        self.children = children          # component -> [child components]
+        self.parents = parents            # component -> [parent components]
+        self.depth = depth                # component -> longest path from a root
+
+    @classmethod
+    def from_ttl(cls, path):
+        return cls.build(read_subclass_edges(path))
+
+    @classmethod
+    def build(cls, edges):
+        """Build the index from (child, parent) IRI pairs."""
+        ids = {}
+        for child, parent in edges:
+            ids.setdefault(child, len(ids))
+            ids.setdefault(parent, len(ids))
+        n = len(ids)
+        parents = [[] for _ in range(n)]
+        for child, parent in edges:
+            if child != parent:
+                parents[ids[child]].append(ids[parent])
+
+        node_component, n_components = strongly_connected_components(n, parents)
+
+        # Condensed DAG, without duplicate or self edges
+        dag_parents = [set() for _ in range(n_components)]
+        for v in range(n):
+            for w in parents[v]:
+                if node_component[v] != node_component[w]:
+                    dag_parents[node_component[v]].add(node_component[w])
+        dag_children = [[] for _ in range(n_components)]
+        for c in range(n_components):
+            for p in dag_parents[c]:
+                dag_children[p].append(c)
+
+        # Topological order, roots first
+        pending = [len(p) for p in dag_parents]
+        queue = deque(c for c in range(n_components) if not pending[c])
+        order = []
+        while queue:
+            c = queue.popleft()
+            order.append(c)
+            for child in dag_children[c]:
+                pending[child] -= 1
+                if not pending[child]:
+                    queue.append(child)
+
+        # Count descendants via ancestor sets, then give the most shared
+        # ancestors the lowest bit positions so bitsets stay short
+        ancestors = [None] * n_components
+        descendants = [0] * n_components
+        for c in order:
+            found = set()
+            for p in dag_parents[c]:
+                found.add(p)
+                found |= ancestors[p]
+            ancestors[c] = found
+            for a in found:
+                descendants[a] += 1
+        position = [0] * n_components
+        for i, c in enumerate(sorted(range(n_components), key=lambda c: -descendants[c])):
+            position[c] = i
+
+        bits = [0] * n_components
+        depth = [0] * n_components
+        for c in order:
+            b = 0
+            for p in dag_parents[c]:
+                b |= bits[p] | (1 << position[p])
+                depth[c] = max(depth[c], depth[p] + 1)
+            bits[c] = b
+
+        # Renumber components by position so a component's own bit is its number
+        rows = [b''] * n_components
+        members = [[] for _ in range(n_components)]
+        children = [[] for _ in range(n_components)]
+        parents = [[] for _ in range(n_components)]
+        depths = [0] * n_components
+        for c in range(n_components):
+            rows[position[c]] = bits[c].to_bytes((bits[c].bit_length() + 7) // 8, 'little')
+            children[position[c]] = [position[child] for child in dag_children[c]]
+            parents[position[c]] = sorted(position[p] for p in dag_parents[c])
+            depths[position[c]] = depth[c]
+        component = [position[c] for c in node_component]
+        for v, c in enumerate(component):
+            members[c].append(v)
+
+        entities = [None] * n
+        for iri, i in ids.items():
+            entities[i] = iri
+        return cls(entities, component, rows, members, children, parents, depths)
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __contains__(self, iri):
+        return iri in self.ids
+
+    def _has_ancestor(self, c, a):
+        row = self.rows[c]
+        byte = a >> 3
+        return byte < len(row) and bool(row[byte] >> (a & 7) & 1)
+
+    def is_subclass_of(self, child, parent):
+        """True if child is parent, or reaches it through wdt:P279 edges."""
+        if child == parent:
+            return True
+        if child not in self.ids or parent not in self.ids:
+            return False
+        c = self.component[self.ids[child]]
+        a = self.component[self.ids[parent]]
+        return c == a or self._has_ancestor(c, a)
+
+    def _component_iris(self, components):
+        return {self.entities[v] for c in components for v in self.members[c]}
+
+    def ancestors(self, iri):
+        """Every entity iri is a (transitive) subclass of, excluding iri itself."""
+        if iri not in self.ids:
+            return set()
+        c = self.component[self.ids[iri]]
+        row = int.from_bytes(self.rows[c], 'little')
+        found = [c]
+        while row:
+            low = row & -row
+            found.append(low.bit_length() - 1)
+            row ^= low
+        return self._component_iris(found) - {iri}
+
+    def descendants(self, iri):
+        """Every entity that is a (transitive) subclass of iri, excluding iri itself."""
+        if iri not in self.ids:
+            return set()
+        start = self.component[self.ids[iri]]
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            for child in self.children[queue.popleft()]:
+                if child not in seen:
+                    seen.add(child)
+                    queue.append(child)
+        return self._component_iris(seen) - {iri}
+
+    def component_iri(self, c):
+        """The IRI naming a component: its smallest member, as cycles merge several entities."""
+        return min(self.entities[v] for v in self.members[c])
+
+    def ancestors_within(self, iri, hops):
+        """{component: fewest wdt:P279 hops} for iri's own component and its ancestors up to hops away."""
+        if iri not in self.ids:
+            return {}
+        start = self.component[self.ids[iri]]
+        found = {start: 0}
+        queue = deque([start])
+        while queue:
+            c = queue.popleft()
+            if found[c] == hops:
+                continue
+            for p in self.parents[c]:
+                if p not in found:
+                    found[p] = found[c] + 1
+                    queue.append(p)
+        return found
+
+    def _lowest_common(self, a, b):
+        """Lowest common ancestor components of components a and b (either one itself included)."""
+        common = ((int.from_bytes(self.rows[a], 'little') | 1 << a)
+                  & (int.from_bytes(self.rows[b], 'little') | 1 << b))
+        candidates = []
+        while common:
+            low = common & -common
+            candidates.append(low.bit_length() - 1)
+            common ^= low
+        # A descendant is always deeper than its ancestors, so lower ones come first
+        lowest = []
+        for c in sorted(candidates, key=lambda c: -self.depth[c]):
+            if not any(self._has_ancestor(kept, c) for kept in lowest):
+                lowest.append(c)
+        return lowest
+
+    def lowest_common_ancestors(self, iri1, iri2):
+        """The most specific entities both iris are (transitive) subclasses of, or are.
+
+        Usually one, but multiple inheritance can give several.
+        """
+        if iri1 not in self.ids or iri2 not in self.ids:
+            return set()
+        lowest = self._lowest_common(self.component[self.ids[iri1]], self.component[self.ids[iri2]])
+        return {self.component_iri(c) for c in lowest}
+
+    def _bits(self, components):
+        """A bitset of component numbers."""
+        b = bytearray((max(components, default=0) >> 3) + 1)
+        for c in components:
+            b[c >> 3] |= 1 << (c & 7)
+        return int.from_bytes(b, 'little')
+
+    def lowest_common_groups(self, iris, hops, min_depth=0):
+        """Group iris under each ancestor that is a lowest common ancestor of two of them.
+
+        Only ancestors at most hops wdt:P279 hops above both, and at least
+        min_depth below a root, are considered. Returns {ancestor IRI: {iri: hops
+        from iri up to the ancestor}}, each iri there being related to at least
+        one other through that ancestor.
+        """
+        components = {iri: self.component[self.ids[iri]] for iri in iris if iri in self.ids}
+        buckets = defaultdict(dict)
+        for iri in sorted(components):
+            for c, distance in self.ancestors_within(iri, hops).items():
+                if self.depth[c] >= min_depth:
+                    buckets[c][iri] = distance
+
+        groups = {}
+        for c, members in buckets.items():
+            if len({components[iri] for iri in members}) < 2:
+                continue
+            # The children of c each member is under; members without one in
+            # common have no common ancestor below c. c itself has none.
+            children = self._bits(self.children[c])
+            branches = {}
+            for iri in members:
+                a = components[iri]
+                row = (int.from_bytes(self.rows[a], 'little') | 1 << a) & children
+                found = []
+                while row:
+                    low = row & -row
+                    found.append(low.bit_length() - 1)
+                    row ^= low
+                branches[iri] = frozenset(found)
+            sharing = Counter(b for found in branches.values() for b in found)
+            at_c = sum(1 for iri in members if components[iri] == c)
+
+            related = {}
+            for iri, found in branches.items():
+                if not found:
+                    # c or a cycle through it: related to everything else under c
+                    same = at_c
+                elif len(found) == 1:
+                    same = sharing[next(iter(found))]
+                else:
+                    same = sum(1 for other in branches.values() if other & found)
+                if same < len(members):
+                    related[iri] = members[iri]
+            if related:
+                groups[self.component_iri(c)] = related
+        return groups
+
+    def size_bytes(self):
+        """Total size of the ancestor bitsets."""
+        return sum(len(row) for row in self.rows)
+
+
+def write_closure_ttl(index, entities, output_file):
+    """Write okn:subClassOfTransitive triples from each entity to all its ancestors."""
+    count = 0
+    with open(output_file, 'w') as f:
+        f.write("# Transitive closure of wdt:P279 for the Wikidata entities mapped from OKN classes\n")
+        f.write("# Generated by analysis/subclass_index.py from _subclasses.ttl\n\n")
+        for entity in sorted(entities):
+            for ancestor in sorted(index.ancestors(entity)):
+                f.write(f"<{entity}> <{CLOSURE_PREDICATE}> <{ancestor}> .\n")
+                count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize the Wikidata subclass closure for the backend')
+    parser.add_argument('--data-dir', default='../docker-backend',
+                        help='Backend TTL directory (default: ../docker-backend)')
+    parser.add_argument('--subclasses', default=None,
+                        help='Subclass edges file (default: <data-dir>/_subclasses.ttl)')
+    parser.add_argument('--output', default=None,
+                        help='Output TTL file (default: <data-dir>/_subclass_closure.ttl)')
+    parser.add_argument('--all', action='store_true',
+                        help='Materialize every entity in the hierarchy, not only the mapped ones')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='Files parsed in parallel when finding mapped entities (default: 4)')
+    args = parser.parse_args()
+
+    subclasses = args.subclasses or os.path.join(args.data_dir, '_subclasses.ttl')
+    output = args.output or os.path.join(args.data_dir, '_subclass_closure.ttl')
+
+    print(f"Reading subclass edges from {subclasses}...")
+    index = SubclassIndex.from_ttl(subclasses)
+    print(f"  {len(index)} entities, {len(index.rows)} components, "
+          f"{index.size_bytes() / 1e6:.1f} MB of ancestor bitsets")
+
+    if args.all:
+        entities = index.entities
+    else:
+        excluded = {os.path.abspath(p) for p in (subclasses, output)}
+        paths = [p for p in sorted(glob.glob(os.path.join(args.data_dir, '*.ttl')))
+                 if os.path.abspath(p) not in excluded]
+        print(f"Finding mapped Wikidata entities in {len(paths)} TTL files...")
+        ttl = TtlIndex.build(paths, workers=args.workers)
+        entities = {wd for _, wd in ttl.wikidata_links if wd.startswith(WIKIDATA_ENTITY) and wd in index}
+        print(f"  {len(entities)} mapped entities in the hierarchy")
+
+    count = write_closure_ttl(index, entities, output)
+    print(f"Wrote {count} okn:subClassOfTransitive triples to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Tests of benchmark_pipeline.py: the synthetic dataset and the regression check against a baseline."""
+
+import random
+
+from benchmark_pipeline import compare, stage_totals, synthetic_dataset
+from ttl_index import TtlIndex
+
+
+def test_synthetic_dataset(tmp_path):
+    paths, stats = synthetic_dataset(str(tmp_path), 4, 10, 0.3, 3, random.Random(0))
+    used_by_graph, graph_labels = TtlIndex.build(paths, workers=1).used_classes()
+    assert len(used_by_graph) == len(graph_labels) == stats['graphs'] == 4
+    assert sum(len(classes) for classes in used_by_graph.values()) == stats['usedClasses'] == 40
+
+    # The same seed gives the same files
+    again = tmp_path / 'again'
+    again.mkdir()
+    repeated, _ = synthetic_dataset(str(again), 4, 10, 0.3, 3, random.Random(0))
+    assert [open(p).read() for p in repeated] == [open(p).read() for p in paths]
+
+
+def test_stage_totals():
+    report = {'wallSeconds': 3.0, 'peakMemoryBytes': 900, 'phases': [
+        {'name': 'query', 'parent': None, 'wallSeconds': 1.0, 'peakMemoryBytes': 500},
+        {'name': 'query', 'parent': None, 'wallSeconds': 0.5, 'peakMemoryBytes': 700},
+        {'name': 'parse', 'parent': 'query', 'wallSeconds': 0.4, 'peakMemoryBytes': 800},
+    ]}
+    assert stage_totals(report) == {
+        'query': {'wallSeconds': 1.5, 'peakMemoryBytes': 700},
+        'total': {'wallSeconds': 3.0, 'peakMemoryBytes': 900},
+    }
+
+
+def test_compare_reports_only_regressions_beyond_the_tolerance():
+    def results(query, write, memory):
+        return {'runs': [{'scale': 1, 'stages': {
+            'query': {'wallSeconds': query, 'peakMemoryBytes': memory},
+            'write': {'wallSeconds': write, 'peakMemoryBytes': 0},
+        }}]}
+
+    baseline = results(1.0, 0.001, 10e6)
+    assert compare(results(1.2, 0.01, 12e6), baseline, 0.25, 0.05) == []
+    # Stages faster than min_seconds are noise, however much they grew
+    assert compare(results(1.3, 0.04, 13e6), baseline, 0.25, 0.05) == [
+        'scale 1 query: 1.000 s -> 1.300 s',
+        'scale 1 query: 10.0 MB -> 13.0 MB',
+    ]
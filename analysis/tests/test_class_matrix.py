@@ -0,0 +1,45 @@
+"""Tests of class_matrix.py: row set algebra, totals and degrees, and pairwise similarity, with and without scipy."""
+
+import math
+import random
+
+import pytest
+
+from class_matrix import IncidenceMatrix
+
+ROWS = {'a': {'x': 2, 'y': 1}, 'b': {'x': 3}, 'c': {'y': 1, 'z': 4}, 'd': {}}
+
+
+def test_compare_row():
+    used = IncidenceMatrix.from_rows(ROWS)
+    defined = IncidenceMatrix.from_rows({'a': {'y', 'w'}, 'c': {'z'}}, used.graphs, used.classes + ['w'])
+    both, only_used, only_defined = used.compare_row(defined, used.graph_index['a'])
+    assert (used.classes_of(both), used.classes_of(only_used), defined.classes_of(only_defined)) == (['y'], ['x'], ['w'])
+    assert used.compare_row(defined, used.graph_index['d']) == ([], [], [])
+
+
+def test_totals_and_degrees():
+    matrix = IncidenceMatrix.from_rows(ROWS)
+    assert matrix.shape == (4, 3) and matrix.nnz == 5
+    assert matrix.row('c') == {'y': 1.0, 'z': 4.0}
+    assert matrix.row_counts() == [2, 1, 2, 0]
+    assert matrix.row_totals() == [3.0, 3.0, 5.0, 0]
+    assert list(matrix.column_degrees()) == [2, 2, 1]
+    assert matrix.degree_histogram() == {1: 1, 2: 2}
+
+
+def test_similarities():
+    similarities = list(IncidenceMatrix.from_rows(ROWS).similarities())
+    assert [s[:4] for s in similarities] == [('a', 'b', 1, 0.5), ('a', 'c', 1, 1 / 3)]
+    assert similarities[0][4] == pytest.approx(6 / (math.sqrt(5) * 3))
+
+
+def test_scipy_product_matches_the_python_one():
+    pytest.importorskip('scipy')
+    rng = random.Random(0)
+    classes = [f'c{i}' for i in range(200)]
+    matrix = IncidenceMatrix.from_rows({f'g{g}': {c: rng.randint(0, 9) for c in rng.sample(classes, 20)}
+                                        for g in range(60)})
+    rows, cols, shared, dot = matrix.gram()
+    assert (rows, cols, shared) == matrix.gram_by_columns()[:3]
+    assert dot == pytest.approx(matrix.gram_by_columns()[3])
@@ -0,0 +1,82 @@
+"""Tests of the class summary rows built from TtlIndex facts."""
+
+from generate_equivalences import build_class_summary
+from ttl_index import TtlIndex
+
+SCHEMA = """
+@prefix dct: <http://purl.org/dc/terms/> .
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+okns:{name} a linkml:SchemaDefinition ;
+    dct:title "{name}" ;
+    linkml:annotations [
+        linkml:tag okns:counts ;
+        skos:example [ linkml:classes [ skos:example [ <http://example.org/{name}Thing> [ skos:example 7 ] ] ] ]
+    ] .
+
+okns:{name}Thing a {type} ;
+    linkml:class_uri <http://example.org/{name}Thing> ;
+    skos:inScheme okns:{name} ;
+    dct:title "{name} thing" .
+"""
+
+OKNS = 'https://purl.org/okn/schema/'
+
+
+# Graph c counts a's class and a class only d defines, and defines none itself
+OTHERS = """
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+okns:c a linkml:SchemaDefinition ;
+    linkml:annotations [
+        linkml:tag okns:counts ;
+        skos:example [ linkml:classes [ skos:example [
+            <http://example.org/aThing> [ skos:example 3 ] ; <http://example.org/dThing> [ skos:example 4 ] ] ] ]
+    ] .
+
+okns:d a linkml:SchemaDefinition .
+
+okns:dThing a linkml:ClassDefinition ;
+    linkml:class_uri <http://example.org/dThing> ;
+    skos:inScheme okns:d .
+"""
+
+
+def test_summary_rows(tmp_path):
+    (tmp_path / 'a.ttl').write_text(SCHEMA.replace('{name}', 'a').replace('{type}', 'linkml:ClassDefinition'))
+    (tmp_path / 'others.ttl').write_text(OTHERS)
+    index = TtlIndex.build([str(tmp_path / 'a.ttl'), str(tmp_path / 'others.ttl')], workers=1)
+
+    definitions, labels = index.class_definitions()
+    assert definitions == [(OKNS + 'aThing', 'http://example.org/aThing', OKNS + 'a'),
+                           (OKNS + 'dThing', 'http://example.org/dThing', OKNS + 'd')]
+    assert labels == {OKNS + 'a': 'a', OKNS + 'aThing': 'a thing'}
+
+    # A row wherever a class is counted, and one in its own schema, without a count if that schema does not count it
+    rows = build_class_summary(index.class_counts(), definitions)
+    assert [(g, c, count) for g, c, _, _, count in rows] == [(OKNS + 'a', OKNS + 'aThing', '7'),
+                                                               (OKNS + 'c', OKNS + 'aThing', '3'),
+                                                               (OKNS + 'c', OKNS + 'dThing', '4'),
+                                                               (OKNS + 'd', OKNS + 'dThing', None)]
+
+
+def test_both_class_definition_types(tmp_path):
+    paths = []
+    for name, class_type in (('a', 'linkml:ClassDefinition'), ('b', 'okns:ClassDefinition')):
+        path = tmp_path / f'{name}.ttl'
+        path.write_text(SCHEMA.replace('{name}', name).replace('{type}', class_type))
+        paths.append(str(path))
+    index = TtlIndex.build(paths, workers=1)
+
+    definitions, labels = index.class_definitions()
+    assert definitions == [(OKNS + 'aThing', 'http://example.org/aThing', OKNS + 'a'),
+                           (OKNS + 'bThing', 'http://example.org/bThing', OKNS + 'b')]
+    assert labels[OKNS + 'bThing'] == 'b thing'
+
+    rows = build_class_summary(index.class_counts(), definitions)
+    assert [(g, c, count) for g, c, _, _, count in rows] == [(OKNS + 'a', OKNS + 'aThing', '7'),
+                                                               (OKNS + 'b', OKNS + 'bThing', '7')]
@@ -0,0 +1,204 @@
+"""Tests of incremental generate_equivalences.py runs (equivalence_state.py and reuse in generate_equivalences())."""
+
+import json
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import benchmark_pipeline
+from vocabulary_overlap import find_overlaps, graph_vocabularies
+from equivalence_state import STATE_VERSION, EquivalenceState
+from generate_equivalences import (build_class_usage_index, build_shared_class_groups, build_skos_equivalence_classes,
+                                   build_wikidata_groups, generate_equivalences)
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Q = 'http://www.wikidata.org/entity/'
+
+
+def run(used_by_graph, skos_pairs, class_to_wikidata, state=None):
+    """Assemble the equivalences as main() does, reusing from state if given, and record the run in it."""
+    class_usage = build_class_usage_index(used_by_graph)
+    wikidata_groups = build_wikidata_groups(class_to_wikidata)
+    previous = dirty = None
+    if state is not None:
+        previous = state.equivalences
+        dirty = state.dirty_classes(used_by_graph, skos_pairs, class_to_wikidata)
+    skos_groups = build_skos_equivalence_classes(skos_pairs, state and state.skos_groups, dirty)
+    equivalences = list(generate_equivalences(
+        class_usage, {}, build_shared_class_groups(class_usage), skos_groups,
+        wikidata_groups, {}, previous, dirty))
+    if state is not None:
+        state.update({}, None, used_by_graph, skos_pairs, class_to_wikidata, {}, equivalences, skos_groups)
+    return equivalences
+
+
+def test_class_moved_to_another_wikidata_entity():
+    used = {'g1': {'A': 1}, 'g2': {'B': 2}, 'g3': {'C': 3}, 'g4': {'D': 4}}
+    state = EquivalenceState()
+    run(used, [], {'A': Q + 'Q1', 'B': Q + 'Q1', 'C': Q + 'Q1', 'D': Q + 'Q2'}, state)
+
+    moved = {'A': Q + 'Q1', 'B': Q + 'Q1', 'C': Q + 'Q2', 'D': Q + 'Q2'}
+    incremental = run(used, [], moved, state)
+    assert incremental == run(used, [], moved)
+    q1, = [e for e in incremental if e['id'] == 'okn:equiv-wikidata-Q1']
+    assert q1['classes'] == ['A', 'B'] and q1['graphs'] == ['g1', 'g2']
+
+
+def test_unchanged_equivalences_are_reused():
+    used = {'g1': {'A': 1, 'X': 5}, 'g2': {'B': 2, 'X': 6}}
+    state = EquivalenceState()
+    expected = [e['label'] + ' (previous run)' for e in run(used, [('A', 'B')], {}, state)]
+    # Marked, so a reused equivalence can be told from a reassembled one
+    for equiv in state.equivalences.values():
+        equiv['label'] += ' (previous run)'
+    assert [e['label'] for e in run(used, [('A', 'B')], {}, state)] == expected
+
+
+def test_dirty_classes():
+    used = {'g1': {'A': 1, 'X': 5}, 'g2': {'B': 2, 'X': 6}, 'g3': {'C': 3}}
+    state = EquivalenceState()
+    run(used, [('A', 'B')], {'C': Q + 'Q1'}, state)
+    assert state.dirty_classes(used, [('A', 'B')], {'C': Q + 'Q1'}) == set()
+
+    # Every class a changed graph used before or uses now
+    assert state.dirty_classes(dict(used, g1={'A': 1, 'Y': 1}), [('A', 'B')], {'C': Q + 'Q1'}) == {'A', 'X', 'Y'}
+    # Both ends of a SKOS link that appeared or went away
+    assert state.dirty_classes(used, [('B', 'C')], {'C': Q + 'Q1'}) == {'A', 'B', 'C'}
+    # A class mapped to another Wikidata entity, or no longer mapped
+    assert state.dirty_classes(used, [('A', 'B')], {'C': Q + 'Q2'}) == {'C'}
+    assert state.dirty_classes(used, [('A', 'B')], {}) == {'C'}
+
+
+def test_state_round_trip(tmp_path):
+    used = {'g1': {'A': 1, 'X': 5}, 'g2': {'B': 2, 'X': 6}}
+    state = EquivalenceState()
+    equivalences = run(used, [('A', 'B')], {'A': Q + 'Q1', 'B': Q + 'Q1'}, state)
+    state.ttl_hashes = {'a.ttl': 'abc'}
+    path = str(tmp_path / 'state.json')
+    state.save(path)
+
+    loaded = EquivalenceState.load(path)
+    assert loaded.ttl_hashes == {'a.ttl': 'abc'}
+    assert loaded.dirty_classes(used, [('A', 'B')], {'A': Q + 'Q1', 'B': Q + 'Q1'}) == set()
+    assert sorted(loaded.equivalences) == sorted(e['id'] for e in equivalences)
+
+    # A state written by another version, or none at all, starts empty
+    with open(path) as f:
+        data = json.load(f)
+    data['version'] = STATE_VERSION - 1
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    assert EquivalenceState.load(path).equivalences == {}
+    assert EquivalenceState.load(str(tmp_path / 'missing.json')).equivalences == {}
+
+
+def test_incremental_runs_match_full_runs():
+    rng = random.Random(0)
+    classes = [f'C{i}' for i in range(30)]
+    entities = [Q + f'Q{i}' for i in range(6)]
+
+    def random_inputs():
+        used = {f'g{g}': {c: rng.randint(1, 9) for c in rng.sample(classes, 8)} for g in range(6)}
+        skos = [tuple(rng.sample(classes, 2)) for _ in range(5)]
+        wikidata = {c: rng.choice(entities) for c in rng.sample(classes, 12)}
+        return used, skos, wikidata
+
+    state = EquivalenceState()
+    used, skos, wikidata = random_inputs()
+    run(used, skos, wikidata, state)
+    for _ in range(20):
+        # Change one of the inputs at a time, as an edit to a few files would
+        new_used, new_skos, new_wikidata = random_inputs()
+        kind = rng.choice(['used', 'skos', 'wikidata'])
+        if kind == 'used':
+            graph = rng.choice(sorted(used))
+            used = dict(used, **{graph: new_used[graph]})
+        elif kind == 'skos':
+            skos = skos[1:] + new_skos[:1]
+        else:
+            class_uri = rng.choice(classes)
+            wikidata = dict(wikidata, **{class_uri: new_wikidata.get(class_uri, rng.choice(entities))})
+        assert run(used, skos, wikidata, state) == run(used, skos, wikidata)
+
+
+def test_incremental_overlaps_match_a_full_search():
+    rng = random.Random(1)
+    classes = [f'C{i}' for i in range(40)]
+    used = {f'g{g}': set(rng.sample(classes, 12)) for g in range(12)}
+    signatures, overlaps = {}, None
+    for _ in range(10):
+        graph = rng.choice(sorted(used))
+        used = dict(used, **{graph: set(rng.sample(classes, 12))})
+        del used[rng.choice(sorted(used))]
+        vocabularies = graph_vocabularies(used)
+        overlaps = find_overlaps(vocabularies, 0.3, signatures=signatures, previous=overlaps)
+        assert overlaps == find_overlaps(vocabularies, 0.3)
+        assert set(signatures) == set(used)
+
+
+@pytest.fixture(scope='module')
+def data_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('data')
+    benchmark_pipeline.synthetic_dataset(str(directory), 4, 10, 0.2, 2, random.Random(0))
+    return directory
+
+
+def generate(data_dir, *options):
+    out = data_dir / 'out'
+    out.mkdir(exist_ok=True)
+    command = [sys.executable, os.path.join(HERE, 'generate_equivalences.py'),
+               '--from-files', *sorted(str(p) for p in data_dir.glob('*.ttl')),
+               '--output', str(out / 'equivalences.ttl'), '--overview', str(out / 'overview.json'),
+               '--summary', str(out / 'summary.ttl'), '--state', str(out / 'state.json'),
+               '--labels-offline', '--label-cache', '', *options]
+    result = subprocess.run(command, cwd=HERE, capture_output=True, text=True, check=True)
+    return result.stdout
+
+
+def test_early_exit_only_when_nothing_changed(data_dir):
+    assert 'outputs are up to date' not in generate(data_dir)
+    assert 'outputs are up to date' in generate(data_dir)
+
+    # Another option changes the outputs
+    output = generate(data_dir, '--overlap-threshold', '0.3')
+    assert 'outputs are up to date' not in output
+    assert 'Incremental run: 0 equivalences' in output
+    assert 'outputs are up to date' in generate(data_dir, '--overlap-threshold', '0.3')
+
+    # A missing output is written again
+    os.remove(data_dir / 'out' / 'overview.json.gz')
+    assert 'outputs are up to date' not in generate(data_dir, '--overlap-threshold', '0.3')
+    assert (data_dir / 'out' / 'overview.json.gz').exists()
+
+
+def test_state_labels_are_only_a_fallback(tmp_path):
+    from wikidata_labels import LabelCache, LabelResolver
+
+    cache = LabelCache(str(tmp_path / 'labels.json'))
+    cache.store([Q + 'Q1'], {Q + 'Q1': 'Fresh'})
+    resolver = LabelResolver(None, cache=cache, offline=True, fallback_labels={Q + 'Q1': 'Old', Q + 'Q2': 'Old'})
+    assert resolver.resolve([Q + 'Q1', Q + 'Q2', Q + 'Q3']) == {Q + 'Q1': 'Fresh', Q + 'Q2': 'Old'}
+
+    # Expired in the cache and not in the state: fetched again, not kept forever
+    cache.entries[Q + 'Q1'][1] -= 365 * 24 * 3600
+    resolver = LabelResolver(None, cache=cache, fallback_labels={Q + 'Q1': 'Old'})
+    resolver.fetch_chunk = lambda uris: {Q + 'Q1': 'Refetched'}
+    assert resolver.resolve([Q + 'Q1']) == {Q + 'Q1': 'Refetched'}
+    assert json.loads(json.dumps(cache.entries))[Q + 'Q1'][0] == 'Refetched'
+
+
+def test_only_changed_files_are_parsed(tmp_path):
+    benchmark_pipeline.synthetic_dataset(str(tmp_path), 4, 10, 0.2, 2, random.Random(1))
+    assert 'Reading 4 TTL files' in generate(tmp_path)
+    first = tmp_path / 'synthetic-00000.ttl'
+    first.write_text(first.read_text().replace('Synthetic Graph 0', 'Synthetic Graph Zero'))
+    output = generate(tmp_path)
+    assert '3 TTL files unchanged' in output and 'Reading 1 TTL files' in output
+    incremental = (tmp_path / 'out' / 'equivalences.ttl').read_text()
+
+    os.remove(tmp_path / 'out' / 'state.json')
+    generate(tmp_path)
+    assert (tmp_path / 'out' / 'equivalences.ttl').read_text() == incremental
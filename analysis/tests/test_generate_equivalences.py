@@ -0,0 +1,70 @@
+"""Tests of generate_equivalences.py: union-find, and assembling equivalences from the shared class-to-graphs index."""
+
+import sys
+
+from generate_equivalences import (UnionFind, build_class_usage_index, build_shared_class_groups,
+                                   build_skos_equivalence_classes, build_wikidata_groups, generate_equivalences,
+                                   group_graph_usage)
+from vocabulary_overlap import graph_vocabularies
+
+Q = 'http://www.wikidata.org/entity/'
+
+# X is shared by g1 and g2; A and B are SKOS links across g1 and g2; C and D
+# share a Wikidata entity but only g3 uses them
+USED = {'g1': {'A': 1, 'X': 5}, 'g2': {'B': 2, 'X': 6}, 'g3': {'C': 3, 'D': 4}}
+
+
+def test_union_find_groups():
+    uf = UnionFind()
+    uf.union_pairs([('a', 'b'), ('c', 'd'), ('b', 'c'), ('e', 'f')])
+    uf.add('g')
+    assert sorted(map(sorted, uf.get_groups())) == [['a', 'b', 'c', 'd'], ['e', 'f']]
+    assert uf.find('a') == uf.find('d') != uf.find('e')
+    assert uf.find('g') == 'g' and len(uf) == 7
+
+
+def test_union_find_long_chains():
+    # Far longer than the recursion limit, linked from either end
+    n = 4 * sys.getrecursionlimit()
+    for pairs in ([(i, i + 1) for i in range(n)], [(i + 1, i) for i in reversed(range(n))]):
+        uf = UnionFind()
+        uf.union_pairs(pairs)
+        assert uf.get_groups() == [set(range(n + 1))]
+        # Union by rank keeps every tree logarithmically shallow
+        assert max(uf.rank) <= n.bit_length()
+
+
+def test_class_usage_index():
+    class_usage = build_class_usage_index(USED)
+    assert sorted(class_usage['X']) == [('g1', 5), ('g2', 6)]
+    assert class_usage['A'] == [('g1', 1)]
+    assert build_shared_class_groups(class_usage) == {'X': ['g1', 'g2']}
+    assert group_graph_usage(class_usage, {'A', 'B', 'Unused'}) == {'g1': [('A', 1)], 'g2': [('B', 2)]}
+    assert group_graph_usage(class_usage, ['C', 'D']) == {'g3': [('C', 3), ('D', 4)]}
+
+
+def test_usage_rows_of_each_kind():
+    class_usage = build_class_usage_index(USED)
+    equivalences = list(generate_equivalences(
+        class_usage, {}, build_shared_class_groups(class_usage), build_skos_equivalence_classes([('A', 'B')]),
+        build_wikidata_groups({'A': Q + 'Q1', 'B': Q + 'Q1', 'C': Q + 'Q2', 'D': Q + 'Q2'}), {Q + 'Q1': 'one'}))
+    usage = {e['type']: sorted(tuple(row) for row in e['usage']) for e in equivalences}
+    # Q2's classes are only used in one graph, so it is not an equivalence
+    assert len(equivalences) == 3
+    assert usage == {
+        'shared': [('g1', 'X', 5), ('g2', 'X', 6)],
+        'direct': [('g1', 'A', 1), ('g2', 'B', 2)],
+        'wikidata': [('g1', 'A', 1), ('g2', 'B', 2)],
+    }
+    assert [e['label'] for e in equivalences if e['type'] == 'wikidata'] == ['one']
+
+
+def test_overlap_usage_rows():
+    # With A and B one SKOS group, g1 and g2 have the same vocabulary
+    class_usage = build_class_usage_index(USED)
+    vocabularies = graph_vocabularies(USED, build_skos_equivalence_classes([('A', 'B')]))
+    equivalences = list(generate_equivalences(class_usage, {}, {}, [], {}, {}, overlaps=[('g1', 'g2', 1.0)],
+                                              vocabularies=vocabularies))
+    assert [(e['type'], e['graphs']) for e in equivalences] == [('overlap', ['g1', 'g2'])]
+    assert sorted(tuple(row) for row in equivalences[0]['usage']) == [
+        ('g1', 'A', 1), ('g1', 'X', 5), ('g2', 'B', 2), ('g2', 'X', 6)]
@@ -0,0 +1,92 @@
+"""Tests of the frontend's graph overview: as generate_equivalences.py writes it, and read back from what the backend serves."""
+
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+import benchmark_pipeline
+from generate_equivalences import OKN, OVERVIEW_VERSION, write_overview
+from ttl_index import dataset_version
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GRAPHS = {'g2': None, 'g1': 'Graph one'}
+
+# g3 is not a Proto-OKN graph, and the Wikidata equivalence has no usage row for g1
+EQUIVALENCES = [
+    {'id': 'okn:equiv-wikidata-Q1', 'type': 'wikidata', 'label': 'one', 'graphs': ['g1', 'g2', 'g3'],
+     'usage': [('g2', 'B', '2'), ('g3', 'C', '3')]},
+    {'id': 'okn:equiv-direct-0123abcd', 'type': 'direct', 'label': 'SKOS: A', 'graphs': ['g1', 'g2'],
+     'usage': [('g1', 'A', '1'), ('g2', 'B', '2'), ('g1', 'A2', '4')]},
+]
+
+
+def test_overview_mirrors_the_equivalences_query(tmp_path):
+    path = tmp_path / 'graph-overview.json'
+    write_overview(GRAPHS, EQUIVALENCES, str(path), 'v1')
+    overview = json.loads(path.read_text())
+    assert (overview['version'], overview['dataset']) == (OVERVIEW_VERSION, 'v1')
+    assert overview['graphs'] == [{'iri': 'g1', 'label': 'Graph one'}, {'iri': 'g2', 'label': None},
+                                  {'iri': 'g3', 'label': None}]
+    assert overview['equivalences'] == [
+        {'iri': OKN + 'equiv-direct-0123abcd', 'type': OKN + 'DirectClassEquivalence', 'label': 'SKOS: A'},
+        {'iri': OKN + 'equiv-wikidata-Q1', 'type': OKN + 'WikidataEquivalence', 'label': 'one'},
+    ]
+    # [equivalence, graph, class, count], one row per class a graph uses
+    assert overview['usage'] == [[0, 0, 'A', '1'], [0, 0, 'A2', '4'], [0, 1, 'B', '2'],
+                                 [1, 0, None, None], [1, 1, 'B', '2'], [1, 2, 'C', '3']]
+
+
+def test_gzip_copy_is_reproducible(tmp_path):
+    path = tmp_path / 'graph-overview.json'
+    write_overview(GRAPHS, EQUIVALENCES, str(path))
+    compressed = (tmp_path / 'graph-overview.json.gz').read_bytes()
+    assert gzip.decompress(compressed) == path.read_bytes()
+    write_overview(GRAPHS, list(reversed(EQUIVALENCES)), str(path))
+    assert (tmp_path / 'graph-overview.json.gz').read_bytes() == compressed
+
+
+def generate(*options):
+    command = [sys.executable, os.path.join(HERE, 'generate_equivalences.py'), '--labels-offline', '--label-cache', '',
+               '--workers', '1', *options]
+    return subprocess.run(command, cwd=HERE, capture_output=True, text=True)
+
+
+@pytest.fixture(scope='module')
+def served(tmp_path_factory):
+    """The synthetic data files with the equivalences generated from them, and the overview written with them."""
+    directory = tmp_path_factory.mktemp('served')
+    benchmark_pipeline.synthetic_dataset(str(directory), 6, 12, 0.3, 3, random.Random(1))
+    data = sorted(str(p) for p in directory.glob('*.ttl'))
+    output = str(directory / '_precomputed_equivalences.ttl')
+    generate('--from-files', *data, '--output', output, '--overview', str(directory / 'generated.json'),
+             '--summary', '', '--overlap-threshold', '0.2').check_returncode()
+    return directory, data + [output], output
+
+
+def test_served_overview_matches_the_generated_one(served):
+    directory, paths, output = served
+    result = generate('--overview-only', '--from-files', *paths, '--output', output,
+                      '--overview', str(directory / 'served.json'))
+    assert result.returncode == 0, result.stderr
+    generated = json.loads((directory / 'generated.json').read_text())
+    overview = json.loads((directory / 'served.json').read_text())
+    assert generated['dataset'] is None
+    assert overview.pop('dataset') == dataset_version(paths)
+    generated.pop('dataset')
+    assert generated['equivalences'] and generated['usage']
+    assert overview == generated
+    assert (directory / 'served.json.gz').exists()
+
+
+def test_served_overview_needs_the_equivalences_among_the_files(served):
+    directory, paths, output = served
+    result = generate('--overview-only', '--from-files', *paths[:-1], '--output', output,
+                      '--overview', str(directory / 'other.json'))
+    assert result.returncode == 2 and 'including --output' in result.stderr
+    assert not (directory / 'other.json').exists()
@@ -0,0 +1,67 @@
+"""Tests of the phase profiler (profiling.py) and the --profile and --cprofile options of the analysis scripts."""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from profiling import REPORT_VERSION, Profiler
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(script, *args, cwd):
+    return subprocess.run([sys.executable, os.path.join(HERE, script), *args],
+                          cwd=cwd, capture_output=True, text=True)
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    with profiler.phase('query') as phase:
+        profiler.count(rows=1)
+    assert phase is None and profiler.phases == []
+
+
+def test_counts_go_to_the_innermost_phase_of_each_thread(tmp_path):
+    profiler = Profiler()
+    profiler.start()
+    with profiler.phase('outer'):
+        profiler.count(rows=1)
+        with profiler.phase('inner'):
+            profiler.count(rows=2, bytes=10)
+
+        def worker():
+            with profiler.phase('worker'):
+                profiler.count(rows=5)
+
+        thread = threading.Thread(target=worker, name='worker-thread')
+        thread.start()
+        thread.join()
+    profiler.write_report(str(tmp_path / 'report.json'))
+
+    report = json.loads((tmp_path / 'report.json').read_text())
+    assert report['version'] == REPORT_VERSION and report['cprofile'] is None
+    phases = {p['name']: p for p in report['phases']}
+    assert [p['name'] for p in report['phases']] == ['outer', 'inner', 'worker']
+    assert (phases['outer']['rows'], phases['inner']['rows'], phases['inner']['bytes']) == (1, 2, 10)
+    # A phase opened in another thread is not nested under that thread's caller
+    assert (phases['inner']['parent'], phases['worker']['parent']) == ('outer', None)
+    assert (phases['worker']['thread'], phases['worker']['rows']) == ('worker-thread', 5)
+    assert not profiler.enabled
+
+
+@pytest.mark.parametrize('script', ['analyze_class_usage.py', 'generate_equivalences.py'])
+def test_cprofile_requires_profile(tmp_path, script):
+    result = run(script, '--cprofile', 'stats.pstats', cwd=tmp_path)
+    assert result.returncode == 2
+    assert '--cprofile requires --profile' in result.stderr
+    assert not (tmp_path / 'stats.pstats').exists()
+
+
+def test_cprofile_with_profile(tmp_path):
+    result = run('analyze_class_usage.py', '--profile', 'report.json', '--cprofile', 'stats.pstats', cwd=tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert (tmp_path / 'report.json').exists() and (tmp_path / 'stats.pstats').exists()
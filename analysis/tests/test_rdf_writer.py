@@ -0,0 +1,74 @@
+"""Tests of rdf_writer.py: escaping, formats and byte-identical rewrites."""
+
+import os
+
+import pytest
+from rdflib import BNode, Graph, Literal, URIRef
+
+from rdf_writer import IRI, RDF_TYPE, Blank, RdfWriter, escape_iri
+
+EX = 'http://example.org/'
+LABEL = 'say "hi"\\ \n\ttab \r\x01 é \U0001F600'
+
+
+def write(path, prefixes=None):
+    with RdfWriter.open(str(path), prefixes if prefixes is not None else {'ex': EX}, 'Test output') as writer:
+        writer.subject(IRI(EX + 'a'), [
+            (RDF_TYPE, IRI(EX + 'Thing')),
+            (EX + 'label', LABEL),
+            (EX + 'link', IRI(EX + 'has space/<angle>"quote"{brace}|pipe^caret`tick\\slash')),
+            (EX + 'count', 3),
+            (EX + 'ratio', 0.5),
+            (EX + 'flag', False),
+            (EX + 'usage', Blank([(EX + 'graph', IRI(EX + 'g')), (EX + 'count', 7)])),
+        ])
+        writer.subject(IRI(EX + 'b.c'), [(EX + 'usage', Blank([(EX + 'count', 1)]))])
+    return path
+
+
+def parse(path):
+    if str(path).endswith('.gz'):
+        import gzip
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return Graph().parse(data=f.read(), format='nt')
+    return Graph().parse(str(path), format='nt' if str(path).endswith('.nt') else 'turtle')
+
+
+@pytest.mark.parametrize('name', ['out.ttl', 'out.nt', 'out.nt.gz'])
+def test_round_trip(tmp_path, name):
+    graph = parse(write(tmp_path / name))
+    a = URIRef(EX + 'a')
+    assert graph.value(a, URIRef(EX + 'label')) == Literal(LABEL)
+    assert graph.value(a, URIRef(EX + 'link')) == URIRef(
+        EX + 'has%20space/%3Cangle%3E%22quote%22%7Bbrace%7D%7Cpipe%5Ecaret%60tick%5Cslash')
+    assert graph.value(a, URIRef(EX + 'count')).toPython() == 3
+    assert graph.value(a, URIRef(EX + 'ratio')).toPython() == 0.5
+    assert graph.value(a, URIRef(EX + 'flag')).toPython() is False
+    usage = graph.value(a, URIRef(EX + 'usage'))
+    assert isinstance(usage, BNode) and graph.value(usage, URIRef(EX + 'count')).toPython() == 7
+    assert len(graph) == 11
+
+
+def test_escape_iri():
+    assert escape_iri(EX + 'a b') == EX + 'a%20b'
+    # Already percent-encoded and non-ASCII characters are legal and kept
+    assert escape_iri(EX + 'a%20b/é') == EX + 'a%20b/é'
+    assert escape_iri('\x00\x1f') == '%00%1F'
+
+
+@pytest.mark.parametrize('name', ['out.ttl', 'out.nt.gz'])
+def test_rewrite_is_byte_identical_and_untouched(tmp_path, name):
+    path = write(tmp_path / name)
+    data = path.read_bytes()
+    os.utime(path, (0, 0))
+    write(path)
+    assert path.read_bytes() == data
+    assert os.stat(path).st_mtime == 0
+    assert not os.path.exists(f'{path}.tmp')
+
+
+def test_no_prefixes_and_header(tmp_path):
+    text = write(tmp_path / 'out.ttl', {}).read_text()
+    assert text.startswith('# Test output\n\n')
+    assert '@prefix' not in text and f'<{EX}b.c>' in text
+    assert 'ex:b.c' in write(tmp_path / 'prefixed.ttl').read_text()
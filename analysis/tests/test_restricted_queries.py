@@ -0,0 +1,61 @@
+"""Tests of the SKOS and Wikidata queries in each filter mode (generate_equivalences.restricted_queries)."""
+
+import pytest
+from rdflib import Graph
+
+from generate_equivalences import SKOS_QUERY, WIKIDATA_QUERY, restricted_queries
+
+# a is a Proto-OKN graph using A and B; other uses C but is not part of Proto-OKN,
+# and no graph uses D
+DATA = """
+@prefix dct: <http://purl.org/dc/terms/> .
+@prefix ex: <http://example.org/> .
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okn: <https://purl.org/okn/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+okns:a a linkml:SchemaDefinition ;
+    dct:isPartOf okn:proto-okn ;
+    linkml:annotations [ linkml:tag okns:counts ; skos:example [ linkml:classes [ skos:example [
+        ex:A [ skos:example 1 ] ; ex:B [ skos:example 2 ] ] ] ] ] .
+
+okns:other a linkml:SchemaDefinition ;
+    linkml:annotations [ linkml:tag okns:counts ; skos:example [ linkml:classes [ skos:example [
+        ex:C [ skos:example 3 ] ] ] ] ] .
+
+ex:A skos:exactMatch ex:B .
+ex:A skos:closeMatch ex:C .
+ex:A skos:broadMatch ex:D .
+<http://www.wikidata.org/entity/Q1> skos:exactMatch ex:A , ex:C .
+"""
+
+EX = 'http://example.org/'
+
+
+@pytest.fixture(scope='module')
+def graph():
+    return Graph().parse(data=DATA, format='turtle')
+
+
+def rows(graph, template, variables, filter_mode):
+    found = set()
+    for query in restricted_queries(template, {EX + 'A', EX + 'B'}, variables, filter_mode, 1):
+        found.update(tuple(str(v) for v in row) for row in graph.query(query))
+    return found
+
+
+def test_join_drops_classes_no_graph_uses(graph):
+    assert (EX + 'A', EX + 'B') in rows(graph, SKOS_QUERY, ('class1', 'class2'), 'join')
+    assert (EX + 'A', EX + 'D') not in rows(graph, SKOS_QUERY, ('class1', 'class2'), 'join')
+    assert (EX + 'A', 'http://www.wikidata.org/entity/Q1') in rows(graph, WIKIDATA_QUERY, ('class',), 'join')
+
+
+def test_join_only_keeps_classes_of_proto_okn_graphs(graph):
+    assert rows(graph, SKOS_QUERY, ('class1', 'class2'), 'join') == {(EX + 'A', EX + 'B')}
+    assert rows(graph, WIKIDATA_QUERY, ('class',), 'join') == {(EX + 'A', 'http://www.wikidata.org/entity/Q1')}
+
+
+@pytest.mark.parametrize('filter_mode', ['all', 'values'])
+def test_other_modes_leave_the_rest_to_python(graph, filter_mode):
+    assert {(EX + 'A', EX + 'C'), (EX + 'A', EX + 'D')} <= rows(graph, SKOS_QUERY, ('class1', 'class2'), filter_mode)
@@ -0,0 +1,186 @@
+"""Tests of sparql_client.py against a local HTTP server: results, mid-stream failures and serialized output, and --workers."""
+
+import gzip
+import io
+import os
+import subprocess
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sparql_client import SerializedLines, SparqlClient, SparqlError, serialized_output
+
+JSON = 'application/sparql-results+json'
+XML = 'application/sparql-results+xml'
+
+RESULTS_JSON = (b'{"head": {"vars": ["s"]}, "results": {"bindings": ['
+                b'{"s": {"type": "uri", "value": "http://example.org/a"}},'
+                b'{"s": {"type": "uri", "value": "http://example.org/b"}}]}}')
+RESULTS_XML = (b'<?xml version="1.0"?><sparql xmlns="http://www.w3.org/2005/sparql-results#">'
+               b'<head><variable name="s"/></head><results>'
+               b'<result><binding name="s"><uri>http://example.org/a</uri></binding></result>'
+               b'<result><binding name="s"><uri>http://example.org/b</uri></binding></result>'
+               b'</results></sparql>')
+
+# path -> (content type, body, gzip'd, bytes actually sent or None for all)
+RESPONSES = {
+    '/ok': (JSON, RESULTS_JSON, False, None),
+    '/ok-gzip': (XML, RESULTS_XML, True, None),
+    '/truncated-xml': (XML, RESULTS_XML, False, 240),
+    '/malformed-xml': (XML, RESULTS_XML.replace(b'</result>', b'</rezult>'), False, None),
+    '/malformed-json': (JSON, RESULTS_JSON.replace(b'"http://example.org/b"', b'"http://example.org/b'), False, None),
+    '/truncated-gzip': (JSON, RESULTS_JSON, True, 60),
+    '/flaky': (JSON, RESULTS_JSON, False, None),
+    '/missing': (JSON, RESULTS_JSON, False, None),
+    '/reused': (JSON, RESULTS_JSON, True, None),
+}
+# path -> statuses answered, one per request, before the response above
+ERRORS = {'/flaky': [503, 502], '/missing': [404]}
+HITS = Counter()
+PEERS = {}                                      # path -> client ports it was requested from
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        HITS[path] += 1
+        PEERS.setdefault(path, set()).add(self.client_address[1])
+        errors = ERRORS.get(path, [])
+        if HITS[path] <= len(errors):
+            self.send_response(errors[HITS[path] - 1])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content_type, body, gzipped, sent = RESPONSES[path]
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body[:sent])
+        if sent is not None:
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.mark.parametrize('path', ['/ok', '/ok-gzip'])
+def test_rows(server, path):
+    client = SparqlClient(timeout=5, retries=0)
+    assert [row['s'] for row in client.query(server + path, 'SELECT ?s {}')] == [
+        'http://example.org/a', 'http://example.org/b']
+    client.close()
+
+
+def test_transient_errors_are_retried(server):
+    client = SparqlClient(timeout=5, retries=2, backoff=0)
+    assert len(list(client.query(server + '/flaky', 'SELECT ?s {}'))) == 2
+    assert HITS['/flaky'] == 3
+    client.close()
+
+
+def test_other_errors_are_not(server):
+    client = SparqlClient(timeout=5, retries=2, backoff=0)
+    with pytest.raises(SparqlError, match='HTTP 404'):
+        list(client.query(server + '/missing', 'SELECT ?s {}'))
+    assert HITS['/missing'] == 1
+    client.close()
+
+
+def test_connections_are_pooled(server):
+    client = SparqlClient(timeout=5, retries=0, pool_size=2)
+
+    def rows(_):
+        return len(list(client.query(server + '/reused', 'SELECT ?s {}')))
+
+    for _ in range(3):
+        rows(None)
+    assert len(PEERS['/reused']) == 1
+    # Two threads never need more than two connections, and the pool keeps both
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert list(pool.map(rows, range(16))) == [2] * 16
+    assert len(PEERS['/reused']) <= 2
+    # More threads open more connections, but only pool_size of them are kept
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(rows, range(16))) == [2] * 16
+    idle, = client._pools.values()
+    assert idle.qsize() <= 2
+    client.close()
+    assert client._pools == {}
+
+
+@pytest.mark.parametrize('path', ['/truncated-xml', '/malformed-xml', '/malformed-json', '/truncated-gzip'])
+def test_mid_stream_failure_is_a_sparql_error(server, path):
+    client = SparqlClient(timeout=5, retries=0)
+    with pytest.raises(SparqlError, match='failed after'):
+        list(client.query(server + path, 'SELECT ?s {}'))
+    client.close()
+
+
+def test_serialized_lines_keep_lines_whole():
+    out = io.StringIO()
+    stream = SerializedLines(out)
+
+    def chatter(n):
+        for i in range(200):
+            print(f'thread {n} line {i}', 'with', 'several', 'parts', file=stream)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(chatter, range(8)))
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 1600
+    assert all(line.startswith('thread ') and line.endswith(' with several parts') for line in lines)
+
+
+def test_unfinished_lines_of_every_thread_are_written(capsys):
+    # Every thread stays alive until all have printed, so none reuses another's id
+    barrier = threading.Barrier(3)
+
+    def unfinished(n):
+        print(f'thread {n}', end='')
+        barrier.wait()
+
+    with serialized_output():
+        threads = [threading.Thread(target=unfinished, args=(n,)) for n in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        print('main', end='')
+    assert sorted(capsys.readouterr().out.split('\n')) == ['main', 'thread 0', 'thread 1', 'thread 2']
+
+
+def test_serialized_output_restores_streams(capsys):
+    stdout = sys.stdout
+    with serialized_output():
+        assert isinstance(sys.stdout, SerializedLines)
+        print('partial', end='')
+    assert sys.stdout is stdout
+    assert capsys.readouterr().out == 'partial'
+
+
+@pytest.mark.parametrize('workers', ['0', '-1'])
+def test_workers_must_be_positive(tmp_path, workers):
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'generate_equivalences.py')
+    result = subprocess.run([sys.executable, script, '--workers', workers], cwd=tmp_path, capture_output=True, text=True)
+    assert result.returncode == 2 and '--workers must be at least 1' in result.stderr
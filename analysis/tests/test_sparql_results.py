@@ -0,0 +1,124 @@
+"""Tests of sparql_results.py: the three result formats, read a few bytes at a time."""
+
+import io
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import sparql_results
+from sparql_results import JSON, TSV, XML, detect_format, iter_bindings
+
+EX = 'http://example.org/'
+LABEL = 'café ☕ \U0001F600 "quoted"'
+
+RESULTS_JSON = ('{"head": {"vars": ["s", "label"]},\n "results": {"bindings": [\n'
+                '  {"s": {"type": "uri", "value": "http://example.org/a"},'
+                ' "label": {"type": "literal", "xml:lang": "en", "value": "café ☕ \\ud83d\\ude00 \\"quoted\\""}},\n'
+                '  {"s": {"type": "bnode", "value": "b0"}, "label": {"type": "typed-literal", "value": "2"}} ,\n'
+                '  {"s": {"type": "uri", "value": "http://example.org/{}[]"}}\n'
+                ']}}').encode('utf-8')
+
+RESULTS_XML = ('<?xml version="1.0"?>\n<sparql xmlns="http://www.w3.org/2005/sparql-results#">'
+               '<head><variable name="s"/><variable name="label"/></head><results>'
+               '<result><binding name="s"><uri>http://example.org/a</uri></binding>'
+               '<binding name="label"><literal xml:lang="en">café ☕ \U0001F600 "quoted"</literal></binding></result>'
+               '<result><binding name="s"><bnode>b0</bnode></binding>'
+               '<binding name="label"><literal datatype="http://www.w3.org/2001/XMLSchema#integer">2</literal></binding></result>'
+               '<result><binding name="s"><uri>http://example.org/{}[]</uri></binding></result>'
+               '</results></sparql>').encode('utf-8')
+
+RESULTS_TSV = ('?s\t?label\n'
+               '<http://example.org/a>\t"caf\\u00E9 \\u2615 \\U0001F600 \\"quoted\\""@en\n'
+               '_:b0\t2\n'
+               '<http://example.org/{}[]>\t\n').encode('utf-8')
+
+ROWS = [{'s': EX + 'a', 'label': LABEL}, {'label': '2'}, {'s': EX + '{}[]'}]
+
+
+class TrickleReader:
+    """A stream that returns at most size bytes per read, to split everything across chunks."""
+
+    def __init__(self, data, size=7):
+        self.stream = io.BytesIO(data)
+        self.size = size
+
+    def read(self, size=-1):
+        return self.stream.read(self.size if size is None or size < 0 else min(size, self.size))
+
+
+@pytest.mark.parametrize('data', [RESULTS_JSON, RESULTS_XML, RESULTS_TSV], ids=[JSON, XML, TSV])
+def test_formats_give_the_same_rows(data):
+    assert list(iter_bindings(io.BytesIO(data))) == ROWS
+
+
+@pytest.mark.parametrize('size', [1, 7, 64])
+def test_json_split_across_chunks(size):
+    # Keys, multi-byte characters and escapes all end up split between reads
+    assert list(sparql_results._iter_json(TrickleReader(RESULTS_JSON, size))) == ROWS
+    assert list(iter_bindings(TrickleReader(RESULTS_JSON, size))) == ROWS
+
+
+def test_json_without_bindings():
+    assert list(iter_bindings(io.BytesIO(b'{"head": {"vars": []}, "boolean": true}'), fmt=JSON)) == []
+    assert list(iter_bindings(io.BytesIO(b'{"results": {"bindings": []}}'), fmt=JSON)) == []
+
+
+def test_truncated_json_raises():
+    with pytest.raises(ValueError):
+        list(iter_bindings(io.BytesIO(RESULTS_JSON[:-40]), fmt=JSON))
+
+
+@pytest.mark.parametrize('size', [7, 64 * 1024])
+def test_tsv_split_across_chunks(size):
+    assert list(iter_bindings(TrickleReader(RESULTS_TSV, size), fmt=TSV)) == ROWS
+
+
+def test_tsv_escapes_and_line_endings():
+    data = ('?a\t?b\t?c\r\n'
+            '"tab\\there\\nnewline\\\\backslash"\t"it\\\'s"^^<http://www.w3.org/2001/XMLSchema#string>\t'
+            '"\\u00e9\\U0001f600"\r\n'
+            '\t\ttrue\r\n').encode('utf-8')
+    assert list(iter_bindings(io.BytesIO(data), fmt=TSV)) == [
+        {'a': 'tab\there\nnewline\\backslash', 'b': "it's", 'c': 'é\U0001F600'},
+        {'c': 'true'},
+    ]
+
+
+def test_xml_results_are_cleared_as_they_are_read(monkeypatch):
+    results = []
+    iterparse = ET.iterparse
+
+    def recording(stream, events):
+        for event, elem in iterparse(stream, events):
+            if event == 'start' and elem.tag == sparql_results.SPARQL_NS + 'results':
+                results.append(elem)
+            yield event, elem
+
+    monkeypatch.setattr(sparql_results.ET, 'iterparse', recording)
+    # By the time a row is handed out, the results read before it are gone:
+    # only its own result and at most the start of the next one remain
+    rows = 0
+    for _ in iter_bindings(TrickleReader(RESULTS_XML), fmt=XML):
+        rows += 1
+        assert len(results[0]) <= 2
+    assert rows == 3 and len(results[0]) == 0
+
+
+@pytest.mark.parametrize('content_type, filename, head, fmt', [
+    ('application/sparql-results+json; charset=utf-8', None, b'', JSON),
+    ('text/tab-separated-values', None, b'', TSV),
+    ('application/sparql-results+xml', 'x.json', b'{', XML),
+    (None, 'results.srj', b'', JSON),
+    (None, 'results.tsv', b'', TSV),
+    (None, None, b'  \n{"head"', JSON),
+    (None, None, b'?s\t?o', TSV),
+    (None, None, b'<?xml', XML),
+])
+def test_detect_format(content_type, filename, head, fmt):
+    assert detect_format(content_type, filename, head) == fmt
+
+
+def test_paths_use_the_extension(tmp_path):
+    path = tmp_path / 'results.tsv'
+    path.write_bytes(RESULTS_TSV)
+    assert list(iter_bindings(str(path))) == ROWS
@@ -0,0 +1,94 @@
+"""Tests of subclass_index.py on a small hand-built hierarchy with a cycle and diamonds."""
+
+import pytest
+
+from subclass_index import SubclassIndex, strongly_connected_components
+
+# Root
+# ├── A ── B ─┬─ D      D and E both sit under B and C, so their lowest
+# │    └── C ─┴─ E      common ancestors are B and C
+# └── X ⇄ Y ── Z        X and Y form a cycle
+EDGES = [
+    ('A', 'Root'), ('B', 'A'), ('C', 'A'),
+    ('D', 'B'), ('D', 'C'), ('E', 'B'), ('E', 'C'),
+    ('X', 'Root'), ('X', 'Y'), ('Y', 'X'), ('Z', 'Y'),
+    ('Root', 'Root'),
+]
+
+
+@pytest.fixture(scope='module')
+def index():
+    return SubclassIndex.build(EDGES)
+
+
+def test_strongly_connected_components():
+    # 0 ⇄ 1 -> 2, and 3 -> 4 -> 5 -> 3
+    component, n = strongly_connected_components(6, [[1], [0, 2], [], [4], [5], [3]])
+    assert n == 3
+    assert component[0] == component[1] != component[2]
+    assert component[3] == component[4] == component[5] not in (component[0], component[2])
+
+
+def test_cycle_is_one_component(index):
+    assert index.component[index.ids['X']] == index.component[index.ids['Y']]
+    assert len(index.rows) == len(index) - 1
+    assert index.is_subclass_of('X', 'Y') and index.is_subclass_of('Y', 'X')
+    assert index.component_iri(index.component[index.ids['Y']]) == 'X'
+
+
+def test_shared_ancestors_get_the_low_bits(index):
+    root = index.component[index.ids['Root']]
+    assert root == 0 and index.rows[root] == b''
+    for entity in ('A', 'D', 'Z'):
+        assert index.rows[index.component[index.ids[entity]]][0] & 1
+    assert index.depth[index.component[index.ids['D']]] == 3
+
+
+def test_is_subclass_of(index):
+    assert index.is_subclass_of('D', 'Root')
+    assert index.is_subclass_of('D', 'C')
+    assert index.is_subclass_of('Z', 'X')
+    assert index.is_subclass_of('Root', 'Root')
+    assert not index.is_subclass_of('Root', 'D')
+    assert not index.is_subclass_of('B', 'C')
+    assert not index.is_subclass_of('Z', 'A')
+    assert not index.is_subclass_of('D', 'Unknown')
+
+
+def test_ancestors_and_descendants(index):
+    assert index.ancestors('D') == {'A', 'B', 'C', 'Root'}
+    assert index.ancestors('X') == {'Y', 'Root'}
+    assert index.descendants('A') == {'B', 'C', 'D', 'E'}
+    assert index.descendants('Y') == {'X', 'Z'}
+    assert index.ancestors('Unknown') == set() == index.descendants('Unknown')
+
+
+def test_lowest_common_ancestors(index):
+    assert index.lowest_common_ancestors('B', 'C') == {'A'}
+    assert index.lowest_common_ancestors('D', 'E') == {'B', 'C'}
+    assert index.lowest_common_ancestors('D', 'B') == {'B'}
+    assert index.lowest_common_ancestors('Z', 'Y') == {'X'}
+    assert index.lowest_common_ancestors('D', 'Z') == {'Root'}
+    assert index.lowest_common_ancestors('D', 'Unknown') == set()
+
+
+def test_lowest_common_groups(index):
+    groups = index.lowest_common_groups(['B', 'C', 'D', 'E', 'Z', 'Unknown'], hops=2)
+    # D and E meet at B and at C, each also the lowest common ancestor of
+    # itself and them; B and C meet at A, and each meets Z at Root. D and E
+    # are three hops below Root, so they are not grouped there.
+    assert groups == {
+        'Root': {'B': 2, 'C': 2, 'Z': 2},
+        'A': {'B': 1, 'C': 1},
+        'B': {'B': 0, 'D': 1, 'E': 1},
+        'C': {'C': 0, 'D': 1, 'E': 1},
+    }
+
+
+def test_lowest_common_groups_hops_and_depth(index):
+    # D is three hops below Root, Z two: they meet there only with hops=3
+    assert 'Root' not in index.lowest_common_groups(['D', 'Z'], hops=2)
+    assert index.lowest_common_groups(['D', 'Z'], hops=3) == {'Root': {'D': 3, 'Z': 2}}
+    assert index.lowest_common_groups(['D', 'Z'], hops=3, min_depth=1) == {}
+    # An entity and its own ancestor are grouped under the ancestor
+    assert index.lowest_common_groups(['A', 'D'], hops=2) == {'A': {'A': 0, 'D': 2}}
@@ -0,0 +1,119 @@
+"""Tests of ttl_index.py: answering the generator's queries as the endpoint does, reading files as the backend does."""
+
+import gzip
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from rdflib import Graph
+
+import generate_equivalences
+from ttl_index import TtlIndex, process_count, read_rdf, untraced
+
+EX = 'http://example.org/'
+OKNS = 'https://purl.org/okn/schema/'
+WD = 'http://www.wikidata.org/entity/'
+
+# As redirected from the LinkML generator's stdout
+TURTLE = """WARNING:root:something about the schema
+('https://w3id.org/linkml/meta.context.jsonld',)
+@prefix dct: <http://purl.org/dc/terms/> .
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okn: <https://purl.org/okn/> .
+
+<https://purl.org/okn/schema/a> a linkml:SchemaDefinition ;
+    dct:isPartOf okn:proto-okn ;
+    dct:title "Schema a" .
+"""
+
+NTRIPLES = ('<https://purl.org/okn/schema/b> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> '
+            '<https://w3id.org/linkml/SchemaDefinition> .\n'
+            '<https://purl.org/okn/schema/b> <http://purl.org/dc/terms/title> "Schema b" .\n')
+
+
+def test_reads_generator_output_and_ntriples(tmp_path):
+    (tmp_path / 'a.ttl').write_text(TURTLE)
+    with gzip.open(tmp_path / 'b.nt.gz', 'wt') as f:
+        f.write(NTRIPLES)
+    index = TtlIndex.build([str(tmp_path / 'a.ttl'), str(tmp_path / 'b.nt.gz')], workers=2)
+    assert index.proto_okn_graphs() == {OKNS + 'a': 'Schema a'}
+    assert index.titles == {OKNS + 'a': 'Schema a', OKNS + 'b': 'Schema b'}
+
+
+def test_workers_do_not_inherit_tracing():
+    tracemalloc.start()
+    with ProcessPoolExecutor(max_workers=1, initializer=untraced) as pool:
+        assert pool.submit(tracemalloc.is_tracing).result() is False
+    assert tracemalloc.is_tracing()
+    tracemalloc.stop()
+
+
+def test_process_count(monkeypatch):
+    monkeypatch.setattr('os.cpu_count', lambda: 4)
+    assert process_count(None, 100) == 4
+    assert process_count(8, 100) == 4
+    assert process_count(2, 100) == 2
+    assert process_count(8, 3) == 3
+    assert process_count(8, 0) == 1
+
+
+# As redirected from the LinkML generator's stdout; other is not a Proto-OKN
+# graph, and nothing uses D
+DATA = """WARNING:root:something about the schema
+('https://w3id.org/linkml/meta.context.jsonld',)
+@prefix dct: <http://purl.org/dc/terms/> .
+@prefix ex: <http://example.org/> .
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okn: <https://purl.org/okn/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+okns:a a linkml:SchemaDefinition ;
+    dct:isPartOf okn:proto-okn ;
+    dct:title "Schema a" ;
+    linkml:annotations [ linkml:tag okns:counts ; skos:example [ linkml:classes [ skos:example [
+        ex:A [ skos:example 1 ] ; ex:B [ skos:example 2 ] ] ] ] ] .
+
+okns:b a linkml:SchemaDefinition ;
+    dct:isPartOf okn:proto-okn ;
+    linkml:annotations [ linkml:tag okns:counts ; skos:example [ linkml:classes [ skos:example [
+        ex:C [ skos:example 3 ] ] ] ] ] .
+
+okns:other a linkml:SchemaDefinition ;
+    linkml:annotations [ linkml:tag okns:counts ; skos:example [ linkml:classes [ skos:example [
+        ex:E [ skos:example 4 ] ] ] ] ] .
+
+ex:A skos:exactMatch ex:B ; skos:closeMatch ex:C ; skos:broadMatch ex:D ; skos:narrowMatch ex:A .
+<http://www.wikidata.org/entity/Q1> skos:exactMatch ex:A .
+<http://www.wikidata.org/entity/Q2> skos:exactMatch ex:D .
+"""
+
+
+def test_same_results_as_the_endpoint(tmp_path, monkeypatch):
+    path = tmp_path / 'a.ttl'
+    path.write_text(DATA)
+    text, fmt = read_rdf(str(path))
+    graph = Graph().parse(data=text, format=fmt)
+
+    def query_sparql(endpoint, query):
+        for row in graph.query(query):
+            yield {name: str(value) for name, value in row.asdict().items()}
+
+    monkeypatch.setattr(generate_equivalences, 'query_sparql', query_sparql)
+    index = TtlIndex.build([str(path)], workers=1)
+
+    assert index.proto_okn_graphs() == generate_equivalences.get_proto_okn_graphs(None)
+    assert index.proto_okn_graphs() == {'https://purl.org/okn/schema/a': 'Schema a',
+                                        'https://purl.org/okn/schema/b': None}
+
+    used_by_graph, graph_labels = index.used_classes()
+    assert (used_by_graph, graph_labels) == generate_equivalences.get_used_classes(None)
+    assert graph_labels == {'https://purl.org/okn/schema/a': 'Schema a'}
+    used = generate_equivalences.all_used_classes_of(used_by_graph)
+    assert sorted(used) == [EX + 'A', EX + 'B', EX + 'C']
+
+    skos = index.direct_skos_relationships(used)
+    assert sorted(skos) == sorted(generate_equivalences.get_direct_skos_relationships(None, used))
+    assert sorted(skos) == [(EX + 'A', EX + 'B'), (EX + 'A', EX + 'C')]
+
+    wikidata = index.wikidata_relationships(used)
+    assert wikidata == generate_equivalences.get_wikidata_relationships(None, used) == {EX + 'A': WD + 'Q1'}
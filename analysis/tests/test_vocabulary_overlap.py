@@ -0,0 +1,45 @@
+"""Tests of vocabulary_overlap.py: MinHash signatures, LSH banding and the overlap search."""
+
+import pytest
+
+from vocabulary_overlap import MinHasher, find_overlaps, graph_vocabularies, jaccard, lsh_bands, overlap_classes
+
+# close shares 9 of 11 classes with base (Jaccard 9/11); far shares 2 of 18 (Jaccard 1/9)
+BASE = {f'C{i}' for i in range(10)}
+USED = {
+    'base': BASE,
+    'close': (BASE - {'C9'}) | {'D0'},
+    'far': {'C0', 'C1'} | {f'E{i}' for i in range(8)},
+}
+
+
+def test_signature_agreement_estimates_jaccard():
+    hasher = MinHasher(num_perm=256, seed=3)
+    a, b = hasher.signature(USED['base']), hasher.signature(USED['close'])
+    assert len(a) == 256 and hasher.signature(set(USED['base'])) == a
+    agreement = sum(x == y for x, y in zip(a, b)) / 256
+    assert agreement == pytest.approx(9 / 11, abs=0.1)
+
+
+@pytest.mark.parametrize('threshold', [0.3, 0.5, 0.8])
+def test_lsh_bands_turn_up_at_or_below_the_threshold(threshold):
+    bands, rows = lsh_bands(threshold, 128)
+    assert bands * rows <= 128
+    assert (1 / bands) ** (1 / rows) <= threshold
+
+
+def test_find_overlaps_keeps_pairs_above_the_threshold():
+    vocabularies = graph_vocabularies(USED)
+    assert jaccard(vocabularies['base'], vocabularies['close']) == pytest.approx(9 / 11)
+    assert jaccard(vocabularies['base'], vocabularies['far']) == pytest.approx(2 / 18)
+    assert find_overlaps(vocabularies, threshold=0.5) == [('base', 'close', pytest.approx(9 / 11))]
+
+
+def test_equivalent_classes_overlap_through_their_normal_forms():
+    used = {'g1': {'A', 'X'}, 'g2': {'B', 'Y'}}
+    vocabularies = graph_vocabularies(used, skos_groups=[{'A', 'B'}],
+                                      class_to_wikidata={'X': 'wd:Q1', 'Y': 'wd:Q1'})
+    (g1, g2, similarity), = find_overlaps(vocabularies, threshold=0.3)
+    # Shared tokens A (the group representative) and wd:Q1, out of A, B, X, Y and wd:Q1
+    assert similarity == pytest.approx(2 / 5)
+    assert overlap_classes(vocabularies, g1, g2) == {'g1': {'A', 'X'}, 'g2': {'B', 'Y'}}
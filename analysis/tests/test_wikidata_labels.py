@@ -0,0 +1,103 @@
+"""Tests of wikidata_labels.py: the label cache's TTL, stale fallbacks on failure, and offline mode."""
+
+import json
+import time
+
+import pytest
+
+from sparql_client import SparqlError
+from wikidata_labels import CACHE_VERSION, LabelCache, LabelResolver
+
+WD = 'http://www.wikidata.org/entity/'
+DAY = 24 * 3600
+
+
+class Client:
+    """Answers label queries from a dict, recording the entities asked for; fails for any in `failing`."""
+
+    def __init__(self, labels, failing=()):
+        self.labels = labels
+        self.failing = set(failing)
+        self.asked = []
+
+    def query(self, endpoint, query, method='GET'):
+        assert method == 'POST'
+        uris = [part[1:-1] for part in query.split() if part.startswith(f'<{WD}')]
+        self.asked.append(uris)
+        if self.failing & set(uris):
+            raise SparqlError('query failed after 3 attempts: 503')
+        return [{'entity': uri, 'label': self.labels[uri]} for uri in uris if uri in self.labels]
+
+
+def cache_file(path, entries):
+    path.write_text(json.dumps({'version': CACHE_VERSION, 'labels': entries}))
+    return str(path)
+
+
+def test_fetches_missing_labels_in_chunks_and_caches_them(tmp_path):
+    client = Client({WD + 'Q1': 'one', WD + 'Q2': 'two', WD + 'Q4': 'four'})
+    cache = LabelCache(str(tmp_path / 'labels.json'))
+    resolver = LabelResolver(client, cache=cache, chunk_size=2, local_labels={WD + 'Q4': 'local four'})
+    uris = [WD + 'Q1', WD + 'Q2', WD + 'Q3', WD + 'Q4', WD + 'Q1']
+    assert resolver.resolve(uris) == {WD + 'Q1': 'one', WD + 'Q2': 'two', WD + 'Q4': 'local four'}
+    assert client.asked == [[WD + 'Q1', WD + 'Q2'], [WD + 'Q3']]
+    cache.save()
+
+    # Q3 has no English label, and the cache remembers that too
+    client = Client({})
+    resolver = LabelResolver(client, cache=LabelCache(cache.path), local_labels={WD + 'Q4': 'local four'})
+    assert resolver.resolve(uris) == {WD + 'Q1': 'one', WD + 'Q2': 'two', WD + 'Q4': 'local four'}
+    assert client.asked == []
+
+
+def test_entries_older_than_the_ttl_are_fetched_again(tmp_path):
+    now = int(time.time())
+    path = cache_file(tmp_path / 'labels.json', {WD + 'Q1': ['old one', now - 40 * DAY],
+                                                  WD + 'Q2': ['two', now - 10 * DAY]})
+    cache = LabelCache(path, ttl_days=30)
+    assert cache.lookup(WD + 'Q1') == (False, None)
+    assert cache.lookup(WD + 'Q1', allow_stale=True) == (True, 'old one')
+    assert cache.lookup(WD + 'Q2') == (True, 'two')
+
+    client = Client({WD + 'Q1': 'one'})
+    assert LabelResolver(client, cache=cache).resolve([WD + 'Q1', WD + 'Q2']) == {WD + 'Q1': 'one', WD + 'Q2': 'two'}
+    assert client.asked == [[WD + 'Q1']]
+    assert cache.entries[WD + 'Q1'][0] == 'one' and cache.entries[WD + 'Q1'][1] >= now
+
+
+def test_failed_chunks_fall_back_to_stale_entries_then_fallback_labels(tmp_path, capsys):
+    path = cache_file(tmp_path / 'labels.json', {WD + 'Q1': ['stale one', 0], WD + 'Q2': [None, 0]})
+    cache = LabelCache(path, ttl_days=30)
+    client = Client({WD + 'Q1': 'one', WD + 'Q5': 'five'}, failing=[WD + 'Q1'])
+    resolver = LabelResolver(client, cache=cache, chunk_size=3,
+                             fallback_labels={WD + 'Q2': 'earlier two', WD + 'Q3': 'earlier three'})
+    labels = resolver.resolve([WD + 'Q1', WD + 'Q2', WD + 'Q3', WD + 'Q4', WD + 'Q5'])
+    # Q2 is known to have no label, so the fallback label is not used for it
+    assert labels == {WD + 'Q1': 'stale one', WD + 'Q3': 'earlier three', WD + 'Q5': 'five'}
+    assert 'Could not fetch 3 Wikidata labels' in capsys.readouterr().out
+    # Only the chunk that succeeded is cached; the failed one is left to retry
+    assert cache.entries[WD + 'Q1'] == ['stale one', 0]
+    assert WD + 'Q3' not in cache.entries and WD + 'Q4' in cache.entries
+
+
+def test_offline_uses_stale_entries_and_fetches_nothing(tmp_path, capsys):
+    path = cache_file(tmp_path / 'labels.json', {WD + 'Q1': ['stale one', 0]})
+    client = Client({WD + 'Q1': 'one'})
+    resolver = LabelResolver(client, cache=LabelCache(path), offline=True,
+                             fallback_labels={WD + 'Q2': 'earlier two'})
+    assert resolver.resolve([WD + 'Q1', WD + 'Q2', WD + 'Q3']) == {WD + 'Q1': 'stale one', WD + 'Q2': 'earlier two'}
+    assert client.asked == []
+    assert '1 Wikidata entities have no cached label' in capsys.readouterr().out
+
+
+@pytest.mark.parametrize('contents', [{'version': CACHE_VERSION - 1, 'labels': {WD + 'Q1': ['one', 0]}}, None])
+def test_old_or_missing_cache_files_start_empty(tmp_path, contents):
+    path = tmp_path / 'labels.json'
+    if contents is not None:
+        path.write_text(json.dumps(contents))
+    cache = LabelCache(str(path))
+    assert cache.entries == {}
+    cache.store([WD + 'Q1'], {})
+    cache.save()
+    assert LabelCache(str(path)).lookup(WD + 'Q1') == (True, None)
+    assert not (tmp_path / 'labels.json.tmp').exists()
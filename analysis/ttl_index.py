@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+In-process index over the backend TTL files, for running without an endpoint.
+
+Parses each Turtle file in its own worker process and extracts only what
+generate_equivalences.py asks the SPARQL endpoint for:
+1. Per-graph used-class counts from the LinkML counts annotations
+2. Direct SKOS links (exactMatch, closeMatch, broadMatch, narrowMatch)
+3. Wikidata entities linked to classes with skos:exactMatch
+4. Any labels the local data holds for those Wikidata entities
+5. Class definitions (linkml:ClassDefinition or okns:ClassDefinition) with
+   their class URI and defining schema
+
+Blank nodes never leave a worker, so per-file results are small and are merged
+in the parent process. The files are read with the backend's own loader
+(docker-backend/okn_endpoint/loader.py), so they are parsed exactly as the
+server parses them. Requires rdflib (installed in the backend image).
+
+The pool has at most one worker per CPU core, so the parse only gets faster
+with more cores; the largest files are started first, so that none is left
+running alone at the end.
+
+Usage:
+  from ttl_index import TtlIndex
+
+  index = TtlIndex.build(glob.glob('../docker-backend/*.ttl'))
+  used_by_graph, graph_labels = index.used_classes()
+
+  # Later, parse only the files that changed
+  index = TtlIndex.build(paths, cached={p: index.file_facts[p] for p in unchanged})
+"""
+
+import os
+import sys
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+DCT = 'http://purl.org/dc/terms/'
+LINKML = 'https://w3id.org/linkml/'
+OKN = 'https://purl.org/okn/'
+OKNS = 'https://purl.org/okn/schema/'
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+RDFS_LABEL = 'http://www.w3.org/2000/01/rdf-schema#label'
+SKOS = 'http://www.w3.org/2004/02/skos/core#'
+WIKIDATA_ENTITY = 'http://www.wikidata.org/entity/'
+
+SKOS_LINKS = ('exactMatch', 'closeMatch', 'broadMatch', 'narrowMatch')
+
+# Most schema files type their classes okns:ClassDefinition, a few linkml:ClassDefinition
+CLASS_DEFINITION_TYPES = (LINKML + 'ClassDefinition', OKNS + 'ClassDefinition')
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'docker-backend')
+
+
+def read_rdf(path):
+    """Return (text, format) of a data file, read as the backend reads it.
+
+    Drops any LinkML generator output printed before the Turtle, and reads .nt
+    and .nt.gz files as N-Triples (see okn_endpoint/loader.py).
+    """
+    if BACKEND_DIR not in sys.path:
+        sys.path.append(BACKEND_DIR)
+    from okn_endpoint.loader import read_rdf as backend_read_rdf
+    return backend_read_rdf(path)
+
+
+def dataset_version(paths):
+    """Return the dataset version the backend reports when serving paths (see okn_endpoint/loader.py)."""
+    if BACKEND_DIR not in sys.path:
+        sys.path.append(BACKEND_DIR)
+    from okn_endpoint.loader import dataset_version as backend_dataset_version
+    return backend_dataset_version(paths)
+
+
+def process_count(workers, tasks):
+    """Worker processes for tasks: at most workers (default: all cores), one per core, one per task."""
+    cores = os.cpu_count() or 1
+    return max(1, min(workers or cores, cores, tasks))
+
+
+def untraced():
+    """Worker initializer: a forked worker inherits --profile's tracemalloc, which slows parsing several times over."""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def scan_file(path):
+    """Parse one TTL file and return the facts the generator needs, as plain strings."""
+    from rdflib import BNode, Graph, Literal, URIRef
+
+    text, fmt = read_rdf(path)
+    g = Graph()
+    g.parse(data=text, format=fmt, publicID=path)
+
+    is_part_of = URIRef(DCT + 'isPartOf')
+    title = URIRef(DCT + 'title')
+    annotations = URIRef(LINKML + 'annotations')
+    classes = URIRef(LINKML + 'classes')
+    tag = URIRef(LINKML + 'tag')
+    example = URIRef(SKOS + 'example')
+    exact_match = URIRef(SKOS + 'exactMatch')
+
+    facts = {
+        'members': [str(s) for s in g.subjects(is_part_of, URIRef(OKN + 'proto-okn'))],
+        'schemas': [str(s) for s in g.subjects(URIRef(RDF_TYPE), URIRef(LINKML + 'SchemaDefinition'))],
+        'titles': {},
+        'counts': defaultdict(dict),
+        'skos_pairs': [],
+        'wikidata_links': [],
+        'wikidata_labels': {},
+        'class_types': [],
+        'class_uris': [],
+        'class_schemes': [],
+    }
+
+    for s, o in g.subject_objects(title):
+        if isinstance(s, URIRef) and isinstance(o, Literal):
+            facts['titles'][str(s)] = str(o)
+
+    # graph linkml:annotations [ linkml:tag okns:counts ;
+    #   skos:example/linkml:classes/skos:example [ ?classUri [ skos:example ?count ] ] ]
+    counts_tag = URIRef(OKNS + 'counts')
+    for graph, annotation in g.subject_objects(annotations):
+        if (annotation, tag, counts_tag) not in g:
+            continue
+        for by_kind in g.objects(annotation, example):
+            for class_block in g.objects(by_kind, classes):
+                for class_counts in g.objects(class_block, example):
+                    for class_uri, node in g.predicate_objects(class_counts):
+                        for count in g.objects(node, example):
+                            facts['counts'][str(graph)][str(class_uri)] = str(count)
+
+    for name in SKOS_LINKS:
+        for s, o in g.subject_objects(URIRef(SKOS + name)):
+            if isinstance(s, URIRef) and isinstance(o, URIRef) and s != o:
+                facts['skos_pairs'].append((str(s), str(o)))
+
+    for wikidata, class_uri in g.subject_objects(exact_match):
+        if str(wikidata).startswith(WIKIDATA_ENTITY) and not isinstance(class_uri, BNode):
+            facts['wikidata_links'].append((str(class_uri), str(wikidata)))
+
+    label = URIRef(RDFS_LABEL)
+    for s, o in g.subject_objects(label):
+        if str(s).startswith(WIKIDATA_ENTITY) and isinstance(o, Literal) and o.language in (None, 'en'):
+            facts['wikidata_labels'][str(s)] = str(o)
+
+    # A class definition's type, class URI and schemes can come from different
+    # files, so they are joined only after merging
+    for class_type in CLASS_DEFINITION_TYPES:
+        for class_iri in g.subjects(URIRef(RDF_TYPE), URIRef(class_type)):
+            if isinstance(class_iri, URIRef):
+                facts['class_types'].append(str(class_iri))
+    for s, o in g.subject_objects(URIRef(LINKML + 'class_uri')):
+        if isinstance(s, URIRef) and isinstance(o, URIRef):
+            facts['class_uris'].append((str(s), str(o)))
+    for s, o in g.subject_objects(URIRef(SKOS + 'inScheme')):
+        if isinstance(s, URIRef) and isinstance(o, URIRef):
+            facts['class_schemes'].append((str(s), str(o)))
+
+    facts['counts'] = dict(facts['counts'])
+    return facts
+
+
+class TtlIndex:
+    """Merged facts from a set of TTL files, answering the generator's queries."""
+
+    def __init__(self):
+        self.members = set()
+        self.schemas = set()
+        self.titles = {}
+        self.counts = defaultdict(dict)
+        self.skos_pairs = set()
+        self.wikidata_links = set()
+        self.wikidata_labels = {}
+        self.class_types = set()
+        self.class_uris = defaultdict(set)
+        self.class_schemes = defaultdict(set)
+        self.file_facts = {}
+
+    @classmethod
+    def build(cls, paths, workers=None, cached=None):
+        """Parse paths in a process pool, one file per task, and merge the results in path order.
+
+        Files with facts in cached ({path: facts} from an earlier build's
+        file_facts) are not parsed again.
+        """
+        index = cls()
+        facts = dict(cached or {})
+        parse = [path for path in paths if path not in facts]
+        if parse:
+            with ProcessPoolExecutor(max_workers=process_count(workers, len(parse)), initializer=untraced) as pool:
+                futures = {path: pool.submit(scan_file, path) for path in sorted(parse, key=os.path.getsize, reverse=True)}
+                for path in parse:
+                    facts[path] = futures[path].result()
+        for path in paths:
+            index.file_facts[path] = facts[path]
+            index.merge(facts[path])
+        return index
+
+    def merge(self, facts):
+        self.members.update(facts['members'])
+        self.schemas.update(facts['schemas'])
+        self.titles.update(facts['titles'])
+        for graph_uri, classes in facts['counts'].items():
+            self.counts[graph_uri].update(classes)
+        # Facts read back from JSON hold lists where scan_file() gave tuples
+        self.skos_pairs.update(map(tuple, facts['skos_pairs']))
+        self.wikidata_links.update(map(tuple, facts['wikidata_links']))
+        self.wikidata_labels.update(facts['wikidata_labels'])
+        self.class_types.update(facts['class_types'])
+        for class_iri, uri in facts['class_uris']:
+            self.class_uris[class_iri].add(uri)
+        for class_iri, scheme in facts['class_schemes']:
+            self.class_schemes[class_iri].add(scheme)
+
+    def proto_okn_graphs(self):
+        """Same result as get_proto_okn_graphs(): {graph: label or None}."""
+        return {g: self.titles.get(g) for g in self.members & self.schemas}
+
+    def used_classes(self):
+        """Same result as get_used_classes(): ({graph: {class: count}}, {graph: label})."""
+        used_by_graph = defaultdict(dict)
+        graph_labels = {}
+        for graph_uri in self.members & self.schemas:
+            if graph_uri not in self.counts:
+                continue
+            used_by_graph[graph_uri].update(self.counts[graph_uri])
+            if graph_uri in self.titles:
+                graph_labels[graph_uri] = self.titles[graph_uri]
+        return used_by_graph, graph_labels
+
+    def direct_skos_relationships(self, used_classes):
+        """Same result as get_direct_skos_relationships()."""
+        used_set = set(used_classes)
+        return [(c1, c2) for c1, c2 in sorted(self.skos_pairs) if c1 in used_set and c2 in used_set]
+
+    def wikidata_relationships(self, used_classes):
+        """Same result as get_wikidata_relationships(): {class_uri: wikidata_uri}."""
+        used_set = set(used_classes)
+        return {c: wd for c, wd in sorted(self.wikidata_links) if c in used_set}
+
+    def class_counts(self):
+        """Same result as get_class_counts(): {graph: {class: count}} for every counts annotation."""
+        return {g: dict(classes) for g, classes in self.counts.items()}
+
+    def class_definitions(self):
+        """Same result as get_class_definitions(): ([(class, class_uri, scheme)], {IRI: title})."""
+        definitions = sorted((c, uri, scheme) for c in self.class_types
+                             for uri in self.class_uris.get(c, ()) for scheme in self.class_schemes.get(c, ()))
+        iris = {c for c, _, _ in definitions} | {s for _, _, s in definitions}
+        return definitions, {iri: self.titles[iri] for iri in iris if iri in self.titles}
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+MinHash/LSH search for graphs with overlapping class vocabularies.
+
+Shared-class equivalences only link graphs that use the very same class URI.
+This finds pairs of graphs whose whole vocabularies are close, without
+comparing every pair of graphs:
+1. Each graph's vocabulary is its used class URIs plus their normalized forms
+   (the representative of the class's SKOS group, and its Wikidata entity),
+   so graphs using different but equivalent classes still overlap
+2. Each vocabulary gets a MinHash signature of num_perm minimum hash values;
+   two signatures agree in a position with probability equal to the Jaccard
+   similarity of the vocabularies
+3. Signatures are split into bands and hashed into LSH buckets; only graphs
+   sharing a bucket become candidate pairs, and each candidate's exact
+   Jaccard similarity is checked against the threshold
+
+Signing is linear in the total vocabulary size and bucketing is linear in the
+number of graphs, so the cost grows with the number of graphs plus the number
+of candidate pairs, not with all pairs. Across runs, signatures can be kept
+with a digest of their vocabulary, so that only graphs whose vocabulary
+changed are signed and checked again.
+
+Usage:
+  from vocabulary_overlap import find_overlaps, graph_vocabularies
+
+  vocabularies = graph_vocabularies(used_by_graph, skos_groups, class_to_wikidata)
+  for graph1, graph2, jaccard in find_overlaps(vocabularies, threshold=0.5):
+      ...
+"""
+
+import hashlib
+import random
+from collections import defaultdict
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def graph_vocabularies(used_by_graph, skos_groups=(), class_to_wikidata=None):
+    """Return {graph: {token: set of the graph's classes giving that token}}.
+
+    A class gives its own URI as a token, plus the smallest URI of its SKOS
+    group and its Wikidata entity, if it has them.
+    """
+    normalized = defaultdict(set)
+    for group in skos_groups:
+        representative = min(group)
+        for class_uri in group:
+            normalized[class_uri].add(representative)
+    for class_uri, wikidata_uri in (class_to_wikidata or {}).items():
+        normalized[class_uri].add(wikidata_uri)
+
+    vocabularies = {}
+    for graph_uri, classes in used_by_graph.items():
+        tokens = defaultdict(set)
+        for class_uri in classes:
+            tokens[class_uri].add(class_uri)
+            for token in normalized.get(class_uri, ()):
+                tokens[token].add(class_uri)
+        vocabularies[graph_uri] = dict(tokens)
+    return vocabularies
+
+
+def vocabulary_digest(tokens):
+    """Digest of a vocabulary's tokens, to tell whether a kept signature still fits it."""
+    return hashlib.blake2b('\n'.join(sorted(tokens)).encode(), digest_size=16).hexdigest()
+
+
+def token_hash(token):
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), 'little')
+
+
+class MinHasher:
+    """num_perm universal hash functions (a * x + b) mod p over 64-bit token hashes."""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.permutations = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+                             for _ in range(num_perm)]
+
+    def signature(self, tokens):
+        hashes = [token_hash(t) for t in tokens]
+        if not hashes:
+            return (MERSENNE_PRIME,) * self.num_perm
+        return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.permutations)
+
+
+def lsh_bands(threshold, num_perm):
+    """Pick (bands, rows) so the LSH S-curve turns up near the threshold.
+
+    A pair with Jaccard similarity s becomes a candidate with probability
+    1 - (1 - s^rows)^bands, which rises most steeply around (1/bands)^(1/rows).
+    Among the splits of num_perm, take the one whose turning point is closest
+    to the threshold without going above it, so close pairs are rarely missed.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        turn = (1 / bands) ** (1 / rows)
+        score = (turn > threshold, abs(turn - threshold))
+        if best is None or score < best[0]:
+            best = (score, bands, rows)
+    return best[1], best[2]
+
+
+class LSHIndex:
+    """Buckets signatures by band; graphs sharing any bucket are candidates."""
+
+    def __init__(self, bands, rows):
+        self.bands = bands
+        self.rows = rows
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+
+    def add(self, key, signature):
+        for band, buckets in enumerate(self.buckets):
+            buckets[signature[band * self.rows:(band + 1) * self.rows]].append(key)
+
+    def candidates(self):
+        pairs = set()
+        for buckets in self.buckets:
+            for keys in buckets.values():
+                for i in range(len(keys)):
+                    for j in range(i + 1, len(keys)):
+                        pairs.add((keys[i], keys[j]) if keys[i] < keys[j] else (keys[j], keys[i]))
+        return pairs
+
+
+def jaccard(a, b):
+    union = len(a.keys() | b.keys())
+    return len(a.keys() & b.keys()) / union if union else 0.0
+
+
+def find_overlaps(vocabularies, threshold=0.5, num_perm=128, seed=1, signatures=None, previous=None):
+    """Return [(graph1, graph2, Jaccard)] for graph pairs at or above threshold, sorted.
+
+    signatures ({graph: (vocabulary digest, signature)}, from earlier calls with
+    the same num_perm and seed) is updated in place, and graphs whose vocabulary
+    digest is unchanged are not signed again. With previous, the overlaps the
+    last call returned for those signatures, a pair of unchanged graphs keeps its
+    similarity and only candidate pairs with a changed graph are checked.
+    """
+    hasher = MinHasher(num_perm, seed)
+    bands, rows = lsh_bands(threshold, num_perm)
+    index = LSHIndex(bands, rows)
+    if signatures is None:
+        signatures = {}
+    changed = set()
+    for graph_uri in sorted(vocabularies):
+        if not vocabularies[graph_uri]:
+            continue
+        vocabulary = vocabulary_digest(vocabularies[graph_uri])
+        if signatures.get(graph_uri, (None,))[0] != vocabulary:
+            signatures[graph_uri] = (vocabulary, hasher.signature(vocabularies[graph_uri]))
+            changed.add(graph_uri)
+        index.add(graph_uri, tuple(signatures[graph_uri][1]))
+    for graph_uri in set(signatures) - {g for g, tokens in vocabularies.items() if tokens}:
+        del signatures[graph_uri]
+
+    if previous is None:
+        changed = set(signatures)
+    overlaps = [(graph1, graph2, similarity) for graph1, graph2, similarity in previous or ()
+                if graph1 in signatures and graph2 in signatures and not {graph1, graph2} & changed]
+    for graph1, graph2 in sorted(index.candidates()):
+        if graph1 not in changed and graph2 not in changed:
+            continue
+        similarity = jaccard(vocabularies[graph1], vocabularies[graph2])
+        if similarity >= threshold:
+            overlaps.append((graph1, graph2, similarity))
+    return sorted(overlaps)
+
+
+def overlap_classes(vocabularies, graph1, graph2):
+    """Return {graph: classes} for the classes behind the tokens two graphs share."""
+    shared = vocabularies[graph1].keys() & vocabularies[graph2].keys()
+    return {g: set().union(*(vocabularies[g][t] for t in shared)) for g in (graph1, graph2)}
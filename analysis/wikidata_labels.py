@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Resolve English labels for Wikidata entities, with a persistent on-disk cache.
+
+Labels come from, in order:
+1. Labels already known locally (from the backend TTL data)
+2. The label cache, if the entry is younger than the cache TTL
+3. The Wikidata query service, in chunked POST requests run a few at a time
+
+Fetched labels are written back to the cache, including entities that have no
+English label, so a repeat run makes no remote calls at all. A chunk that
+fails is reported and falls back to any stale cache entry for its entities,
+then to fallback labels (e.g. from an earlier run's state), then to bare
+Q-ids. In offline mode nothing is fetched: stale cache entries and fallback
+labels are used too, and entities never seen fall back to their Q-ids.
+
+Usage:
+  from wikidata_labels import LabelCache, LabelResolver
+
+  cache = LabelCache('wikidata_labels.json', ttl_days=30)
+  resolver = LabelResolver(client, cache=cache)
+  labels = resolver.resolve(wikidata_uris)
+  cache.save()
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sparql_client import SparqlError
+
+WIKIDATA_ENDPOINT = 'https://query.wikidata.org/sparql'
+CACHE_VERSION = 1
+
+LABEL_QUERY = """
+SELECT ?entity ?label WHERE {{
+  VALUES ?entity {{ {values} }}
+  ?entity <http://www.w3.org/2000/01/rdf-schema#label> ?label .
+  FILTER(LANG(?label) = "en")
+}}
+"""
+
+
+class LabelCache:
+    """JSON file of {entity: [label or None, fetched at]}, with a freshness TTL."""
+
+    def __init__(self, path=None, ttl_days=30):
+        self.path = path
+        self.ttl = ttl_days * 24 * 3600
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('version') == CACHE_VERSION:
+                self.entries = data['labels']
+
+    def lookup(self, uri, allow_stale=False):
+        """Return (found, label). label is None for entities known to have no label."""
+        entry = self.entries.get(uri)
+        if entry is None:
+            return False, None
+        label, fetched = entry
+        if not allow_stale and time.time() - fetched > self.ttl:
+            return False, None
+        return True, label
+
+    def store(self, uris, labels):
+        """Record a fetch: labels for the entities that have one, None for the rest."""
+        now = int(time.time())
+        for uri in uris:
+            self.entries[uri] = [labels.get(uri), now]
+
+    def save(self):
+        """Write the cache, replacing the old file only once fully written."""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'labels': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+class LabelResolver:
+    """Looks labels up locally and in the cache, fetching only what is missing."""
+
+    def __init__(self, client, cache=None, endpoint=WIKIDATA_ENDPOINT, chunk_size=200,
+                 workers=2, offline=False, local_labels=None, fallback_labels=None):
+        self.client = client
+        self.cache = cache if cache is not None else LabelCache()
+        self.endpoint = endpoint
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.offline = offline
+        self.local_labels = dict(local_labels or {})
+        self.fallback_labels = dict(fallback_labels or {})
+
+    def fallback(self, uris, labels):
+        """Fill in labels for uris that could not be fetched from stale cache entries or fallback labels."""
+        for uri in uris:
+            found, label = self.cache.lookup(uri, allow_stale=True)
+            if found:
+                if label is not None:
+                    labels[uri] = label
+            elif uri in self.fallback_labels:
+                labels[uri] = self.fallback_labels[uri]
+
+    def fetch_chunk(self, uris):
+        """Fetch labels for one chunk of entities with a single POST query."""
+        values = ' '.join(f"<{uri}>" for uri in uris)
+        labels = {}
+        for row in self.client.query(self.endpoint, LABEL_QUERY.format(values=values), method='POST'):
+            if 'entity' in row and 'label' in row:
+                labels[row['entity']] = row['label']
+        return labels
+
+    def resolve(self, wikidata_uris):
+        """Return {entity: label} for the entities a label could be found for."""
+        labels = {}
+        missing = []
+        for uri in sorted(set(wikidata_uris)):
+            if uri in self.local_labels:
+                labels[uri] = self.local_labels[uri]
+                continue
+            found, label = self.cache.lookup(uri, allow_stale=self.offline)
+            if found:
+                if label is not None:
+                    labels[uri] = label
+            else:
+                missing.append(uri)
+
+        if not missing:
+            return labels
+        if self.offline:
+            self.fallback(missing, labels)
+            unknown = sum(1 for uri in missing if uri not in labels)
+            print(f"  Offline: {unknown} Wikidata entities have no cached label, using their IDs")
+            return labels
+
+        chunks = [missing[i:i + self.chunk_size] for i in range(0, len(missing), self.chunk_size)]
+        print(f"Fetching {len(missing)} Wikidata labels in {len(chunks)} requests...")
+        fetched = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [(chunk, pool.submit(self.fetch_chunk, chunk)) for chunk in chunks]
+            for chunk, future in futures:
+                try:
+                    chunk_labels = future.result()
+                except (SparqlError, OSError, ValueError) as e:
+                    print(f"  Warning: Could not fetch {len(chunk)} Wikidata labels: {e}")
+                    self.fallback(chunk, labels)
+                    continue
+                self.cache.store(chunk, chunk_labels)
+                labels.update(chunk_labels)
+                fetched += len(chunk_labels)
+        print(f"  Fetched {fetched} Wikidata labels")
+        return labels
@@ -0,0 +1,79 @@
+"""
+pytest configuration: with this file next to okn_endpoint/, pytest puts this
+directory on sys.path, so the tests in tests/ import the package as the
+server does.
+
+  cd docker-backend && python -m pytest -q
+
+It also holds the fixtures shared by the tests.
+"""
+
+import pytest
+
+from okn_endpoint.__main__ import build_app
+from okn_endpoint.store import build_store
+
+# schema1 defines Thing and SensorReading, schema2 defines Sensor; the counts
+# annotations give SensorReading 70 instances in all, Sensor 7 and Thing 5
+DATA = {
+    'schema1.ttl': """\
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+okns:schema1 a linkml:SchemaDefinition ;
+    rdfs:label "Schema one" ;
+    linkml:classes okns:Thing ;
+    linkml:annotations [ linkml:tag okns:counts ; skos:example [ linkml:classes [ skos:example [
+        <https://example.org/Thing> [ skos:example 5 ] ;
+        <https://example.org/SensorReading> [ skos:example 50 ] ] ] ] ] .
+
+okns:Thing a linkml:ClassDefinition ;
+    linkml:class_uri <https://example.org/Thing> ;
+    skos:inScheme okns:schema1 ;
+    rdfs:label "Thing" .
+
+okns:SensorReading a linkml:ClassDefinition ;
+    linkml:class_uri <https://example.org/SensorReading> ;
+    skos:inScheme okns:schema1 ;
+    rdfs:label "Sensor reading" .
+""",
+    'schema2.ttl': """\
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+okns:schema2 a linkml:SchemaDefinition ;
+    rdfs:label "Schema two" ;
+    linkml:annotations [ linkml:tag okns:counts ; skos:example [ linkml:classes [ skos:example [
+        <https://example.org/Sensor> [ skos:example 7 ] ;
+        <https://example.org/SensorReading> [ skos:example 20 ] ] ] ] ] .
+
+okns:Sensor a linkml:ClassDefinition ;
+    linkml:class_uri <https://example.org/Sensor> ;
+    skos:inScheme okns:schema2 ;
+    rdfs:label "Sensor" .
+""",
+}
+
+
+@pytest.fixture
+def data_paths(tmp_path):
+    paths = []
+    for name, text in DATA.items():
+        path = tmp_path / name
+        path.write_text(text)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture(params=['files', 'store'])
+def app(request, data_paths, tmp_path):
+    """The full server app, as __main__ builds it, over two small schema files parsed or in a pre-built store."""
+    if request.param == 'store':
+        store_dir = str(tmp_path / 'store')
+        build_store(data_paths, store_dir)
+        return build_app(data_paths, store_dir=store_dir)
+    return build_app(data_paths)
@@ -0,0 +1,30 @@
+"""
+OKN Map SPARQL backend.
+
+Serves the TTL files in /data through rdflib-endpoint, with the additions the
+map needs on top of a plain `rdflib-endpoint serve`:
+- tolerant loading of LinkML generator output (see loader.py)
+- one named graph per TTL file, a catalogue of them at GET /catalogue, and
+  queries with a default-graph-uri evaluated over that file alone
+  (see partitions.py)
+- an in-memory LRU cache of query results keyed on the dataset version
+  (see query_cache.py)
+- a pre-parsed Oxigraph store built at image build time, so startup does not
+  re-parse the Turtle (see store.py)
+- hot reload of changed TTL files into the store while serving
+  (see reload.py)
+- ordered, cursor-paginated class listings per graph at GET /classes
+  (see class_listing.py)
+- batch lookup of the details of many entities at POST /describe
+  (see entity_details.py)
+- prefix and trigram search over labels, ranked by usage, at GET /search
+  (see label_search.py)
+
+Run with:
+  python -m okn_endpoint --host 0.0.0.0 --port 8000 '/data/*.ttl'
+or, from a pre-parsed store:
+  python -m okn_endpoint --build-store --store /app/store '/data/*.ttl'
+  python -m okn_endpoint --host 0.0.0.0 --port 8000 --store /app/store
+and, to reload changed files into the store while serving:
+  python -m okn_endpoint --host 0.0.0.0 --port 8000 --store /app/store --watch '/data/*.ttl'
+"""
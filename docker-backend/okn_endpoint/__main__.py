@@ -0,0 +1,137 @@
+"""
+Command-line entry point: load the TTL files and serve them over SPARQL.
+"""
+
+import argparse
+import os
+
+import uvicorn
+from fastapi.middleware.cors import CORSMiddleware
+from rdflib_endpoint import SparqlEndpoint
+
+from .class_listing import ClassListing, add_class_listing_route
+from .entity_details import EntityDetails, add_entity_details_route
+from .label_search import INDEX_FILE, LabelIndex, add_label_search_route
+from .loader import dataset_version, expand_paths, load_dataset
+from .partitions import Catalogue, PartitionRouter
+from .query_cache import QueryCache, QueryCacheMiddleware
+from .reload import Reloader, add_reload_routes
+from .store import build_store, open_store, open_writable_store, store_version
+
+
+def index_data(graph, version, store_dir=None):
+    """Build the indexes served next to the SPARQL endpoint from the loaded data.
+
+    The label index is loaded from store_dir instead if it was saved there for this version.
+    """
+    listing = ClassListing.build(graph, version)
+    print(f"INFO:     Indexed {len(listing.listings)} class listings")
+    index = LabelIndex.load(os.path.join(store_dir, INDEX_FILE), version) if store_dir else None
+    if index is None:
+        index = LabelIndex.build(graph)
+        print(f"INFO:     Indexed labels of {len(index.entities)} entities")
+    else:
+        print(f"INFO:     Loaded label index of {len(index.entities)} entities")
+    catalogue = Catalogue.build(graph, version)
+    print(f"INFO:     Catalogued {len(catalogue.sources)} source graphs")
+    return listing, index, catalogue
+
+
+def with_cors(app):
+    """Wrap app in the CORS middleware rdflib-endpoint would add itself.
+
+    It goes outside the query cache and partition router, so their responses
+    get the headers for each request's own Origin, and cached entries hold none.
+    """
+    return CORSMiddleware(app, allow_origins=['*'], allow_credentials=True, allow_methods=['*'], allow_headers=['*'])
+
+
+def build_app(paths, cache_entries=1024, cache_mb=64, store_dir=None, watch=None):
+    """Load the data and return the ASGI app: rdflib-endpoint behind the partition router, the query cache and CORS.
+
+    With store_dir, the pre-parsed store is opened instead of parsing paths.
+    With watch, glob patterns of the TTL files, the store is opened writable
+    and files matching them that change are reloaded into it while serving
+    (see reload.py).
+    """
+    if store_dir:
+        version = store_version(store_dir)
+        if watch:
+            store, graph = open_writable_store(store_dir)
+        else:
+            graph = open_store(store_dir)
+        print(f"INFO:     Opened store {store_dir}")
+    else:
+        version = dataset_version(paths)
+        graph = load_dataset(paths)
+    print(f"INFO:     Dataset version {version}")
+    endpoint = SparqlEndpoint(graph=graph, cors_enabled=False)
+    listing, index, catalogue = index_data(graph, version, store_dir)
+    add_class_listing_route(endpoint, listing)
+    add_entity_details_route(endpoint, EntityDetails(graph))
+    add_label_search_route(endpoint, index)
+    app = router = PartitionRouter(endpoint, graph, catalogue)
+    if cache_entries > 0:
+        cache = QueryCache(max_entries=cache_entries, max_bytes=cache_mb * 1024 * 1024)
+        app = cached = QueryCacheMiddleware(router, cache, version)
+
+    if watch:
+        def set_version(new_version):
+            # None while the store is updated: the cache is neither read nor filled
+            cached.version = new_version
+            if new_version is not None:
+                cache.clear()
+
+        def on_swap(new_version):
+            # Each is replaced in one assignment; requests use whichever they read first
+            listing, index, catalogue = index_data(graph, new_version)
+            # Saved for the next start, which finds the store at this version
+            index.save(os.path.join(store_dir, INDEX_FILE), new_version)
+            endpoint.state.class_listing = listing
+            endpoint.state.label_index = index
+            router.catalogue = catalogue
+
+        reloader = Reloader(watch, store, store_dir, version, on_swap, set_version if app is not router else None)
+        add_reload_routes(endpoint, reloader)
+        reloader.start()
+        print(f"INFO:     Watching {len(reloader.states)} files for changes")
+    return with_cors(app)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the OKN Map TTL files as a SPARQL endpoint')
+    parser.add_argument('files', nargs='*', help='TTL (or .nt, .nt.gz) files or quoted glob patterns')
+    parser.add_argument('--host', default='localhost', help='Host to listen on (default: localhost)')
+    parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    parser.add_argument('--cache-entries', type=int, default=1024,
+                        help='Maximum cached query results; 0 disables the cache (default: 1024)')
+    parser.add_argument('--cache-mb', type=int, default=64,
+                        help='Maximum total size of cached results in MB (default: 64)')
+    parser.add_argument('--store', help='Serve from this pre-parsed store instead of parsing the files')
+    parser.add_argument('--build-store', action='store_true',
+                        help='Parse the files into the --store directory and exit')
+    parser.add_argument('--watch', action='store_true',
+                        help='Reload files that change, are added or are removed into the --store while serving')
+    args = parser.parse_args()
+
+    if args.build_store:
+        if not args.store or not args.files:
+            parser.error('--build-store needs --store and the TTL files to load')
+        version = build_store(expand_paths(args.files), args.store)
+        print(f"INFO:     Built store {args.store}, dataset version {version}")
+        index = LabelIndex.build(open_store(args.store))
+        index.save(os.path.join(args.store, INDEX_FILE), version)
+        print(f"INFO:     Saved label index of {len(index.entities)} entities")
+        return
+    if not args.store and not args.files:
+        parser.error('give the TTL files to serve, or --store')
+    if args.watch and not (args.store and args.files):
+        parser.error('--watch needs --store and the TTL files to watch')
+
+    app = build_app(expand_paths(args.files), args.cache_entries, args.cache_mb, args.store,
+                    args.files if args.watch else None)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Startup-time benchmark: parsing the TTL files vs opening the pre-parsed store.
+
+For each path, times build_app() end to end, as the server starts: loading
+the data and building the class listings, label index and catalogue. Then
+times the map's first query (the Proto-OKN graph list) sent through the app,
+with its cache, partition router and CORS layers, which is what a readiness
+probe waits on. The store path loads the label index saved with the store,
+if there is one.
+
+Usage:
+  python -m okn_endpoint.benchmark_startup --store /app/store '/data/*.ttl'
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlencode
+
+from .__main__ import build_app
+from .loader import expand_paths
+
+FIRST_QUERY = """
+PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX linkml: <https://w3id.org/linkml/>
+PREFIX okn: <https://purl.org/okn/>
+SELECT ?graph ?graphLabel WHERE {
+  ?graph dct:isPartOf okn:proto-okn ;
+         a linkml:SchemaDefinition .
+  OPTIONAL { ?graph dct:title ?graphLabel }
+}
+"""
+
+
+async def asgi_get(app, path, params):
+    """Send one GET request to an ASGI app in-process and return the response body."""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': urlencode(params).encode(), 'root_path': '',
+        'headers': [(b'accept', b'application/sparql-results+json')],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 8000),
+    }
+    chunks = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return b''.join(chunks)
+
+
+def time_startup(build):
+    """Return (startup seconds, first query seconds, result rows)."""
+    start = time.perf_counter()
+    app = build()
+    started = time.perf_counter()
+    body = asyncio.run(asgi_get(app, '/', {'query': FIRST_QUERY}))
+    rows = len(json.loads(body)['results']['bindings'])
+    return started - start, time.perf_counter() - started, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare backend startup from Turtle and from the store')
+    parser.add_argument('files', nargs='+', help='TTL (or .nt, .nt.gz) files or quoted glob patterns')
+    parser.add_argument('--store', required=True, help='Store directory built with --build-store')
+    args = parser.parse_args()
+
+    paths = expand_paths(args.files)
+    results = [
+        ('Turtle parse', time_startup(lambda: build_app(paths))),
+        ('Store open', time_startup(lambda: build_app(paths, store_dir=args.store))),
+    ]
+
+    print()
+    print(f"{'Startup path':<14} {'Startup (s)':>12} {'First query (s)':>16} {'Rows':>6}")
+    print("-" * 52)
+    for name, (startup, query, rows) in results:
+        print(f"{name:<14} {startup:>12.2f} {query:>16.3f} {rows:>6}")
+    if results[0][1][2] != results[1][1][2]:
+        print("WARNING: the two paths returned different results")
+
+
+if __name__ == '__main__':
+    main()
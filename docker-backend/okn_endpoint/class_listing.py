@@ -0,0 +1,208 @@
+"""
+Ordered, paginated class listings per graph, served at GET /classes.
+
+The map's expansions list the classes a graph defines, the classes it uses and
+the classes equivalent to its own. As SPARQL they return an arbitrary first
+few rows, and a next page would re-evaluate the whole join. Instead, every
+listing is computed once when the data is loaded and kept sorted by usage
+count, so a page is a binary search for the cursor plus a slice.
+
+Listings, for a graph (schema) IRI:
+- defined: its class definitions; count is the class's total count across
+  every schema's counts annotation
+- used: the class definitions behind its counts annotation; count is its own
+  count of the class
+- equivalent: classes of other schemas linked to one of its classes by a
+  SKOS match or a shared Wikidata entity; count is the total count of its own
+  class
+
+The defined and used listings are read from the okn:ClassSummary rows of
+_class_summary.ttl, which analysis/generate_equivalences.py flattens from the
+class definitions and the nested counts annotations; without that file they
+are empty. The equivalent listing is still one join over the store.
+
+Items are ordered by count, highest first, then by IRI. The cursor is the
+sort key of the last item returned, encoded with the dataset version, so a
+page never repeats or skips items and a cursor from other data is rejected.
+
+  GET /classes?graph=https://purl.org/okn/schema/sdo&kind=defined&limit=20
+  -> {"graph": ..., "kind": "defined", "total": 240, "items": [...], "next": "eyJ2Ij..."}
+  GET /classes?graph=...&kind=defined&limit=20&cursor=eyJ2Ij...
+"""
+
+import base64
+import binascii
+import json
+from bisect import bisect_right
+from collections import defaultdict
+
+from fastapi import HTTPException, Query, Request
+
+KINDS = ('defined', 'used', 'equivalent')
+MAX_LIMIT = 500
+
+PREFIXES = """
+PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX linkml: <https://w3id.org/linkml/>
+PREFIX okns: <https://purl.org/okn/schema/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+"""
+
+# One row per (graph, class definition, defining schema); count is the graph's
+# own count of the class, if it counts it
+SUMMARY_QUERY = PREFIXES + """
+PREFIX okn: <https://purl.org/okn/>
+SELECT ?graph ?class ?classUri ?scheme ?classLabel ?schemeLabel ?count ?defined WHERE {
+  ?row a okn:ClassSummary ;
+       okn:summaryOf ?graph ;
+       okn:classDefinition ?class ;
+       okn:classUri ?classUri ;
+       okn:definedIn ?scheme ;
+       okn:defined ?defined .
+  optional { ?row okn:classLabel ?classLabel }
+  optional { ?row okn:definedInLabel ?schemeLabel }
+  optional { ?row okn:count ?count }
+}
+"""
+
+# The join of the frontend's equivalent-classes expansion, for every schema at once
+EQUIVALENTS_QUERY = PREFIXES + """
+SELECT ?scheme ?source ?sourceUri ?sourceLabel ?class ?classLabel ?graph ?graphLabel WHERE {
+  ?source skos:inScheme ?scheme .
+  { ?source skos:exactMatch|skos:closeMatch|skos:broadMatch ?classUri }
+  union
+  { ?source linkml:class_uri ?sourceUri_ . ?sourceUri_ ^skos:exactMatch/skos:exactMatch ?classUri }
+  ?class linkml:class_uri ?classUri ; skos:inScheme ?graph .
+  filter(?graph != ?scheme)
+  optional { ?source linkml:class_uri ?sourceUri }
+  optional { ?source dct:title ?sourceLabel }
+  optional { ?class dct:title ?classLabel }
+  optional { ?graph dct:title ?graphLabel }
+}
+"""
+
+
+def value(term):
+    return None if term is None else str(term)
+
+
+def count_value(term):
+    try:
+        return int(term)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ClassListing:
+    """Per-graph listings, each sorted by (count descending, IRIs), with parallel sort keys."""
+
+    def __init__(self, version, listings):
+        self.version = version
+        self.listings = listings                # (graph, kind) -> [item]
+        self.keys = {k: [sort_key(item) for item in items] for k, items in listings.items()}
+
+    @classmethod
+    def build(cls, graph, version):
+        """Run the listing queries once over a loaded graph and sort the results."""
+        rows = list(graph.query(SUMMARY_QUERY))
+        counts = {}
+        for row in rows:
+            if row['count'] is not None:
+                counts[str(row['graph']), str(row['classUri'])] = count_value(row['count'])
+        totals = defaultdict(int)
+        for (_, class_uri), count in counts.items():
+            totals[class_uri] += count
+
+        used = defaultdict(dict)
+        defined = defaultdict(dict)
+        for row in rows:
+            graph_uri, class_iri, class_uri, scheme = (str(row[k]) for k in ('graph', 'class', 'classUri', 'scheme'))
+            if row['count'] is not None:
+                used[graph_uri][class_iri, scheme] = {
+                    'class': class_iri,
+                    'classLabel': value(row['classLabel']),
+                    'classUri': class_uri,
+                    'graph': scheme,
+                    'graphLabel': value(row['schemeLabel']),
+                    'count': count_value(row['count']),
+                }
+            if str(row['defined']) == 'true':
+                defined[scheme][class_iri] = {
+                    'class': class_iri,
+                    'classLabel': value(row['classLabel']),
+                    'classUri': class_uri,
+                    'count': totals.get(class_uri, 0),
+                }
+
+        equivalent = defaultdict(dict)
+        for row in graph.query(EQUIVALENTS_QUERY):
+            item = {
+                'source': str(row['source']),
+                'sourceLabel': value(row['sourceLabel']),
+                'class': str(row['class']),
+                'classLabel': value(row['classLabel']),
+                'graph': str(row['graph']),
+                'graphLabel': value(row['graphLabel']),
+                'count': totals.get(value(row['sourceUri']), 0),
+            }
+            equivalent[str(row['scheme'])][item['source'], item['class'], item['graph']] = item
+
+        listings = {}
+        for kind, by_graph in (('defined', defined), ('used', used), ('equivalent', equivalent)):
+            for graph_uri, items in by_graph.items():
+                listings[graph_uri, kind] = sorted(items.values(), key=sort_key)
+        return cls(version, listings)
+
+    def page(self, graph_uri, kind, limit, cursor=None):
+        """Return (items, total, next cursor or None) for one page of a listing."""
+        items = self.listings.get((graph_uri, kind), [])
+        keys = self.keys.get((graph_uri, kind), [])
+        start = 0
+        if cursor:
+            start = bisect_right(keys, self.decode_cursor(cursor, graph_uri, kind))
+        end = start + limit
+        next_cursor = self.encode_cursor(graph_uri, kind, keys[end - 1]) if end < len(items) else None
+        return items[start:end], len(items), next_cursor
+
+    def encode_cursor(self, graph_uri, kind, key):
+        data = json.dumps({'v': self.version, 'g': graph_uri, 'k': kind, 'after': key}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, graph_uri, kind):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            key = tuple(data['after'])
+            if len(key) != 4 or not isinstance(key[0], int) or not all(isinstance(k, str) for k in key[1:]):
+                raise ValueError(key)
+            stale = data['v'] != self.version
+            other = (data['g'], data['k']) != (graph_uri, kind)
+        except (binascii.Error, ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail='Invalid cursor')
+        if other:
+            raise HTTPException(status_code=400, detail='Cursor belongs to another listing')
+        if stale:
+            raise HTTPException(status_code=410, detail='Cursor is from an older dataset version; start again')
+        return key
+
+
+def sort_key(item):
+    return (-item['count'], item.get('source') or '', item['class'], item.get('graph') or '')
+
+
+def add_class_listing_route(app, listing, path='/classes'):
+    """Serve listing at GET path on the endpoint app; app.state.class_listing can be replaced later."""
+    app.state.class_listing = listing
+
+    @app.get(path, tags=['OKN Map'])
+    def list_classes(
+        request: Request,
+        graph: str = Query(..., description='Graph (schema) IRI'),
+        kind: str = Query('used', description='defined, used or equivalent'),
+        limit: int = Query(10, ge=1, le=MAX_LIMIT),
+        cursor: str = Query(None, description='next value of the previous page'),
+    ):
+        if kind not in KINDS:
+            raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KINDS)}")
+        current = request.app.state.class_listing
+        items, total, next_cursor = current.page(graph, kind, limit, cursor)
+        return {'graph': graph, 'kind': kind, 'total': total, 'items': items, 'next': next_cursor}
@@ -0,0 +1,74 @@
+"""
+Batch entity details, served at POST /describe.
+
+Clicking a node in the map shows the node's properties. Fetching them with
+one SELECT ?p ?o query per click means a round-trip, and an rdflib query
+plan, for every node the user looks at. Instead, the map sends the IRIs of
+all the nodes in view in one request and caches the answer per entity.
+
+Each entity's properties are read straight from the graph's subject index:
+every (predicate, object) of the entity, plus linkml:range for the ranges of
+its linkml:any_of alternatives, as the map's details query does. Objects are
+given as their IRI or literal value; blank nodes are left out.
+
+  POST /describe  {"entities": ["https://purl.org/okn/schema/sdo", ...]}
+  -> {"entities": {"https://purl.org/okn/schema/sdo": {"http://purl.org/dc/terms/title": ["..."], ...}},
+      "missing": [...]}
+"""
+
+from fastapi import Body, HTTPException, Request
+from rdflib import BNode, URIRef
+
+MAX_ENTITIES = 500
+
+LINKML = 'https://w3id.org/linkml/'
+ANY_OF = URIRef(LINKML + 'any_of')
+RANGE = URIRef(LINKML + 'range')
+
+
+class EntityDetails:
+    """Looks up the grouped properties of entities in a loaded graph."""
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def describe(self, iri):
+        """Return {predicate: [objects]} for one entity, or None if it has no properties."""
+        subject = URIRef(iri)
+        properties = {}
+        # Sets: a triple in several source files is seen once per file
+        for p, o in self.graph.predicate_objects(subject):
+            if not isinstance(o, BNode):
+                properties.setdefault(str(p), set()).add(str(o))
+        for alternative in self.graph.objects(subject, ANY_OF):
+            for o in self.graph.objects(alternative, RANGE):
+                if not isinstance(o, BNode):
+                    properties.setdefault(str(RANGE), set()).add(str(o))
+        return {p: sorted(objects) for p, objects in properties.items()} or None
+
+    def describe_all(self, iris):
+        """Return ({iri: {predicate: [objects]}}, [iris without properties])."""
+        found = {}
+        missing = []
+        for iri in dict.fromkeys(iris):
+            properties = self.describe(iri)
+            if properties is None:
+                missing.append(iri)
+            else:
+                found[iri] = properties
+        return found, missing
+
+
+def add_entity_details_route(app, details, path='/describe'):
+    """Serve details at POST path on the endpoint app; app.state.entity_details can be replaced later."""
+    app.state.entity_details = details
+
+    @app.post(path, tags=['OKN Map'])
+    def describe_entities(
+        request: Request,
+        entities: list[str] = Body(..., embed=True, description='Entity IRIs'),
+    ):
+        if len(entities) > MAX_ENTITIES:
+            raise HTTPException(status_code=400, detail=f'At most {MAX_ENTITIES} entities per request')
+        found, missing = request.app.state.entity_details.describe_all(entities)
+        return {'entities': found, 'missing': missing}
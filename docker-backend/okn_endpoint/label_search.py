@@ -0,0 +1,272 @@
+"""
+Label search over every graph, class, slot, type and equivalence, served at
+GET /search.
+
+Finding an entity by name in SPARQL means a FILTER(CONTAINS(...)) scan over
+every dct:title and rdfs:label literal, which rdflib cannot do interactively.
+Instead, an inverted index is built once when the data is loaded:
+- each entity is indexed under its labels (except the generator's "No class
+  ... name specified" placeholders) and the local name of its IRI,
+  split into lowercase words at punctuation and camelCase boundaries
+  ("SdosPropertyValue" -> sdos, property, value)
+- the sorted word list answers prefix queries: each query word matches every
+  indexed word it is a prefix of, and an entity matches when all the query
+  words do
+- a trigram index answers the rest (infixes and typos): entities are scored
+  by the share of the query's trigrams found in their names
+
+Matches are ranked by how they match (the whole name, a prefix of it, a
+prefix of each word, trigrams), then by usage count from the schemas' counts
+annotations: a class's total count over all schemas, a graph's total count
+of the classes it uses, an equivalence's count over the graphs it links.
+
+Collecting the entities takes a few SPARQL queries over the whole store, so
+the image build saves them next to the pre-parsed store (INDEX_FILE), with
+the dataset version they were collected from, and the server loads them at
+startup instead. Only the word and trigram indexes are rebuilt from them.
+
+  GET /search?q=property%20val&limit=10
+  GET /search?q=sensr&kind=class
+  -> {"q": "sensr", "items": [{"iri": ..., "label": ..., "kind": "class", "graph": ..., "count": 1234, "match": "trigram"}]}
+"""
+
+import json
+import os
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from fastapi import HTTPException, Query, Request
+
+from .class_listing import PREFIXES, count_value, value
+
+INDEX_FILE = 'label_index.json'
+
+MAX_LIMIT = 100
+MIN_TRIGRAM_SCORE = 0.5
+
+# Match tiers, best first
+MATCHES = ('exact', 'prefix', 'words', 'trigram')
+
+NAMESPACES = {
+    'linkml': 'https://w3id.org/linkml/',
+    'okns': 'https://purl.org/okn/schema/',
+    'okn': 'https://purl.org/okn/',
+}
+
+KIND_TYPES = {
+    'graph': ('linkml:SchemaDefinition', 'okns:SchemaDefinition'),
+    'class': ('linkml:ClassDefinition', 'okns:ClassDefinition'),
+    'slot': ('linkml:SlotDefinition', 'okns:SlotDefinition'),
+    'type': ('linkml:TypeDefinition', 'okns:TypeDefinition'),
+    'equivalence': ('okn:SharedClassEquivalence', 'okn:WikidataEquivalence', 'okn:WikidataHierarchyEquivalence',
+                    'okn:DirectClassEquivalence', 'okn:VocabularyOverlap'),
+}
+
+ENTITIES_QUERY = PREFIXES + """
+PREFIX okn: <https://purl.org/okn/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+SELECT ?entity ?type ?label ?classUri ?scheme WHERE {
+  VALUES ?type { %s }
+  ?entity a ?type .
+  optional { ?entity dct:title|rdfs:label ?label }
+  optional { ?entity linkml:class_uri ?classUri }
+  optional { ?entity skos:inScheme ?scheme }
+}
+""" % ' '.join(t for types in KIND_TYPES.values() for t in types)
+
+# ?p is filtered rather than bound: a bound skos:example pattern would be
+# evaluated first, over every skos:example triple in the store
+COUNTS_QUERY = PREFIXES + """
+SELECT ?graph ?classUri ?count WHERE {
+  ?graph linkml:annotations [
+    linkml:tag okns:counts ;
+    skos:example/linkml:classes/skos:example [ ?classUri ?s ]
+  ] .
+  ?s ?p ?count .
+  filter(?p = skos:example)
+}
+"""
+
+EQUIVALENCE_COUNTS_QUERY = PREFIXES + """
+PREFIX okn: <https://purl.org/okn/>
+SELECT ?equiv ?count WHERE {
+  ?equiv okn:usage ?usage .
+  ?usage okn:count ?count .
+}
+"""
+
+# Title the schema generator gives undefined classes and slots; not a name
+PLACEHOLDER_TITLE = re.compile(r'^No (class|slot) \(.*\) name specified')
+
+WORD_BOUNDARY = re.compile(r'[^0-9a-zA-Z]+|(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])')
+
+
+def words(text):
+    """Split text into lowercase words at punctuation and camelCase boundaries."""
+    return [w.lower() for w in WORD_BOUNDARY.split(text) if w]
+
+
+def trigrams(tokens):
+    """Trigrams of each word, padded so word starts and ends count too."""
+    grams = set()
+    for token in tokens:
+        padded = f' {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def expand(curie):
+    prefix, name = curie.split(':')
+    return NAMESPACES[prefix] + name
+
+
+def local_name(iri):
+    return re.split(r'[/#:]', iri.rstrip('/#'))[-1]
+
+
+class LabelIndex:
+    """Entities with their names, a sorted word index and a trigram index."""
+
+    def __init__(self, entities):
+        self.entities = entities                # id -> {'iri', 'label', 'kind', 'graph', 'count', 'names'}
+        postings = defaultdict(set)
+        grams = defaultdict(set)
+        for i, entity in enumerate(entities):
+            for name in entity['names']:
+                for token in name.split():
+                    postings[token].add(i)
+                for gram in trigrams(name.split()):
+                    grams[gram].add(i)
+        self.words = sorted(postings)
+        self.postings = [sorted(postings[w]) for w in self.words]
+        self.trigram_postings = {g: sorted(ids) for g, ids in grams.items()}
+
+    @classmethod
+    def build(cls, graph):
+        """Collect every graph, class, slot, type and equivalence of a loaded graph with its names and count."""
+        kinds = {expand(t): kind for kind, types in KIND_TYPES.items() for t in types}
+        found = {}
+        for row in graph.query(ENTITIES_QUERY):
+            iri = str(row['entity'])
+            entity = found.setdefault(iri, {'iri': iri, 'labels': set(), 'kind': kinds[str(row['type'])],
+                                             'graph': None, 'classUri': None})
+            if row['label'] is not None and not PLACEHOLDER_TITLE.match(row['label']):
+                entity['labels'].add(str(row['label']))
+            entity['graph'] = entity['graph'] or value(row['scheme'])
+            entity['classUri'] = entity['classUri'] or value(row['classUri'])
+
+        class_totals = Counter()
+        graph_totals = Counter()
+        for row in graph.query(COUNTS_QUERY):
+            count = count_value(row['count'])
+            class_totals[str(row['classUri'])] += count
+            graph_totals[str(row['graph'])] += count
+        equivalence_totals = Counter()
+        for row in graph.query(EQUIVALENCE_COUNTS_QUERY):
+            equivalence_totals[str(row['equiv'])] += count_value(row['count'])
+
+        entities = []
+        for iri in sorted(found):
+            entity = found[iri]
+            labels = sorted(entity['labels'])
+            names = {' '.join(words(name)) for name in labels + [local_name(iri)]}
+            if entity['kind'] == 'graph':
+                count = graph_totals[iri]
+            elif entity['kind'] == 'equivalence':
+                count = equivalence_totals[iri]
+            else:
+                count = class_totals[entity['classUri']] if entity['classUri'] else 0
+            entities.append({
+                'iri': iri,
+                'label': labels[0] if labels else local_name(iri),
+                'kind': entity['kind'],
+                'graph': entity['graph'],
+                'count': count,
+                'names': sorted(n for n in names if n),
+            })
+        return cls(entities)
+
+    def save(self, path, version):
+        """Write the entities to path, for load() with the same dataset version."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': version, 'entities': self.entities}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, version):
+        """Return the index saved at path, or None if there is none for this dataset version."""
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            data = json.load(f)
+        if data['version'] != version:
+            return None
+        return cls(data['entities'])
+
+    def prefix_matches(self, tokens):
+        """Ids of the entities with a word starting with each of tokens."""
+        matched = None
+        for token in tokens:
+            start = bisect_left(self.words, token)
+            end = bisect_left(self.words, token + '\uffff')
+            ids = set().union(*self.postings[start:end])
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                return set()
+        return matched
+
+    def trigram_matches(self, tokens):
+        """{id: share of the query's trigrams in the entity's names} above MIN_TRIGRAM_SCORE."""
+        query = trigrams(tokens)
+        shared = Counter()
+        for gram in query:
+            shared.update(self.trigram_postings.get(gram, ()))
+        return {i: n / len(query) for i, n in shared.items() if n / len(query) >= MIN_TRIGRAM_SCORE}
+
+    def search(self, text, limit=10, kind=None):
+        """Return up to limit entities matching text, best first, each with its match tier."""
+        tokens = words(text)
+        if not tokens:
+            return []
+        phrase = ' '.join(tokens)
+        ranked = {}
+        for i in self.prefix_matches(tokens):
+            names = self.entities[i]['names']
+            tier = 0 if phrase in names else 1 if any(n.startswith(phrase) for n in names) else 2
+            ranked[i] = (tier, -1.0)
+        if kind:
+            ranked = {i: r for i, r in ranked.items() if self.entities[i]['kind'] == kind}
+        if len(ranked) < limit:
+            for i, score in self.trigram_matches(tokens).items():
+                if not kind or self.entities[i]['kind'] == kind:
+                    ranked.setdefault(i, (3, -score))
+
+        def rank(i):
+            entity = self.entities[i]
+            return ranked[i], -entity['count'], entity['label'], entity['iri']
+
+        results = []
+        for i in sorted(ranked, key=rank)[:limit]:
+            entity = self.entities[i]
+            item = {k: entity[k] for k in ('iri', 'label', 'kind', 'graph', 'count')}
+            item['match'] = MATCHES[ranked[i][0]]
+            results.append(item)
+        return results
+
+
+def add_label_search_route(app, index, path='/search'):
+    """Serve index at GET path on the endpoint app; app.state.label_index can be replaced later."""
+    app.state.label_index = index
+
+    @app.get(path, tags=['OKN Map'])
+    def search_labels(
+        request: Request,
+        q: str = Query(..., description='Words or word prefixes of a label or IRI local name'),
+        limit: int = Query(10, ge=1, le=MAX_LIMIT),
+        kind: str = Query(None, description=', '.join(KIND_TYPES)),
+    ):
+        if kind is not None and kind not in KIND_TYPES:
+            raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(KIND_TYPES)}")
+        return {'q': q, 'items': request.app.state.label_index.search(q, limit, kind)}
@@ -0,0 +1,386 @@
+"""
+Load test replaying the map's request mix against a running backend.
+
+Every request the map (src/App.vue) sends has a fixed shape, so the mix is
+made of those exact templates, filled in with graph and class IRIs sampled
+from the served data:
+- graphs: the Proto-OKN graph list (SPARQL)
+- equivalences: the precomputed equivalences load (SPARQL)
+- defined, used, equivalent: first page of a graph's class listing (GET /classes)
+- equivalent_class: a class's equivalent classes (SPARQL)
+- imports: a graph's imports, evaluated over its own file (SPARQL with default-graph-uri)
+- details: the details of a viewport's worth of entities (POST /describe)
+- search: a label prefix typed into the search box (GET /search)
+
+By default, --concurrency clients send requests back to back (closed loop).
+With --rate, requests instead arrive at random (Poisson) times at that mean
+rate, whatever the backend's speed, and are handled by up to --concurrency
+clients; latency is then measured from each request's arrival, so the time
+it waits for a free client counts too.
+
+The report gives, per request type, the number of requests, errors, query
+cache hits, p50/p95/p99 latency and throughput. With --baseline, p95
+latencies are compared to an earlier --output report.
+
+Usage:
+  python -m okn_endpoint.load_test --url http://localhost:8000 --duration 30 --concurrency 8
+  python -m okn_endpoint.load_test --rate 50 --mix details=5,search=2,graphs=0 --output load.json
+"""
+
+import argparse
+import http.client
+import json
+import math
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# The queries below are the map's, as sent by src/App.vue
+
+GRAPHS_QUERY = """
+PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX linkml: <https://w3id.org/linkml/>
+PREFIX okn: <https://purl.org/okn/>
+PREFIX okns: <https://purl.org/okn/schema/>
+
+SELECT ?graph ?graphLabel WHERE {
+  ?graph dct:isPartOf okn:proto-okn ;
+         a linkml:SchemaDefinition .
+  optional { ?graph dct:title ?graphLabel }
+}
+"""
+
+EQUIVALENCES_QUERY = """
+PREFIX okn: <https://purl.org/okn/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT ?equiv ?type ?label ?graph ?class ?count WHERE {
+  ?equiv a ?type ;
+         okn:inGraph ?graph .
+  FILTER(?type IN (okn:SharedClassEquivalence, okn:WikidataEquivalence, okn:WikidataHierarchyEquivalence, okn:DirectClassEquivalence, okn:VocabularyOverlap))
+  optional { ?equiv rdfs:label ?label }
+  optional {
+    ?equiv okn:usage [
+      okn:graph ?graph ;
+      okn:class ?class ;
+      okn:count ?count
+    ]
+  }
+}
+"""
+
+EQUIVALENT_CLASS_QUERY = """
+PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX linkml: <https://w3id.org/linkml/>
+PREFIX okns: <https://purl.org/okn/schema/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+
+SELECT ?class ?classLabel ?graph ?graphLabel WHERE {
+  { <%(node)s> skos:exactMatch|skos:closeMatch|skos:broadMatch ?class_ }
+  union
+  { <%(node)s> linkml:class_uri ?c1_ . ?c1_ ^skos:exactMatch/skos:exactMatch ?class_  }
+  ?class linkml:class_uri ?class_ ; skos:inScheme ?graph . filter(?class != <%(node)s>)
+  optional { ?class dct:title ?classLabel }
+  optional { ?graph dct:title ?graphLabel }
+} limit 10
+"""
+
+IMPORTS_QUERY = """
+PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX linkml: <https://w3id.org/linkml/>
+PREFIX okn: <https://purl.org/okn/>
+PREFIX okns: <https://purl.org/okn/schema/>
+
+SELECT ?s ?sLabel ?o WHERE {
+  VALUES ?s { <%(node)s> }
+  ?s linkml:imports ?o .
+  optional { ?s dct:title ?sLabel }
+} limit 100
+"""
+
+# Classes to fill the templates with
+SAMPLE_QUERY = """
+PREFIX dct: <http://purl.org/dc/terms/>
+PREFIX linkml: <https://w3id.org/linkml/>
+PREFIX okns: <https://purl.org/okn/schema/>
+PREFIX skos: <http://www.w3.org/2004/02/skos/core#>
+SELECT ?class ?label WHERE {
+  VALUES ?type { linkml:ClassDefinition okns:ClassDefinition }
+  ?class a ?type .
+  optional { ?class dct:title ?label }
+}
+"""
+
+# Relative frequency of each request type: expansions and details dominate a session
+DEFAULT_MIX = {
+    'graphs': 1,
+    'equivalences': 1,
+    'defined': 3,
+    'used': 3,
+    'equivalent': 3,
+    'equivalent_class': 3,
+    'imports': 2,
+    'details': 6,
+    'search': 4,
+}
+
+DETAILS_BATCH = 20
+
+
+class Samples:
+    """Graph and class IRIs, and label prefixes, drawn from the served data."""
+
+    def __init__(self, url, timeout):
+        catalogue = json.loads(fetch(url + '/catalogue', timeout=timeout)[1])
+        self.graphs = sorted(catalogue['schemas'])
+        self.partitions = catalogue['schemas']
+        rows = json.loads(fetch(sparql_url(url, SAMPLE_QUERY), timeout=timeout,
+                                headers={'Accept': 'application/sparql-results+json'})[1])['results']['bindings']
+        self.classes = sorted({row['class']['value'] for row in rows})
+        self.labels = sorted({row['label']['value'] for row in rows if 'label' in row})
+        if not self.graphs or not self.classes:
+            raise SystemExit(f"No graphs or classes to sample at {url}")
+
+
+def sparql_url(url, query, default_graph=None):
+    params = {'query': query}
+    if default_graph:
+        params['default-graph-uri'] = default_graph
+    return url + '/?' + urllib.parse.urlencode(params)
+
+
+def fetch(url, data=None, headers=None, timeout=60):
+    """Send one request; return (x-cache header, body)."""
+    request = urllib.request.Request(url, data=data, headers=headers or {})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.headers.get('x-cache'), response.read()
+
+
+def make_request(kind, url, samples, rng):
+    """Return (url, body, headers) of one request of the given type, with sampled IRIs."""
+    sparql = {'Accept': 'application/sparql-results+json'}
+    if kind == 'graphs':
+        return sparql_url(url, GRAPHS_QUERY), None, sparql
+    if kind == 'equivalences':
+        return sparql_url(url, EQUIVALENCES_QUERY), None, sparql
+    if kind in ('defined', 'used', 'equivalent'):
+        params = urllib.parse.urlencode({'graph': rng.choice(samples.graphs), 'kind': kind, 'limit': 10})
+        return f'{url}/classes?{params}', None, {}
+    if kind == 'equivalent_class':
+        return sparql_url(url, EQUIVALENT_CLASS_QUERY % {'node': rng.choice(samples.classes)}), None, sparql
+    if kind == 'imports':
+        graph = rng.choice(samples.graphs)
+        partitions = samples.partitions[graph]
+        return sparql_url(url, IMPORTS_QUERY % {'node': graph}, partitions[0] if len(partitions) == 1 else None), \
+            None, sparql
+    if kind == 'details':
+        entities = rng.sample(samples.classes, min(DETAILS_BATCH, len(samples.classes))) + [rng.choice(samples.graphs)]
+        return f'{url}/describe', json.dumps({'entities': entities}).encode(), {'Content-Type': 'application/json'}
+    if kind == 'search':
+        label = rng.choice(samples.labels or samples.classes)
+        return f"{url}/search?{urllib.parse.urlencode({'q': label[:rng.randint(3, 8)], 'limit': 20})}", None, {}
+    raise ValueError(kind)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    # The smallest value with at least p% of the values at or below it
+    return values[min(len(values) - 1, max(0, math.ceil(p * len(values) / 100) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.hits = defaultdict(int)
+        self.error_samples = {}
+
+    def record(self, kind, latency, cache=None, error=None):
+        with self.lock:
+            if error is not None:
+                self.errors[kind] += 1
+                self.error_samples.setdefault(kind, error)
+                return
+            self.latencies[kind].append(latency)
+            if cache == 'HIT':
+                self.hits[kind] += 1
+
+    def report(self, seconds):
+        types = {}
+        for kind in sorted(set(self.latencies) | set(self.errors)):
+            latencies = sorted(self.latencies[kind])
+            types[kind] = {
+                'requests': len(latencies) + self.errors[kind],
+                'errors': self.errors[kind],
+                'cacheHits': self.hits[kind],
+                'p50Ms': ms(percentile(latencies, 50)),
+                'p95Ms': ms(percentile(latencies, 95)),
+                'p99Ms': ms(percentile(latencies, 99)),
+                'maxMs': ms(latencies[-1] if latencies else None),
+                'throughput': round(len(latencies) / seconds, 2),
+            }
+        everything = sorted(l for ls in self.latencies.values() for l in ls)
+        total = {
+            'requests': len(everything) + sum(self.errors.values()),
+            'errors': sum(self.errors.values()),
+            'cacheHits': sum(self.hits.values()),
+            'p50Ms': ms(percentile(everything, 50)),
+            'p95Ms': ms(percentile(everything, 95)),
+            'p99Ms': ms(percentile(everything, 99)),
+            'maxMs': ms(everything[-1] if everything else None),
+            'throughput': round(len(everything) / seconds, 2),
+        }
+        return types, total
+
+
+def ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def run_load(url, samples, mix, duration, concurrency, rate, timeout, seed):
+    """Send the mix for duration seconds; return (Recorder, elapsed seconds)."""
+    recorder = Recorder()
+    kinds = [k for k, weight in mix.items() if weight > 0]
+    weights = [mix[k] for k in kinds]
+    local = threading.local()
+
+    def send(kind, arrival):
+        if not hasattr(local, 'rng'):
+            local.rng = random.Random(f'{seed}-{threading.current_thread().name}')
+        request_url, body, headers = make_request(kind, url, samples, local.rng)
+        try:
+            cache, _ = fetch(request_url, body, headers, timeout)
+            recorder.record(kind, time.perf_counter() - arrival, cache)
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+            recorder.record(kind, None, error=str(getattr(e, 'code', '') or e))
+
+    start = time.perf_counter()
+    end = start + duration
+    if rate:
+        # Open loop: arrivals follow a Poisson process, whether or not clients are free
+        rng = random.Random(seed)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            arrival = start
+            while True:
+                arrival += rng.expovariate(rate)
+                if arrival >= end:
+                    break
+                time.sleep(max(0.0, arrival - time.perf_counter()))
+                pool.submit(send, rng.choices(kinds, weights)[0], arrival)
+    else:
+        # Closed loop: each client sends its next request when the last one is answered
+        def client(i):
+            rng = random.Random(f'{seed}-client-{i}')
+            while time.perf_counter() < end:
+                send(rng.choices(kinds, weights)[0], time.perf_counter())
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return recorder, time.perf_counter() - start
+
+
+def parse_mix(text):
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (text or '').split(',')):
+        kind, _, weight = part.partition('=')
+        if kind not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown request type {kind!r}; types are {', '.join(DEFAULT_MIX)}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def print_report(types, total):
+    print(f"\n{'Request':<18} {'Count':>7} {'Errors':>7} {'Hits':>6} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'Req/s':>8}")
+    print("-" * 80)
+    for name, stats in list(types.items()) + [('total', total)]:
+        cells = ''.join(f"{'-' if stats[k] is None else format(stats[k], '.1f'):>10}"
+                        for k in ('p50Ms', 'p95Ms', 'p99Ms'))
+        print(f"{name:<18} {stats['requests']:>7} {stats['errors']:>7} {stats['cacheHits']:>6}"
+              f"{cells} {stats['throughput']:>8.1f}")
+
+
+def compare(types, baseline, tolerance):
+    """Return messages for request types whose p95 latency regressed beyond the tolerance."""
+    regressions = []
+    for name, stats in types.items():
+        before = baseline['types'].get(name)
+        if before is None or before['p95Ms'] is None or stats['p95Ms'] is None:
+            continue
+        if stats['p95Ms'] > before['p95Ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95Ms']:.1f} ms -> {stats['p95Ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend with the map's request mix")
+    parser.add_argument('--url', default='http://localhost:8000', help='Backend URL (default: http://localhost:8000)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to send requests for (default: 30)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='Mean arrivals per second (open loop); default: clients send back to back')
+    parser.add_argument('--mix', default=None,
+                        help='Request type weights to change, e.g. details=10,graphs=0 (types: '
+                             + ', '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()) + ')')
+    parser.add_argument('--timeout', type=float, default=60, help='Request timeout in seconds (default: 60)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    parser.add_argument('--output', default=None, help='Write the report as JSON to this file')
+    parser.add_argument('--baseline', default=None, help='Compare p95 latencies with this earlier --output report')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative p95 increase over the baseline (default: 0.25)')
+    args = parser.parse_args()
+
+    url = args.url.rstrip('/')
+    mix = parse_mix(args.mix)
+    samples = Samples(url, args.timeout)
+    print(f"Sampled {len(samples.graphs)} graphs and {len(samples.classes)} classes from {url}")
+    mode = f"{args.rate:g} requests/s, up to {args.concurrency} clients" if args.rate else \
+        f"{args.concurrency} clients back to back"
+    print(f"Sending the map's request mix for {args.duration:g} s ({mode})...")
+
+    recorder, elapsed = run_load(url, samples, mix, args.duration, args.concurrency, args.rate,
+                                 args.timeout, args.seed)
+    types, total = recorder.report(elapsed)
+    print_report(types, total)
+    for kind, error in sorted(recorder.error_samples.items()):
+        print(f"  {kind} error: {error}")
+
+    report = {
+        'url': url,
+        'durationSeconds': round(elapsed, 3),
+        'concurrency': args.concurrency,
+        'rate': args.rate,
+        'mix': mix,
+        'seed': args.seed,
+        'types': types,
+        'total': total,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"\nReport written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(types, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%} of the baseline p95:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print(f"\nNo p95 regressions beyond {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == '__main__':
+    main()
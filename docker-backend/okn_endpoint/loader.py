@@ -0,0 +1,114 @@
+"""
+Loading the backend TTL files into an rdflib Dataset.
+
+Each file goes into its own named graph, <https://purl.org/okn/source/{file
+stem}>, so a query can be evaluated over one file's triples (see
+partitions.py); the default graph is the union of them all.
+
+Files named *.nt or *.nt.gz (gzip'd) are read as N-Triples, which parse much
+faster than Turtle; analysis/generate_equivalences.py can write its outputs
+that way.
+
+analysis/ttl_index.py reads the files through read_rdf() too, outside the
+server, so this module imports nothing beyond rdflib.
+"""
+
+import glob
+import gzip
+import hashlib
+import os
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from rdflib import Dataset, URIRef
+
+SOURCE_GRAPH_BASE = 'https://purl.org/okn/source/'
+
+# First line of real Turtle: a directive or a comment
+TURTLE_START = re.compile(r'^[ \t]*(@prefix|@base|prefix\b|base\b|#)', re.IGNORECASE | re.MULTILINE)
+
+
+def expand_paths(patterns):
+    """Expand glob patterns (quoted so the shell leaves them alone) into sorted file paths.
+
+    A pattern matching nothing is dropped, unless it is a plain path, so that a
+    missing file is still reported when loading it.
+    """
+    paths = []
+    for pattern in patterns:
+        paths.extend(sorted(glob.glob(pattern)) or ([] if glob.has_magic(pattern) else [pattern]))
+    return paths
+
+
+def read_turtle(path):
+    """Read a TTL file, dropping any generator output printed before the Turtle.
+
+    Files produced by redirecting the LinkML generator's stdout can start with
+    schema warnings and a context tuple, e.g. "('https://w3id.org/linkml/meta.context.jsonld',)".
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    match = TURTLE_START.search(text)
+    return text[match.start():] if match else text
+
+
+def read_rdf(path):
+    """Return (text, format) of a data file: 'nt' for .nt and .nt.gz files, else 'turtle'."""
+    if path.endswith('.nt.gz'):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return f.read(), 'nt'
+    if path.endswith('.nt'):
+        with open(path, encoding='utf-8') as f:
+            return f.read(), 'nt'
+    return read_turtle(path), 'turtle'
+
+
+def file_stem(path):
+    """File name without its RDF extension, e.g. sdo.ttl or sdo.nt.gz -> sdo."""
+    name = os.path.basename(path)
+    for extension in ('.nt.gz', '.nt', '.ttl'):
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return Path(path).stem
+
+
+def source_graph(path):
+    """IRI of the named graph holding one TTL file, e.g. sdo.ttl -> <https://purl.org/okn/source/sdo>."""
+    return SOURCE_GRAPH_BASE + quote(file_stem(path))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dataset_version(paths):
+    """Short hash over the names and contents of the loaded files.
+
+    Changes whenever any file is added, removed or edited, i.e. whenever the
+    image is rebuilt with different data.
+    """
+    return hashes_version({path: file_sha256(path) for path in paths})
+
+
+def hashes_version(hashes):
+    """dataset_version() of files with the given {path: file_sha256()} contents."""
+    digest = hashlib.sha256()
+    for path, sha256 in sorted(hashes.items()):
+        digest.update(os.path.basename(path).encode())
+        digest.update(sha256.encode())
+    return digest.hexdigest()[:16]
+
+
+def load_dataset(paths):
+    """Parse every file into its own named graph of one union Dataset."""
+    dataset = Dataset(default_union=True)
+    for path in paths:
+        text, fmt = read_rdf(path)
+        dataset.graph(URIRef(source_graph(path))).parse(data=text, format=fmt, publicID=path)
+        print(f"INFO:     Loaded triples from {path}, for a total of {len(dataset)}")
+    return dataset
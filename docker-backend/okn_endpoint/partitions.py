@@ -0,0 +1,179 @@
+"""
+Per-file partitions of the data: a catalogue of them, and evaluation of a
+query over one partition.
+
+Every TTL file is loaded into its own named graph (see loader.py), while
+plain queries see the union of all of them. A query scoped to one schema,
+e.g. the imports of a graph, only needs the triples of that schema's file,
+so evaluating it over the union does work proportional to the whole store.
+
+The catalogue, at GET /catalogue, lists each source named graph with its
+triple count and the schemas it defines, under the dataset version (see
+loader.py) they were loaded at:
+  {"version": "3f9a0c2e7b1d4a65",
+   "sources": [{"graph": "https://purl.org/okn/source/sdo", "triples": 40472,
+                "schemas": ["https://purl.org/okn/schema/sdo"]}, ...],
+   "schemas": {"https://purl.org/okn/schema/sdo": ["https://purl.org/okn/source/sdo"], ...}}
+
+Queries sent to the SPARQL endpoint with the SPARQL protocol's
+default-graph-uri parameter are routed to that partition: the named graph is
+the query's default graph, and nothing else is scanned.
+  GET /sparql?query=...&default-graph-uri=https://purl.org/okn/source/sdo
+A query that is invalid, or fails to evaluate, is answered with a 400; any
+other failure is the server's, and a 500.
+"""
+
+import json
+
+from rdflib import Graph, URIRef
+from rdflib.plugins.sparql import prepareQuery
+from rdflib.plugins.sparql.sparql import SPARQLError
+from starlette.concurrency import run_in_threadpool
+
+from .class_listing import PREFIXES
+from .loader import SOURCE_GRAPH_BASE
+from .query_cache import read_body, replay, request_params, send_body
+
+CATALOGUE_QUERY = PREFIXES + """
+SELECT ?source ?schema WHERE {
+  VALUES ?type { linkml:SchemaDefinition okns:SchemaDefinition }
+  GRAPH ?source { ?schema a ?type }
+}
+"""
+
+SIZES_QUERY = """
+SELECT ?source (count(*) as ?triples) WHERE {
+  GRAPH ?source { ?s ?p ?o }
+}
+GROUP BY ?source
+"""
+
+# (Accept media type, rdflib serialization format) in order of preference
+RESULT_FORMATS = [
+    ('application/sparql-results+json', 'json'),
+    ('application/json', 'json'),
+    ('application/sparql-results+xml', 'xml'),
+    ('application/xml', 'xml'),
+    ('text/csv', 'csv'),
+    ('text/tab-separated-values', 'tsv'),
+]
+GRAPH_FORMATS = [
+    ('text/turtle', 'turtle'),
+    ('application/n-triples', 'nt'),
+    ('application/rdf+xml', 'xml'),
+    ('application/ld+json', 'json-ld'),
+]
+
+
+class Catalogue:
+    """Source named graphs, their sizes and the schemas each defines, at one dataset version."""
+
+    def __init__(self, version, sources, schemas):
+        self.version = version
+        self.sources = sources                  # source graph IRI -> {'graph', 'triples', 'schemas'}
+        self.schemas = schemas                  # schema IRI -> [source graph IRIs]
+
+    @classmethod
+    def build(cls, graph, version):
+        sources = {}
+        for row in graph.query(SIZES_QUERY):
+            iri = str(row['source'])
+            if iri.startswith(SOURCE_GRAPH_BASE):
+                sources[iri] = {'graph': iri, 'triples': int(row['triples']), 'schemas': []}
+        schemas = {}
+        for row in graph.query(CATALOGUE_QUERY):
+            source, schema = str(row['source']), str(row['schema'])
+            if source in sources:
+                sources[source]['schemas'].append(schema)
+                schemas.setdefault(schema, []).append(source)
+        for source in sources.values():
+            source['schemas'].sort()
+        return cls(version, dict(sorted(sources.items())), {s: sorted(g) for s, g in sorted(schemas.items())})
+
+    def as_dict(self):
+        return {'version': self.version, 'sources': list(self.sources.values()), 'schemas': self.schemas}
+
+
+def negotiate(accept, formats):
+    """Pick the (media type, format) the Accept header asks for, defaulting to the first."""
+    for media_type in [part.split(';')[0].strip() for part in accept.split(',')]:
+        for candidate in formats:
+            if candidate[0] == media_type:
+                return candidate
+    return formats[0]
+
+
+class PartitionRouter:
+    """ASGI middleware evaluating queries with a default-graph-uri over that named graph alone.
+
+    Other requests go to the wrapped endpoint unchanged. graph is the loaded
+    Dataset and can be replaced, with catalogue, while serving.
+    """
+
+    def __init__(self, app, graph, catalogue, endpoint_paths=('/', '/sparql'), catalogue_path='/catalogue'):
+        self.app = app
+        self.graph = graph
+        self.catalogue = catalogue
+        self.endpoint_paths = set(endpoint_paths)
+        self.catalogue_path = catalogue_path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        if scope['path'] == self.catalogue_path and scope['method'] == 'GET':
+            body = json.dumps(self.catalogue.as_dict()).encode()
+            return await send_body(send, 200, [(b'content-type', b'application/json')], body)
+
+        if scope['path'] not in self.endpoint_paths or scope['method'] not in ('GET', 'POST'):
+            return await self.app(scope, receive, send)
+
+        body = b''
+        if scope['method'] == 'POST':
+            body = await read_body(receive)
+        params = request_params(scope, body)
+        if params is None or 'default-graph-uri' not in params:
+            return await self.app(scope, replay(body, receive), send)
+
+        graphs = params['default-graph-uri']
+        if len(graphs) != 1:
+            return await send_text(send, 400, 'Give one default-graph-uri: queries are routed to a single partition')
+        partition = Graph(store=self.graph.store, identifier=URIRef(graphs[0]))
+        accept = dict(scope['headers']).get(b'accept', b'').decode('latin-1')
+        query = params['query'][0]
+        try:
+            media_type, response = await run_in_threadpool(evaluate, partition, query, accept)
+        except Exception as e:
+            if is_query_error(partition, query, e):
+                return await send_text(send, 400, f'Query failed: {e}')
+            print(f"ERROR:    Query over {graphs[0]} failed: {e!r}")
+            return await send_text(send, 500, f'Internal error: {e}')
+        await send_body(send, 200, [(b'content-type', media_type.encode())], response)
+
+
+def evaluate(graph, query, accept):
+    """Run query and serialize its result as accept asks; return (media type, body).
+
+    Both happen in the calling thread: Oxigraph's query solutions can only be
+    read from the thread that created them.
+    """
+    result = graph.query(query)
+    media_type, fmt = negotiate(accept, GRAPH_FORMATS if result.type in ('CONSTRUCT', 'DESCRIBE') else RESULT_FORMATS)
+    return media_type, result.serialize(format=fmt)
+
+
+def is_query_error(graph, query, error):
+    """Whether error is the query's fault: invalid syntax, or a failure to evaluate it."""
+    # Oxigraph raises SyntaxError for invalid queries, rdflib SPARQLError for evaluation errors
+    if isinstance(error, (SyntaxError, SPARQLError)):
+        return True
+    # rdflib's other query errors (syntax, unknown prefixes) are plain exceptions: check the query itself
+    try:
+        prepareQuery(query, initNs=dict(graph.namespaces()))
+    except Exception:
+        return True
+    return False
+
+
+async def send_text(send, status, text):
+    await send_body(send, status, [(b'content-type', b'text/plain; charset=utf-8')], text.encode())
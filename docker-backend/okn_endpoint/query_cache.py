@@ -0,0 +1,200 @@
+"""
+LRU cache of SPARQL query results, as ASGI middleware in front of the endpoint.
+
+The map's expansion queries are fixed templates, so many users send the same
+query text over and over. Responses are cached under:
+  (dataset version, normalized query text, Accept header)
+The dataset version is a hash of the loaded TTL files, so rebuilding the image
+with different data starts from an empty, non-stale cache.
+
+CORS headers depend on the request's Origin, which is not part of the key, so
+they are never stored: the CORS middleware sits outside the cache (see
+__main__.py) and adds them to hits and misses alike.
+
+Cache hits and misses are counted and reported, with the current size, at
+GET /cache/stats.
+"""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import parse_qs
+
+COMMENT_LINE = re.compile(r'^[ \t]*#.*$', re.MULTILINE)
+STRING_OR_SPACE = re.compile(r'("""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\')|\s+')
+
+
+def cacheable_headers(headers):
+    """Response headers to store with a cached body: all but the CORS ones."""
+    return [(name, value) for name, value in headers if not name.lower().startswith(b'access-control-')]
+
+
+def normalize_query(query):
+    """Canonicalize query text so formatting-only differences share a cache entry.
+
+    Whole-line comments are dropped and runs of whitespace outside string
+    literals collapse to one space.
+    """
+    query = COMMENT_LINE.sub('', query)
+    return STRING_OR_SPACE.sub(lambda m: m.group(1) or ' ', query).strip()
+
+
+class QueryCache:
+    """Thread-safe LRU cache bounded by entry count and total body bytes."""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, max_entry_bytes=4 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, status, headers, body):
+        if len(body) > self.max_entry_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key)[2])
+            self.entries[key] = (status, headers, body)
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'maxEntries': self.max_entries,
+                'maxBytes': self.max_bytes,
+            }
+
+
+class QueryCacheMiddleware:
+    """ASGI middleware answering repeated SPARQL queries from a QueryCache."""
+
+    def __init__(self, app, cache, version, endpoint_paths=('/', '/sparql'), stats_path='/cache/stats'):
+        self.app = app
+        self.cache = cache
+        self.version = version
+        self.endpoint_paths = set(endpoint_paths)
+        self.stats_path = stats_path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        if scope['path'] == self.stats_path and scope['method'] == 'GET':
+            stats = dict(self.cache.stats(), datasetVersion=self.version)
+            return await send_body(send, 200, [(b'content-type', b'application/json')], json.dumps(stats).encode())
+
+        if scope['path'] not in self.endpoint_paths or scope['method'] not in ('GET', 'POST'):
+            return await self.app(scope, receive, send)
+
+        body = b''
+        if scope['method'] == 'POST':
+            body = await read_body(receive)
+        params = request_params(scope, body)
+        version = self.version
+        if params is None or version is None:
+            # No version while the data is being swapped (see reload.py)
+            return await self.app(scope, replay(body, receive), send)
+
+        headers = dict(scope['headers'])
+        key = (version, normalize_query(params['query'][0]), tuple(params.get('default-graph-uri', ())),
+               headers.get(b'accept', b'').decode('latin-1'))
+
+        entry = self.cache.get(key)
+        if entry is not None:
+            status, response_headers, response_body = entry
+            return await send_body(send, status, response_headers + [(b'x-cache', b'HIT')], response_body)
+
+        # Miss: pass the response through while keeping a copy to store
+        start = {}
+        chunks = []
+
+        async def capture(message):
+            if message['type'] == 'http.response.start':
+                start.update(message)
+                message = dict(message, headers=list(message.get('headers', [])) + [(b'x-cache', b'MISS')])
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+                if not message.get('more_body', False) and start.get('status') == 200:
+                    self.cache.put(key, 200, cacheable_headers(start.get('headers', [])), b''.join(chunks))
+            await send(message)
+
+        await self.app(scope, replay(body, receive), capture)
+
+
+def request_params(scope, body):
+    """Return the SPARQL protocol parameters of a query request, or None for updates and non-queries."""
+    params = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    if scope['method'] == 'POST':
+        content_type = dict(scope['headers']).get(b'content-type', b'').decode('latin-1')
+        if content_type.startswith('application/sparql-query'):
+            params['query'] = [body.decode('utf-8')]
+        elif content_type.startswith('application/x-www-form-urlencoded'):
+            params = parse_qs(body.decode('utf-8'))
+        else:
+            return None
+    if 'update' in params or 'query' not in params:
+        return None
+    return params
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            return body
+
+
+def replay(body, receive):
+    """A receive callable that hands an already-read body to the wrapped app.
+
+    Later calls go to the real receive, so client disconnects still arrive.
+    """
+    sent = False
+
+    async def replayed():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return await receive()
+
+    return replayed
+
+
+async def send_body(send, status, headers, body):
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
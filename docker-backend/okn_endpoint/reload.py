@@ -0,0 +1,212 @@
+"""
+Hot reload of changed TTL files into the running endpoint.
+
+With --watch, a background thread checks the watched files every few seconds
+(modification time and size) and, when files were changed, added or removed:
+1. Parses only those files, each on its own and outside the store. A file
+   that fails to parse is reported and keeps its old triples; the others
+   still go in, and it is tried again once it changes
+2. Swaps them in with one SPARQL update: for each file, DROP its named graph
+   and INSERT DATA the new triples. Oxigraph applies the update as a single
+   transaction, and queries read from a snapshot, so in-flight queries finish
+   on the old data and later ones see all the new files at once. The query
+   cache is bypassed during the update and moves to the new dataset version
+   as soon as it is applied
+3. Rebuilds the indexes derived from the data (class listings, label search,
+   catalogue) and swaps them in, so class listing cursors move to the new data
+
+The dataset version is a hash of the contents actually in the store, so a
+store left with the old triples of a broken file does not match the files on
+disk, and is brought up to date when the server is restarted.
+
+Needs a writable Oxigraph store (--store). The status of the watcher and the
+timings of the last reload are served at GET /reload/status; POST /reload
+checks the files right away instead of waiting for the next poll. Both routes
+exist only with --watch and are unauthenticated, so they must not be exposed
+publicly (the Helm chart blocks them on its ingress).
+
+  python -m okn_endpoint --port 8000 --store store --watch '/data/*.ttl'
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+from .loader import expand_paths, file_sha256, hashes_version, read_rdf, source_graph
+from .store import VERSION_FILE, ox_format
+
+
+def file_states(patterns):
+    """{path: (modification time, size)} of the files the patterns match now."""
+    states = {}
+    for path in expand_paths(patterns):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        states[path] = (stat.st_mtime_ns, stat.st_size)
+    return states
+
+
+def parse_file(path):
+    """Parse one data file into N-Triples lines, with blank nodes renamed apart from other files."""
+    import pyoxigraph as ox
+
+    text, fmt = read_rdf(path)
+    triples = ox.parse(input=text.encode('utf-8'), format=ox_format(fmt),
+                       base_iri=Path(path).resolve().as_uri(), rename_blank_nodes=True)
+    return [f'{t.subject} {t.predicate} {t.object} .' for t in triples]
+
+
+def swap_update(parsed, removed):
+    """SPARQL update replacing the named graph of each parsed file and dropping those of removed files."""
+    operations = []
+    for path, lines in parsed.items():
+        graph = source_graph(path)
+        operations.append(f'DROP SILENT GRAPH <{graph}>')
+        operations.append(f'INSERT DATA {{ GRAPH <{graph}> {{\n' + '\n'.join(lines) + '\n} }')
+    for path in removed:
+        operations.append(f'DROP SILENT GRAPH <{source_graph(path)}>')
+    return ' ;\n'.join(operations)
+
+
+class Reloader:
+    """Watches TTL files and swaps the changed ones into a writable Oxigraph store.
+
+    set_version(version) is called with None right before the store is
+    updated and with the new dataset version right after (or the old one if
+    the update failed), so the query cache is not used in between.
+    on_swap(version) is then called to rebuild what depends on the data.
+    """
+
+    def __init__(self, patterns, store, store_dir, version, on_swap, set_version=None, interval=5.0):
+        self.patterns = patterns
+        self.store = store                      # pyoxigraph.Store, opened writable
+        self.store_dir = store_dir
+        self.on_swap = on_swap
+        self.set_version = set_version or (lambda version: None)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.states = file_states(patterns)     # path -> state of the file whose triples are in the store
+        self.hashes = {path: file_sha256(path) for path in self.states}
+        self.failed = {}                        # path -> state of the file that failed to parse
+        if version != hashes_version(self.hashes):
+            # The files differ from the store: bring every file in on the first check
+            self.states = {}
+            self.hashes = {}
+        self.status = {
+            'state': 'idle',
+            'version': version,
+            'files': len(self.states),
+            'reloads': 0,
+            'lastCheck': None,
+            'lastReload': None,
+            'lastError': None,
+        }
+
+    def check(self):
+        """Reload the files changed since the last check, if any; return the status."""
+        with self.lock:
+            self.status['lastCheck'] = time.time()
+            states = file_states(self.patterns)
+            # A file that failed to parse is tried again when it changes, not on every check
+            self.failed = {p: state for p, state in self.failed.items() if p in states}
+            changed = sorted(p for p, state in states.items()
+                             if self.states.get(p) != state and self.failed.get(p) != state)
+            removed = sorted(p for p in self.states if p not in states)
+            if changed or removed:
+                try:
+                    self.reload(changed, removed, states)
+                except Exception as e:
+                    # Files that did not make it into the store are tried again once they change
+                    self.failed.update((p, states[p]) for p in changed if self.states.get(p) != states[p])
+                    self.report_error(changed + removed, str(e))
+            return dict(self.status)
+
+    def report_error(self, paths, error):
+        self.status['state'] = 'failed'
+        self.status['lastError'] = {'time': time.time(), 'files': [os.path.basename(p) for p in paths], 'error': error}
+        print(f"ERROR:    Reload of {len(paths)} files failed: {error}")
+
+    def reload(self, changed, removed, states):
+        self.status['state'] = 'reloading'
+        start = time.perf_counter()
+        parsed, parsed_hashes, errors = {}, {}, {}
+        for path in changed:
+            try:
+                parsed_hashes[path] = file_sha256(path)
+                parsed[path] = parse_file(path)
+            except Exception as e:
+                errors[path] = f"{os.path.basename(path)}: {e}"
+        parsed_at = time.perf_counter()
+        self.failed.update((p, states[p]) for p in errors)
+        if not parsed and not removed:
+            self.report_error(list(errors), '; '.join(errors.values()))
+            return
+
+        hashes = {p: sha256 for p, sha256 in self.hashes.items() if p not in removed}
+        hashes.update((p, parsed_hashes[p]) for p in parsed)
+        version = hashes_version(hashes)
+        self.set_version(None)
+        try:
+            self.store.update(swap_update(parsed, removed))
+        except Exception:
+            self.set_version(self.status['version'])
+            raise
+        self.set_version(version)
+        swapped_at = time.perf_counter()
+
+        with open(os.path.join(self.store_dir, VERSION_FILE), 'w') as f:
+            f.write(version + '\n')
+        self.hashes = hashes
+        self.states = {p: state for p, state in self.states.items() if p not in removed}
+        self.states.update((p, states[p]) for p in parsed)
+        for path in list(parsed) + removed:
+            self.failed.pop(path, None)
+        self.status['version'] = version
+
+        self.on_swap(version)
+        indexed_at = time.perf_counter()
+
+        self.status.update({
+            'state': 'idle',
+            'version': version,
+            'files': len(self.states),
+            'reloads': self.status['reloads'] + 1,
+            'lastReload': {
+                'time': time.time(),
+                'changed': [os.path.basename(p) for p in parsed],
+                'removed': [os.path.basename(p) for p in removed],
+                'failed': [os.path.basename(p) for p in errors],
+                'triples': sum(len(lines) for lines in parsed.values()),
+                'parseSeconds': round(parsed_at - start, 3),
+                'swapSeconds': round(swapped_at - parsed_at, 3),
+                'indexSeconds': round(indexed_at - swapped_at, 3),
+                'totalSeconds': round(indexed_at - start, 3),
+            },
+        })
+        print(f"INFO:     Reloaded {len(parsed)} changed and {len(removed)} removed files "
+              f"in {indexed_at - start:.1f}s, dataset version {version}")
+        if errors:
+            self.report_error(list(errors), '; '.join(errors.values()))
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.check()
+
+    def start(self):
+        threading.Thread(target=self.run, name='reloader', daemon=True).start()
+
+
+def add_reload_routes(app, reloader, path='/reload'):
+    """Serve the reloader's status at GET path/status, and an immediate check at POST path."""
+
+    @app.get(path + '/status', tags=['OKN Map'])
+    def reload_status():
+        return dict(reloader.status)
+
+    @app.post(path, tags=['OKN Map'])
+    def reload_now():
+        return reloader.check()
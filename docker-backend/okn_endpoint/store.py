@@ -0,0 +1,88 @@
+"""
+Pre-parsed on-disk store of the backend TTL files.
+
+Parsing every TTL file with rdflib at container start takes tens of seconds.
+Instead, the image build parses them once into an Oxigraph store (RocksDB,
+with SPO/POS/OSP indexes for every graph) and the server opens that store
+read-only at startup, which takes well under a second.
+
+The store directory also holds a VERSION file with the dataset version of the
+files it was built from, so the query cache keys stay the same as when serving
+the TTL files directly.
+
+Requires oxrdflib (which brings in pyoxigraph).
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+from .loader import dataset_version, read_rdf, source_graph
+
+VERSION_FILE = 'VERSION'
+
+
+def build_store(paths, store_dir):
+    """Bulk-load paths into a new Oxigraph store at store_dir and return its version.
+
+    The store is built next to store_dir and moved into place once complete, so
+    an interrupted build never leaves a half-loaded store behind.
+    """
+    import pyoxigraph as ox
+
+    version = dataset_version(paths)
+    tmp_dir = f"{store_dir.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    store = ox.Store(tmp_dir)
+    for path in paths:
+        # One named graph per file, as in load_dataset(); queries see their union
+        text, fmt = read_rdf(path)
+        store.bulk_load(text.encode('utf-8'), format=ox_format(fmt),
+                        base_iri=Path(path).resolve().as_uri(), to_graph=ox.NamedNode(source_graph(path)))
+        print(f"INFO:     Loaded triples from {path}")
+    store.optimize()
+    store.flush()
+    print(f"INFO:     Store holds {len(store)} triples")
+    del store
+
+    with open(os.path.join(tmp_dir, VERSION_FILE), 'w') as f:
+        f.write(version + '\n')
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return version
+
+
+def ox_format(fmt):
+    """The pyoxigraph format of a read_rdf() format."""
+    import pyoxigraph as ox
+
+    return ox.RdfFormat.N_TRIPLES if fmt == 'nt' else ox.RdfFormat.TURTLE
+
+
+def store_version(store_dir):
+    """Return the dataset version a store was built from."""
+    with open(os.path.join(store_dir, VERSION_FILE)) as f:
+        return f.read().strip()
+
+
+def open_store(store_dir):
+    """Open a store built by build_store() read-only, as an rdflib Dataset."""
+    import pyoxigraph as ox
+
+    return as_dataset(ox.Store.read_only(store_dir))
+
+
+def open_writable_store(store_dir):
+    """Open a store built by build_store() for updates; return (pyoxigraph Store, rdflib Dataset over it)."""
+    import pyoxigraph as ox
+
+    store = ox.Store(store_dir)
+    return store, as_dataset(store)
+
+
+def as_dataset(store):
+    from oxrdflib import OxigraphStore
+    from rdflib import Dataset
+
+    return Dataset(store=OxigraphStore(store=store), default_union=True)
@@ -0,0 +1,61 @@
+"""Minimal in-process ASGI client for the tests, so they need no HTTP client library."""
+
+import asyncio
+from urllib.parse import urlencode
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = {}                       # lower-case name -> value; repeated names are joined
+        for name, value in headers:
+            name = name.decode('latin-1').lower()
+            value = value.decode('latin-1')
+            self.headers[name] = f"{self.headers[name]}, {value}" if name in self.headers else value
+        self.body = body
+
+    def json(self):
+        import json
+
+        return json.loads(self.body)
+
+
+def request(app, method, path, params=None, headers=None, body=b''):
+    """Send one request to app and return its Response."""
+    return asyncio.run(send_request(app, method, path, params, headers, body))
+
+
+async def send_request(app, method, path, params=None, headers=None, body=b''):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': urlencode(params or {}, doseq=True).encode(),
+        'root_path': '',
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in (headers or {}).items()],
+        'client': ('127.0.0.1', 12345),
+        'server': ('testserver', 80),
+    }
+    received = False
+    started = {}
+    chunks = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            started.update(message)
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return Response(started['status'], started.get('headers', []), b''.join(chunks))
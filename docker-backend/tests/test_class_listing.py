@@ -0,0 +1,105 @@
+"""Tests of the /classes listings (okn_endpoint/class_listing.py), read from the class summary rows."""
+
+import pytest
+from fastapi import HTTPException
+from rdflib import Dataset
+
+from okn_endpoint.class_listing import ClassListing
+
+OKNS = 'https://purl.org/okn/schema/'
+
+# a defines A (used by a and b) and an unused C; b uses a's A and defines nothing
+SUMMARY = """\
+@prefix okn: <https://purl.org/okn/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+
+okn:summary-1 a okn:ClassSummary ;
+    okn:summaryOf okns:a ;
+    okn:classDefinition okns:A ;
+    okn:classUri <http://example.org/A> ;
+    okn:definedIn okns:a ;
+    okn:classLabel "A" ;
+    okn:definedInLabel "Schema a" ;
+    okn:count 3 ;
+    okn:defined true .
+
+okn:summary-2 a okn:ClassSummary ;
+    okn:summaryOf okns:a ;
+    okn:classDefinition okns:C ;
+    okn:classUri <http://example.org/C> ;
+    okn:definedIn okns:a ;
+    okn:defined true .
+
+okn:summary-3 a okn:ClassSummary ;
+    okn:summaryOf okns:b ;
+    okn:classDefinition okns:A ;
+    okn:classUri <http://example.org/A> ;
+    okn:definedIn okns:a ;
+    okn:classLabel "A" ;
+    okn:definedInLabel "Schema a" ;
+    okn:count 40 ;
+    okn:defined false .
+"""
+
+# b's class B is an exact match of a's A; the equivalent listing joins the schema triples
+EQUIVALENT = """\
+@prefix dct: <http://purl.org/dc/terms/> .
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+@prefix skos: <http://www.w3.org/2004/02/skos/core#> .
+
+okns:a dct:title "Schema a" .
+
+okns:A linkml:class_uri <http://example.org/A> ;
+    skos:inScheme okns:a .
+
+okns:B linkml:class_uri <http://example.org/B> ;
+    skos:inScheme okns:b ;
+    skos:exactMatch <http://example.org/A> .
+"""
+
+
+@pytest.fixture
+def listing():
+    graph = Dataset(default_union=True)
+    graph.parse(data=SUMMARY, format='turtle')
+    return ClassListing.build(graph, 'v1')
+
+
+def test_defined_counts_are_totals(listing):
+    items, total, next_cursor = listing.page(OKNS + 'a', 'defined', 10)
+    assert total == 2 and next_cursor is None
+    assert [(i['class'], i['classLabel'], i['count']) for i in items] == [(OKNS + 'A', 'A', 43), (OKNS + 'C', None, 0)]
+    assert listing.page(OKNS + 'b', 'defined', 10) == ([], 0, None)
+
+
+def test_used_counts_are_the_graphs_own(listing):
+    items, total, _ = listing.page(OKNS + 'b', 'used', 10)
+    assert total == 1
+    assert items == [{'class': OKNS + 'A', 'classLabel': 'A', 'classUri': 'http://example.org/A',
+                      'graph': OKNS + 'a', 'graphLabel': 'Schema a', 'count': 40}]
+    assert [i['count'] for i in listing.page(OKNS + 'a', 'used', 10)[0]] == [3]
+
+
+def test_equivalent_classes_of_other_schemas():
+    graph = Dataset(default_union=True)
+    graph.parse(data=SUMMARY, format='turtle')
+    graph.parse(data=EQUIVALENT, format='turtle')
+    listing = ClassListing.build(graph, 'v1')
+    items, total, _ = listing.page(OKNS + 'b', 'equivalent', 10)
+    assert total == 1
+    assert (items[0]['source'], items[0]['class'], items[0]['graph'], items[0]['graphLabel']) == (
+        OKNS + 'B', OKNS + 'A', OKNS + 'a', 'Schema a')
+    assert listing.page(OKNS + 'a', 'equivalent', 10) == ([], 0, None)
+
+
+def test_cursor_pages(listing):
+    first, _, cursor = listing.page(OKNS + 'a', 'defined', 1)
+    second, _, end = listing.page(OKNS + 'a', 'defined', 1, cursor)
+    assert [i['class'] for i in first + second] == [OKNS + 'A', OKNS + 'C'] and end is None
+    with pytest.raises(HTTPException) as error:
+        ClassListing(listing.version + '-new', listing.listings).page(OKNS + 'a', 'defined', 1, cursor)
+    assert error.value.status_code == 410
+    with pytest.raises(HTTPException) as error:
+        listing.page(OKNS + 'a', 'used', 1, cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,47 @@
+"""Tests of the batch entity details (okn_endpoint/entity_details.py)."""
+
+import json
+
+from rdflib import Graph
+
+from asgi import request
+from okn_endpoint.entity_details import MAX_ENTITIES, EntityDetails
+
+LINKML = 'https://w3id.org/linkml/'
+OKNS = 'https://purl.org/okn/schema/'
+
+DATA = """\
+@prefix linkml: <https://w3id.org/linkml/> .
+@prefix okns: <https://purl.org/okn/schema/> .
+
+okns:slot a linkml:SlotDefinition ;
+    linkml:name "slot" ;
+    linkml:any_of [ linkml:range okns:B ] , [ linkml:range okns:A ] ;
+    linkml:annotations [ linkml:tag "blank" ] .
+"""
+
+
+def test_describe_groups_properties_and_any_of_ranges():
+    details = EntityDetails(Graph().parse(data=DATA, format='turtle'))
+    found, missing = details.describe_all([OKNS + 'slot', OKNS + 'other', OKNS + 'slot'])
+    # Blank nodes are left out, and each entity is described once
+    assert found == {OKNS + 'slot': {
+        'http://www.w3.org/1999/02/22-rdf-syntax-ns#type': [LINKML + 'SlotDefinition'],
+        LINKML + 'name': ['slot'],
+        LINKML + 'range': [OKNS + 'A', OKNS + 'B'],
+    }}
+    assert missing == [OKNS + 'other']
+
+
+def post(app, entities):
+    return request(app, 'POST', '/describe', headers={'Content-Type': 'application/json'},
+                   body=json.dumps({'entities': entities}).encode())
+
+
+def test_server_describes_a_batch(app):
+    response = post(app, [OKNS + 'schema1', OKNS + 'missing'])
+    assert response.status == 200
+    body = response.json()
+    assert body['missing'] == [OKNS + 'missing']
+    assert body['entities'][OKNS + 'schema1']['http://www.w3.org/2000/01/rdf-schema#label'] == ['Schema one']
+    assert post(app, [OKNS + 'x'] * (MAX_ENTITIES + 1)).status == 400
@@ -0,0 +1,78 @@
+"""Tests of /search (okn_endpoint/label_search.py) over the conftest DATA: matching, ranking and the saved index."""
+
+import os
+
+import pytest
+
+from asgi import request
+from okn_endpoint.__main__ import build_app
+from okn_endpoint.label_search import INDEX_FILE, LabelIndex
+from okn_endpoint.loader import load_dataset
+from okn_endpoint.store import build_store, open_store
+
+OKNS = 'https://purl.org/okn/schema/'
+
+
+@pytest.fixture
+def index(data_paths):
+    return LabelIndex.build(load_dataset(data_paths))
+
+
+def found(index, text, **options):
+    return [(item['label'], item['match']) for item in index.search(text, **options)]
+
+
+def test_whole_name_ranks_above_prefixes(index):
+    assert found(index, 'sensor') == [('Sensor', 'exact'), ('Sensor reading', 'prefix')]
+
+
+def test_prefix_matches_rank_by_count(index):
+    items = index.search('sen')
+    assert [(i['label'], i['count']) for i in items] == [('Sensor reading', 70), ('Sensor', 7)]
+    assert {i['match'] for i in items} == {'prefix'}
+
+
+def test_every_word_must_match_a_prefix(index):
+    assert found(index, 'read') == [('Sensor reading', 'words')]
+    assert found(index, 'sens read') == [('Sensor reading', 'words')]
+    # Fewer prefix matches than the limit are topped up with trigram matches, ranked below
+    assert found(index, 'sensor rea') == [('Sensor reading', 'prefix'), ('Sensor', 'trigram')]
+    # Queries are split at camel case as names are
+    assert found(index, 'SensorReading', limit=1) == [('Sensor reading', 'exact')]
+    assert found(index, 'reading sensor') == [('Sensor reading', 'words')]
+
+
+def test_typos_match_by_trigrams(index):
+    # Both have every trigram of the query, so the higher count ranks first
+    assert found(index, 'sensr') == [('Sensor reading', 'trigram'), ('Sensor', 'trigram')]
+    assert found(index, 'sensr', kind='class', limit=1) == [('Sensor reading', 'trigram')]
+    assert found(index, 'xyzzy') == []
+
+
+def test_kind_and_graph(index):
+    items = index.search('schema', kind='graph')
+    assert [(i['iri'], i['count']) for i in items] == [(OKNS + 'schema1', 55), (OKNS + 'schema2', 27)]
+    item, = index.search('thing', kind='class')
+    assert item['graph'] == OKNS + 'schema1' and item['count'] == 5
+
+
+def test_search_route(app):
+    response = request(app, 'GET', '/search', {'q': 'sensor', 'limit': 1})
+    assert response.status == 200
+    assert [i['iri'] for i in response.json()['items']] == [OKNS + 'Sensor']
+    assert request(app, 'GET', '/search', {'q': 'sensor', 'kind': 'nope'}).status == 400
+
+
+def test_saved_index_is_loaded_for_its_version(data_paths, tmp_path, monkeypatch):
+    store_dir = str(tmp_path / 'store')
+    version = build_store(data_paths, store_dir)
+    LabelIndex.build(open_store(store_dir)).save(os.path.join(store_dir, INDEX_FILE), version)
+    assert LabelIndex.load(os.path.join(store_dir, INDEX_FILE), 'other-version') is None
+
+    def no_queries(graph):
+        raise AssertionError('label index rebuilt')
+
+    monkeypatch.setattr(LabelIndex, 'build', no_queries)
+    app = build_app(data_paths, store_dir=store_dir)
+    assert [i['label'] for i in request(app, 'GET', '/search', {'q': 'sen'}).json()['items']] == [
+        'Sensor reading', 'Sensor']
@@ -0,0 +1,63 @@
+"""Tests of the load test (okn_endpoint/load_test.py): the request mix against the app, and the report."""
+
+import random
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from asgi import request
+from okn_endpoint import load_test
+from okn_endpoint.load_test import DEFAULT_MIX, Recorder, Samples, compare, make_request, parse_mix, percentile
+
+
+def send(app, url, body, headers):
+    parts = urlsplit(url)
+    return request(app, 'POST' if body is not None else 'GET', parts.path, parse_qs(parts.query), headers,
+                   body or b'')
+
+
+@pytest.fixture
+def samples(app):
+    """Samples drawn from the app as Samples draws them from a running backend."""
+    def fetch(url, data=None, headers=None, timeout=60):
+        response = send(app, url, data, headers or {})
+        assert response.status == 200, response.body
+        return response.headers.get('x-cache'), response.body
+
+    original = load_test.fetch
+    load_test.fetch = fetch
+    try:
+        return Samples('', 10)
+    finally:
+        load_test.fetch = original
+
+
+def test_every_request_of_the_mix_is_answered(app, samples):
+    assert samples.graphs == ['https://purl.org/okn/schema/schema1', 'https://purl.org/okn/schema/schema2']
+    rng = random.Random(0)
+    for kind in DEFAULT_MIX:
+        response = send(app, *make_request(kind, '', samples, rng))
+        assert response.status == 200, (kind, response.body)
+
+
+def test_parse_mix():
+    mix = parse_mix('details=5,graphs=0')
+    assert (mix['details'], mix['graphs'], mix['search']) == (5.0, 0.0, DEFAULT_MIX['search'])
+    with pytest.raises(SystemExit):
+        parse_mix('nope=1')
+
+
+def test_report_and_baseline():
+    assert percentile([1, 2, 3], 95) == 3 and percentile([], 50) is None
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile(list(range(1, 11)), 50) == 5
+    recorder = Recorder()
+    for latency in (0.01, 0.02, 0.03):
+        recorder.record('search', latency, cache='HIT' if latency < 0.02 else 'MISS')
+    recorder.record('search', None, error='503')
+    types, total = recorder.report(2.0)
+    assert types['search'] == {'requests': 4, 'errors': 1, 'cacheHits': 1, 'p50Ms': 20.0, 'p95Ms': 30.0,
+                               'p99Ms': 30.0, 'maxMs': 30.0, 'throughput': 1.5}
+    assert total['requests'] == 4
+    assert compare(types, {'types': {'search': {'p95Ms': 25.0}}}, 0.25) == []
+    assert compare(types, {'types': {'search': {'p95Ms': 20.0}}}, 0.25) == ['search: p95 20.0 ms -> 30.0 ms']
@@ -0,0 +1,88 @@
+"""Tests of the per-file partitions (okn_endpoint/partitions.py): the catalogue and routed queries."""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from asgi import request
+from okn_endpoint import partitions
+from okn_endpoint.__main__ import build_app
+from okn_endpoint.loader import dataset_version, load_dataset
+from okn_endpoint.partitions import Catalogue, PartitionRouter
+from okn_endpoint.store import build_store
+
+SCHEMAS = 'SELECT ?s WHERE { ?s a <https://w3id.org/linkml/SchemaDefinition> } ORDER BY ?s'
+JSON = 'application/sparql-results+json'
+SOURCE = 'https://purl.org/okn/source/'
+
+
+def values(response):
+    return [b['s']['value'] for b in response.json()['results']['bindings']]
+
+
+def test_catalogue(app, data_paths):
+    response = request(app, 'GET', '/catalogue', headers={'Origin': 'http://frontend.example'})
+    assert response.status == 200
+    assert response.headers['access-control-allow-origin'] == 'http://frontend.example'
+    catalogue = response.json()
+    assert [source['graph'] for source in catalogue['sources']] == [SOURCE + 'schema1', SOURCE + 'schema2']
+    assert catalogue['schemas'] == {'https://purl.org/okn/schema/schema1': [SOURCE + 'schema1'],
+                                    'https://purl.org/okn/schema/schema2': [SOURCE + 'schema2']}
+    # The map checks its precomputed graph overview against this
+    assert catalogue['version'] == dataset_version(data_paths)
+
+
+def test_routed_query_sees_one_file(app):
+    union = request(app, 'GET', '/', {'query': SCHEMAS}, {'Accept': JSON})
+    routed = request(app, 'GET', '/', {'query': SCHEMAS, 'default-graph-uri': SOURCE + 'schema2'},
+                     {'Accept': JSON, 'Origin': 'http://frontend.example'})
+    assert values(union) == ['https://purl.org/okn/schema/schema1', 'https://purl.org/okn/schema/schema2']
+    assert routed.status == 200
+    assert values(routed) == ['https://purl.org/okn/schema/schema2']
+    assert routed.headers['access-control-allow-origin'] == 'http://frontend.example'
+
+
+def test_routed_post(app):
+    response = request(app, 'POST', '/', {'default-graph-uri': SOURCE + 'schema1'},
+                       {'Content-Type': 'application/sparql-query', 'Accept': JSON}, SCHEMAS.encode())
+    assert values(response) == ['https://purl.org/okn/schema/schema1']
+
+
+@pytest.mark.parametrize('query', ['SELEC ?s', 'SELECT ?s WHERE { ?s a nope:Thing }'])
+def test_invalid_query_is_a_bad_request(app, query):
+    response = request(app, 'GET', '/', {'query': query, 'default-graph-uri': SOURCE + 'schema1'})
+    assert response.status == 400
+
+
+def test_one_partition_per_query(app):
+    response = request(app, 'GET', '/', {'query': SCHEMAS, 'default-graph-uri': [SOURCE + 'schema1', SOURCE + 'schema2']})
+    assert response.status == 400
+
+
+def test_server_failure_is_an_internal_error(data_paths, monkeypatch):
+    graph = load_dataset(data_paths)
+    router = PartitionRouter(None, graph, Catalogue.build(graph, 'v1'))
+
+    def fail(*args):
+        raise RuntimeError('store closed')
+
+    monkeypatch.setattr(partitions, 'evaluate', fail)
+    response = request(router, 'GET', '/', {'query': SCHEMAS, 'default-graph-uri': SOURCE + 'schema1'})
+    assert response.status == 500
+
+
+def test_concurrent_routed_queries(data_paths, tmp_path):
+    # Oxigraph stores must be queried and serialized in one thread; rdflib's
+    # own parser is not thread-safe, so only the store app is run concurrently
+    store_dir = str(tmp_path / 'store')
+    build_store(data_paths, store_dir)
+    app = build_app(data_paths, store_dir=store_dir)
+
+    def routed(i):
+        graph = SOURCE + ('schema1', 'schema2')[i % 2]
+        return graph, request(app, 'GET', '/', {'query': SCHEMAS, 'default-graph-uri': graph}, {'Accept': JSON})
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for graph, response in pool.map(routed, range(64)):
+            assert response.status == 200
+            assert values(response) == ['https://purl.org/okn/schema/' + graph.rsplit('/', 1)[1]]
@@ -0,0 +1,128 @@
+"""Tests of the query result cache (okn_endpoint/query_cache.py)."""
+
+from asgi import request
+from okn_endpoint.query_cache import QueryCache, QueryCacheMiddleware, normalize_query
+
+QUERY = 'SELECT ?s WHERE { ?s a <https://w3id.org/linkml/SchemaDefinition> }'
+JSON = 'application/sparql-results+json'
+
+
+class Endpoint:
+    """Stands in for the endpoint: counts calls and echoes the Origin in CORS headers, as CORSMiddleware does."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        origin = dict(scope['headers']).get(b'origin')
+        headers = [(b'content-type', b'application/json')]
+        if origin:
+            headers += [(b'access-control-allow-origin', origin), (b'access-control-allow-credentials', b'true')]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': f'result {self.calls}'.encode()})
+
+
+def test_normalize_query():
+    assert normalize_query('# comment\nSELECT  ?s\n  WHERE { ?s ?p "a  b" }') == 'SELECT ?s WHERE { ?s ?p "a  b" }'
+
+
+def test_lru_bounds():
+    cache = QueryCache(max_entries=2, max_bytes=10)
+    cache.put('a', 200, [], b'12345')
+    cache.put('b', 200, [], b'12345')
+    cache.get('a')
+    cache.put('c', 200, [], b'1')
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    cache.put('d', 200, [], b'1234567890')
+    assert cache.stats()['bytes'] <= 10
+
+
+def test_repeated_query_is_a_hit():
+    endpoint = Endpoint()
+    app = QueryCacheMiddleware(endpoint, QueryCache(), 'v1')
+    first = request(app, 'GET', '/', {'query': QUERY}, {'Accept': JSON})
+    second = request(app, 'GET', '/', {'query': '  ' + QUERY.replace(' ', '\n')}, {'Accept': JSON})
+    assert (first.headers['x-cache'], second.headers['x-cache']) == ('MISS', 'HIT')
+    assert second.body == first.body
+    assert endpoint.calls == 1
+
+
+def test_cors_headers_are_not_stored():
+    endpoint = Endpoint()
+    cache = QueryCache()
+    app = QueryCacheMiddleware(endpoint, cache, 'v1')
+    request(app, 'GET', '/', {'query': QUERY}, {'Accept': JSON, 'Origin': 'http://a.example'})
+    hit = request(app, 'GET', '/', {'query': QUERY}, {'Accept': JSON, 'Origin': 'http://b.example'})
+    assert hit.headers['x-cache'] == 'HIT'
+    assert not any(name.startswith('access-control-') for name in hit.headers)
+    (_, headers, _), = cache.entries.values()
+    assert all(not name.startswith(b'access-control-') for name, _ in headers)
+
+
+def test_key_includes_version_accept_and_partition():
+    endpoint = Endpoint()
+    app = QueryCacheMiddleware(endpoint, QueryCache(), 'v1')
+    request(app, 'GET', '/', {'query': QUERY}, {'Accept': JSON})
+    request(app, 'GET', '/', {'query': QUERY}, {'Accept': 'text/csv'})
+    request(app, 'GET', '/', {'query': QUERY, 'default-graph-uri': 'https://purl.org/okn/source/a'}, {'Accept': JSON})
+    app.version = 'v2'
+    request(app, 'GET', '/', {'query': QUERY}, {'Accept': JSON})
+    assert endpoint.calls == 4
+
+
+def test_no_version_bypasses_the_cache():
+    endpoint = Endpoint()
+    cache = QueryCache()
+    app = QueryCacheMiddleware(endpoint, cache, None)
+    for _ in range(2):
+        response = request(app, 'GET', '/', {'query': QUERY}, {'Accept': JSON})
+    assert 'x-cache' not in response.headers
+    assert endpoint.calls == 2 and not cache.entries
+
+
+def test_post_query_and_updates():
+    endpoint = Endpoint()
+    app = QueryCacheMiddleware(endpoint, QueryCache(), 'v1')
+    for _ in range(2):
+        response = request(app, 'POST', '/', headers={'Content-Type': 'application/sparql-query', 'Accept': JSON},
+                           body=QUERY.encode())
+    assert response.headers['x-cache'] == 'HIT'
+    update = 'INSERT DATA { <https://example.org/a> <https://example.org/b> "c" }'
+    for _ in range(2):
+        request(app, 'POST', '/', headers={'Content-Type': 'application/x-www-form-urlencoded'},
+                body=f'update={update}'.encode())
+    assert endpoint.calls == 3
+
+
+def test_server_caches_endpoint_results(app):
+    """Through the full server, a repeated query is answered from the cache and counted in /cache/stats."""
+    first = request(app, 'GET', '/', {'query': QUERY}, {'Accept': JSON})
+    second = request(app, 'GET', '/', {'query': QUERY}, {'Accept': JSON})
+    assert (first.status, first.headers['x-cache'], second.headers['x-cache']) == (200, 'MISS', 'HIT')
+    assert len(first.json()['results']['bindings']) == 2
+    assert second.body == first.body
+
+    stats = request(app, 'GET', '/cache/stats').json()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_server_applies_cors_per_request(app):
+    """Through the full server, a cached result gets the CORS headers of each request's own Origin."""
+    params = {'query': QUERY}
+    plain = request(app, 'GET', '/', params, {'Accept': JSON})
+    a = request(app, 'GET', '/', params, {'Accept': JSON, 'Origin': 'http://a.example'})
+    b = request(app, 'GET', '/', params, {'Accept': JSON, 'Origin': 'http://b.example'})
+    assert [r.headers['x-cache'] for r in (plain, a, b)] == ['MISS', 'HIT', 'HIT']
+    assert 'access-control-allow-origin' not in plain.headers
+    assert a.headers['access-control-allow-origin'] == 'http://a.example'
+    assert b.headers['access-control-allow-origin'] == 'http://b.example'
+
+    stats = request(app, 'GET', '/cache/stats', headers={'Origin': 'http://a.example'})
+    assert stats.headers['access-control-allow-origin'] == 'http://a.example'
+    assert stats.json()['hits'] == 2
+
+    preflight = request(app, 'OPTIONS', '/', headers={'Origin': 'http://a.example', 'Access-Control-Request-Method': 'POST'})
+    assert preflight.status == 200
+    assert preflight.headers['access-control-allow-origin'] == 'http://a.example'
@@ -0,0 +1,145 @@
+"""Tests of the hot reloader (okn_endpoint/reload.py) on a small Oxigraph store."""
+
+import os
+
+import pyoxigraph as ox
+import pytest
+
+from asgi import request
+from okn_endpoint.__main__ import build_app
+from okn_endpoint.loader import dataset_version, source_graph
+from okn_endpoint.reload import Reloader
+from okn_endpoint.store import build_store, open_writable_store, store_version
+
+PREFIX = '@prefix ex: <https://example.org/> .\n'
+
+
+def write(path, body):
+    with open(path, 'w') as f:
+        f.write(PREFIX + body)
+    # Modification times can be coarse; make every write visible to the watcher
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def objects(store, path):
+    """The ex:p objects in the named graph of path."""
+    quads = store.quads_for_pattern(None, ox.NamedNode('https://example.org/p'), None, ox.NamedNode(source_graph(path)))
+    return sorted(q.object.value for q in quads)
+
+
+@pytest.fixture
+def watched(tmp_path):
+    """Two TTL files built into a store, and a Reloader watching them that records its callbacks."""
+    a, b = str(tmp_path / 'a.ttl'), str(tmp_path / 'b.ttl')
+    write(a, 'ex:a ex:p "a1" .\n')
+    write(b, 'ex:b ex:p "b1" .\n')
+    store_dir = str(tmp_path / 'store')
+    version = build_store([a, b], store_dir)
+    store, _ = open_writable_store(store_dir)
+    events = []
+    reloader = Reloader([str(tmp_path / '*.ttl')], store, store_dir, version,
+                        on_swap=lambda v: events.append(('swap', v)),
+                        set_version=lambda v: events.append(('version', v)))
+    return reloader, store, a, b, events
+
+
+def test_unchanged_files_are_not_reloaded(watched):
+    reloader, store, a, b, events = watched
+    status = reloader.check()
+    assert status['reloads'] == 0
+    assert events == []
+
+
+def test_changed_file_is_swapped_in(watched):
+    reloader, store, a, b, events = watched
+    write(a, 'ex:a ex:p "a2" .\n')
+    status = reloader.check()
+    assert objects(store, a) == ['a2']
+    assert objects(store, b) == ['b1']
+    assert status['state'] == 'idle'
+    assert status['version'] == dataset_version([a, b]) == store_version(reloader.store_dir)
+    # The cache is off during the update and on the new version before the indexes are rebuilt
+    assert events == [('version', None), ('version', status['version']), ('swap', status['version'])]
+
+
+def test_broken_file_does_not_hold_back_the_others(watched):
+    reloader, store, a, b, events = watched
+    write(a, 'ex:a ex:p "a2" .\n')
+    write(b, 'ex:b ex:p "b2 .\n')
+    status = reloader.check()
+    assert objects(store, a) == ['a2']
+    assert objects(store, b) == ['b1']
+    assert status['state'] == 'failed'
+    assert status['lastError']['files'] == ['b.ttl']
+    assert status['lastReload']['changed'] == ['a.ttl']
+    # The store still has the old b.ttl, so a restart must not take it as up to date
+    assert store_version(reloader.store_dir) != dataset_version([a, b])
+
+    # Not retried until it changes again
+    events.clear()
+    assert reloader.check()['reloads'] == 1
+    assert events == []
+
+    write(b, 'ex:b ex:p "b3" .\n')
+    status = reloader.check()
+    assert objects(store, b) == ['b3']
+    assert status['lastReload']['changed'] == ['b.ttl']
+    assert status['version'] == dataset_version([a, b]) == store_version(reloader.store_dir)
+
+
+def test_only_broken_files_changed(watched):
+    reloader, store, a, b, events = watched
+    write(b, 'ex:b ex:p "b2 .\n')
+    status = reloader.check()
+    assert status['state'] == 'failed'
+    assert status['reloads'] == 0
+    assert objects(store, b) == ['b1']
+    assert events == []
+
+
+def test_added_and_removed_files(watched, tmp_path):
+    reloader, store, a, b, events = watched
+    c = str(tmp_path / 'c.ttl')
+    write(c, 'ex:c ex:p "c1" .\n')
+    os.remove(a)
+    status = reloader.check()
+    assert objects(store, a) == []
+    assert objects(store, c) == ['c1']
+    assert sorted(status['lastReload']['removed']) == ['a.ttl']
+    assert status['version'] == dataset_version([b, c])
+
+
+def test_restart_with_changed_files_reloads_everything(watched):
+    reloader, store, a, b, events = watched
+    write(b, 'ex:b ex:p "b2" .\n')
+
+    restarted = Reloader(reloader.patterns, store, reloader.store_dir, store_version(reloader.store_dir),
+                         on_swap=lambda v: None)
+    restarted.check()
+    assert objects(store, a) == ['a1'] and objects(store, b) == ['b2']
+    assert restarted.status['version'] == dataset_version([a, b]) == store_version(reloader.store_dir)
+
+
+def test_restart_after_partial_reload_reloads_everything(watched):
+    reloader, store, a, b, events = watched
+    write(b, 'ex:b ex:p "b2 .\n')
+    write(a, 'ex:a ex:p "a2" .\n')
+    reloader.check()
+    write(b, 'ex:b ex:p "b3" .\n')
+
+    restarted = Reloader(reloader.patterns, store, reloader.store_dir, store_version(reloader.store_dir),
+                         on_swap=lambda v: None)
+    restarted.check()
+    assert objects(store, b) == ['b3']
+    assert restarted.status['version'] == dataset_version([a, b])
+
+
+def test_reload_routes_only_with_watch(app, data_paths, tmp_path):
+    assert request(app, 'GET', '/reload/status').status == 404
+    assert request(app, 'POST', '/reload').status in (404, 405)
+
+    store_dir = str(tmp_path / 'watched-store')
+    build_store(data_paths, store_dir)
+    watching = build_app(data_paths, store_dir=store_dir, watch=[str(tmp_path / '*.ttl')])
+    assert request(watching, 'GET', '/reload/status').json()['state'] == 'idle'
@@ -0,0 +1,28 @@
+"""Tests of the pre-parsed store (okn_endpoint/store.py)."""
+
+import os
+
+from okn_endpoint.loader import dataset_version, load_dataset
+from okn_endpoint.store import build_store, open_store, store_version
+
+QUERY = '''SELECT ?s ?p ?o WHERE {
+    ?s a <https://w3id.org/linkml/SchemaDefinition> ; ?p ?o FILTER(!isBlank(?o))
+} ORDER BY ?s ?p ?o'''
+
+
+def rows(graph):
+    return [tuple(str(value) for value in row) for row in graph.query(QUERY)]
+
+
+def test_store_answers_as_the_parsed_files(data_paths, tmp_path):
+    store_dir = str(tmp_path / 'store')
+    assert build_store(data_paths, store_dir) == dataset_version(data_paths) == store_version(store_dir)
+    assert not os.path.exists(store_dir + '.tmp')
+    assert rows(open_store(store_dir)) == rows(load_dataset(data_paths))
+
+
+def test_rebuild_replaces_the_store(data_paths, tmp_path):
+    store_dir = str(tmp_path / 'store')
+    build_store(data_paths, store_dir)
+    assert build_store(data_paths[:1], store_dir) == store_version(store_dir) == dataset_version(data_paths[:1])
+    assert {row[0] for row in rows(open_store(store_dir))} == {'https://purl.org/okn/schema/schema1'}